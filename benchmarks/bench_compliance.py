@@ -0,0 +1,84 @@
+'''
+Description: Benchmark of the computation of the users of a report
+Usage: python -m benchmarks.bench_compliance [members] [weeks] [schedules]
+Compares computing every member one User at a time (WeeklyReport.add_user) against the ComplianceEngine, which computes every member
+of a week at once. Fetching is not measured - the tracked hours are generated up front. With schedules, the members are spread over that
+many work schedules, by Toggl group.
+'''
+import sys
+import time
+import random
+import datetime
+
+from libs.invoke_workdays.workday import WorkDay
+from libs.invoke_workdays.work_schedules import WorkSchedules
+from libs.invoke_report.weekly_report import WeeklyReport
+from libs.invoke_users.compliance import ComplianceEngine
+from libs.date_functions import get_weeks_in_range
+
+CONFIGS = {'admin': ['admin@localhost'], 'togglAPI': {'workspace_id': 1, 'user_agent': 'a'}}
+
+
+def build_configs(schedules):
+    configs = dict(CONFIGS)
+    configs['work_schedules'] = [{
+        'name': 'schedule ' + str(n),
+        'hours_per_day': 4 + n % 5,
+        'work_days': [1, 2, 3, 4, 5][:5 - n % 3],
+        'fte': 1 - (n % 4) * 0.1,
+        'leave_days': ['2014-01-' + str(10 + n % 15)],
+        'groups': [n]
+    } for n in range(schedules)]
+    return configs
+
+
+def build_members(members, first_week, schedules):
+    random.seed(1)
+    return [{
+        'uid': n,
+        'wid': 1,
+        'name': 'User Number' + str(n),
+        'email': 'admin@localhost' if n % 50 == 0 else 'user' + str(n) + '@localhost',
+        'inactive': n % 40 == 0,
+        'group_ids': [n % schedules] if schedules else [],
+        'at': (first_week + datetime.timedelta(days=random.randint(-400, 60))).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+    } for n in range(members)]
+
+
+def run_users(configs, reports, members, tracked_ms):
+    for report, week_ms in zip(reports, tracked_ms):
+        for member, time_tracked in zip(members, week_ms):
+            report.add_user(member, time_tracked)
+        report.sort_users()
+
+
+def run_engine(configs, reports, members, tracked_ms):
+    engine = ComplianceEngine(members, configs, reports[0].work_day, reports[0].working_hours, reports[0].work_schedules)
+    for report, week_ms in zip(reports, tracked_ms):
+        report.add_users_batch(engine, week_ms)
+        report.sort_users()
+
+
+def main(members, weeks, schedules):
+    first_week = datetime.datetime(2014, 1, 6)
+    work_day = WorkDay({2014: [{'date': datetime.date(2014, 1, 8), 'percent_used': 0.5}]}, [1, 2, 3, 4, 5], datetime.datetime(2015, 1, 1))
+    week_ranges = get_weeks_in_range(first_week, first_week + datetime.timedelta(weeks=weeks, days=-1))
+    configs = build_configs(schedules)
+    member_list = build_members(members, first_week, schedules)
+    tracked_ms = [[random.randint(0, 45 * 60 * 60 * 1000) for member in member_list] for week in week_ranges]
+
+    timings = []
+    for runner in (run_users, run_engine):
+        start = time.time()
+        work_schedules = WorkSchedules(configs, work_day)
+        reports = [WeeklyReport(configs, None, work_day, start_date, end_date, work_schedules=work_schedules) for start_date, end_date in week_ranges]
+        runner(configs, reports, member_list, tracked_ms)
+        timings.append(time.time() - start)
+
+    print "%d members, %d weeks, %d work schedules" % (members, len(week_ranges), schedules)
+    print "{:24}".format("one User at a time") + "{:10.2f}".format(timings[0] * 1000) + " ms"
+    print "{:24}".format("ComplianceEngine") + "{:10.2f}".format(timings[1] * 1000) + " ms"
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000, int(sys.argv[2]) if len(sys.argv) > 2 else 4, int(sys.argv[3]) if len(sys.argv) > 3 else 0)
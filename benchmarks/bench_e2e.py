@@ -0,0 +1,187 @@
+'''
+Description: End-to-end benchmark of the weekly run. check.py is run in its own process against a local stand-in Toggl server
+(tests/fakes/toggl_fake.py) and a local SMTP sink (tests/fakes/smtp_sink.py), for every roster size and holiday calendar size.
+Usage: python -m benchmarks.bench_e2e [--rosters=10,100,1000] [--holiday-years=1,50] [--latency=0.002] [--results=benchmark_results.jsonl]
+Reports the wall time, the time of every stage, the peak RSS, and the Toggl requests and e-mails of each run. Every result is appended
+to the results file with the commit it was run on, and compared to the last result of the same run on another commit, so regressions
+between commits are visible.
+'''
+import os
+import sys
+import json
+import time
+import shutil
+import tempfile
+import datetime
+import subprocess
+import yaml
+
+from tests.fakes.toggl_fake import FakeToggl
+from tests.fakes.smtp_sink import SMTPSink
+
+DEFAULT_RESULTS_PATH = 'benchmark_results.jsonl'
+HOLIDAYS_PER_YEAR = 15
+# The stages that are compared between commits, besides the wall time
+REPORTED_STAGES = ['initialize_configs', 'holidays', 'workspace_setup', 'member_fetch', 'user_fetch', 'user_computation', 'rendering', 'sending']
+
+
+'''
+Return: A holiday calendar of years years, ending next year, in the format of HOLIDAY_CONFIG_PATH
+'''
+def build_holidays(years):
+    holidays = {}
+    last_year = datetime.date.today().year + 1
+    for year in range(last_year - years + 1, last_year + 1):
+        holidays[year] = []
+        for n in range(HOLIDAYS_PER_YEAR):
+            holiday = {'date': datetime.date(year, 1, 1) + datetime.timedelta(n * 23)}
+            if n % 3 == 0:
+                holiday['percent_used'] = 0.5
+            holidays[year].append(holiday)
+    return holidays
+
+
+def build_configs(toggl, sink):
+    smtp_configs = sink.get_smtp_configs()
+    smtp_configs['pool_size'] = 4
+    toggl_configs = toggl.get_toggl_configs()
+    toggl_configs['rate_limit'] = 0
+    return {
+        'work_days': [1, 2, 3, 4, 5],
+        'smtp': smtp_configs,
+        'date_restrict': {'to_restrict': False, 'weekday': 0, 'hour': 0},
+        'sendmail': {'to_send': True},
+        'togglAPI': toggl_configs,
+        'admin': toggl.admin_emails,
+        'staff': {
+            'email_role_staff_resource': 'resource@localhost',
+            'email_role_group_leads': 'leads@localhost',
+            'from_email': 'from@localhost'
+        }
+    }
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD']).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+'''
+Description: Runs check.py once, against a fresh FakeToggl and SMTP sink
+Return: The result of the run - wall time, stage times, peak RSS, Toggl requests and e-mails
+'''
+def run_scenario(users, holiday_years, latency, work_dir):
+    toggl = FakeToggl(users, latency=latency).start()
+    sink = SMTPSink().start()
+    try:
+        config_path = os.path.join(work_dir, 'configs.yml')
+        holidays_path = os.path.join(work_dir, 'holidays.yml')
+        report_path = os.path.join(work_dir, 'run_report.json')
+        with open(config_path, 'w') as config_file:
+            yaml.safe_dump(build_configs(toggl, sink), config_file)
+        with open(holidays_path, 'w') as holidays_file:
+            yaml.safe_dump(build_holidays(holiday_years), holidays_file)
+
+        environment = dict(os.environ, HOLIDAY_CONFIG_PATH=holidays_path, HOLIDAY_SNAPSHOT_PATH=os.path.join(work_dir, 'holidays.pickle'),
+                           FAKE_TOGGL_URL=toggl.url)
+        start = time.time()
+        with open(os.devnull, 'w') as devnull:
+            subprocess.check_call([sys.executable, '-m', 'benchmarks.run_check', config_path, '--report=' + report_path],
+                                  env=environment, stdout=devnull)
+        wall_seconds = time.time() - start
+
+        with open(report_path) as report_file:
+            report = json.load(report_file)
+    finally:
+        toggl.stop()
+        sink.stop()
+
+    return {
+        'users': users,
+        'holiday_years': holiday_years,
+        'wall_seconds': wall_seconds,
+        'stages': dict((stage['name'], stage['seconds']) for stage in report['stages']),
+        'peak_rss_kb': report['peak_rss_kb'],
+        'toggl_requests': toggl.get_request_count(),
+        'emails': len(sink.messages),
+        'smtp_connections': sink.connections,
+        'users_contacted': report['counts'].get('users_contacted', 0)
+    }
+
+
+'''
+Return: The stored results, oldest first
+'''
+def load_results(results_path):
+    if not os.path.exists(results_path):
+        return []
+    with open(results_path) as results_file:
+        return [json.loads(line) for line in results_file if line.strip()]
+
+
+'''
+Return: The last stored result of the same run, on another commit, or None
+'''
+def find_baseline(stored_results, result):
+    for stored in reversed(stored_results):
+        if stored['commit'] != result['commit'] and (stored['users'], stored['holiday_years'], stored['latency']) == (result['users'], result['holiday_years'], result['latency']):
+            return stored
+    return None
+
+
+def format_change(value, baseline_value):
+    if not baseline_value:
+        return ''
+    return "{:+.0f}%".format((value - baseline_value) / float(baseline_value) * 100)
+
+
+def print_result(result, baseline):
+    print "\n%d users, %d holiday years" % (result['users'], result['holiday_years']) + \
+        ("" if baseline is None else " - compared to " + baseline['commit'])
+    rows = [('wall', result['wall_seconds'], baseline and baseline['wall_seconds'])]
+    for stage in REPORTED_STAGES:
+        if stage in result['stages']:
+            rows.append((stage, result['stages'][stage], baseline and baseline['stages'].get(stage)))
+    for name, seconds, baseline_seconds in rows:
+        print "  {:20}".format(name) + "{:10.3f}".format(seconds) + "s" + "{:>10}".format(format_change(seconds, baseline_seconds))
+
+    print "  {:20}".format('peak rss') + "{:10.1f}".format(result['peak_rss_kb'] / 1024.0) + "MB" + \
+        "{:>9}".format(format_change(result['peak_rss_kb'], baseline and baseline['peak_rss_kb']))
+    print "  {:20}".format('toggl requests') + "{:10}".format(result['toggl_requests'])
+    print "  {:20}".format('e-mails') + "{:10}".format(result['emails']) + " over " + str(result['smtp_connections']) + " connections"
+
+
+def main(rosters, holiday_years_list, latency, results_path):
+    stored_results = load_results(results_path)
+    commit = get_commit()
+    work_dir = tempfile.mkdtemp()
+    try:
+        for users in rosters:
+            for holiday_years in holiday_years_list:
+                result = run_scenario(users, holiday_years, latency, work_dir)
+                result.update(commit=commit, latency=latency, recorded_at=datetime.datetime.now().strftime('%Y-%m-%dT%H:%M:%S'))
+                print_result(result, find_baseline(stored_results, result))
+
+                with open(results_path, 'a') as results_file:
+                    results_file.write(json.dumps(result, sort_keys=True) + '\n')
+    finally:
+        shutil.rmtree(work_dir)
+    print "\nResults appended to " + results_path
+
+
+def get_argument(name, default):
+    for argument in sys.argv[1:]:
+        if argument.startswith('--' + name + '='):
+            return argument.split('=', 1)[1]
+    return default
+
+
+if __name__ == '__main__':
+    main(
+        [int(users) for users in get_argument('rosters', '10,100,1000').split(',')],
+        [int(years) for years in get_argument('holiday-years', '1,50').split(',')],
+        float(get_argument('latency', 0.002)),
+        get_argument('results', DEFAULT_RESULTS_PATH)
+    )
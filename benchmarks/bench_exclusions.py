@@ -0,0 +1,68 @@
+'''
+Description: Benchmark of the exclusion of members from a report
+Usage: python -m benchmarks.bench_exclusions [members] [excluded]
+Compares checking every member against the admin list one User at a time (User.skip_check, which scans the list for every user) against
+the ExclusionIndex, which builds a set of every rule once. The admin list holds excluded e-mails, and the exclude rules hold as many
+uids and a few domains and groups, so the index also checks more rules than the scan.
+'''
+import sys
+import time
+import datetime
+
+from libs.invoke_users.invoke_users import User
+from libs.invoke_users.exclusions import ExclusionIndex
+
+
+def build_members(members):
+    return [{
+        'uid': n,
+        'wid': 1,
+        'name': 'User Number' + str(n),
+        'email': 'user' + str(n) + ('@agency.com' if n % 97 == 0 else '@localhost'),
+        'inactive': n % 40 == 0,
+        'admin': n % 300 == 0,
+        'group_ids': [n % 20],
+        'at': '2013-06-01T09:00:00+00:00'
+    } for n in range(members)]
+
+
+def build_configs(members, excluded):
+    step = max(members // excluded, 1)
+    return {
+        'admin': ['user' + str(n) + '@localhost' for n in range(0, members, step)][:excluded],
+        'exclude': {
+            'uids': range(1, members, step)[:excluded],
+            'domains': ['agency.com', 'contractors.com'],
+            'groups': [3, 7],
+            'roles': ['admin']
+        }
+    }
+
+
+def run_scan(members, configs):
+    # The joined date is passed in, so only the check is timed, not the parsing of the member
+    joined_date = datetime.datetime(2013, 6, 1, 9)
+    return [User(member, 37.5, 0, joined_date).skip_check(configs) for member in members]
+
+
+def run_index(members, configs):
+    exclusions = ExclusionIndex(configs)
+    return [exclusions.is_excluded(member) for member in members]
+
+
+def main(members, excluded):
+    member_list = build_members(members)
+    configs = build_configs(members, excluded)
+
+    timings = []
+    for runner in (run_scan, run_index):
+        start = time.time()
+        skipped = runner(member_list, configs)
+        timings.append(time.time() - start)
+        print "{:12}".format(runner.__name__[4:]) + "{:10.1f}".format(timings[-1] * 1000) + " ms, " + str(sum(skipped)) + " members excluded"
+
+    print "%d members, %d excluded e-mails - %.1fx faster with the index" % (members, excluded, timings[0] / max(timings[1], 1e-9))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10000, int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
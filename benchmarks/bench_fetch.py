@@ -0,0 +1,67 @@
+'''
+Description: Benchmark of the Toggl fetch pipeline, against a local stand-in Toggl server (tests/fakes/toggl_fake.py)
+Usage: python -m benchmarks.bench_fetch [rosters] [latency] [throttle_every]
+    python -m benchmarks.bench_fetch 10,100,10000 0.005 25
+Fetches the hours of a week for every roster size - with one summary report (bulk), one request per user, and with detailed reports -
+over the pooled TogglTransport, and checks the hours against the hours the server generated.
+'''
+import sys
+import time
+import datetime
+
+from tests.fakes.toggl_fake import FakeToggl
+from libs.invoke_toggl.hours_fetcher import HoursFetcher
+from libs.invoke_toggl.transport import TogglTransport
+
+START = '2014-01-06'
+END = '2014-01-12'
+# Per user fetching makes one request per member, so it is only run up to this roster size
+MAX_PER_USER_ROSTER = 1000
+
+
+def fetch(toggl, mode, members):
+    settings = toggl.get_toggl_configs()
+    api = toggl.create_client(settings)
+    transport = TogglTransport({'rate_limit': 0, 'pool_size': 8, 'backoff_base': 0.05})
+    transport.attach(api)
+    hours_fetcher = HoursFetcher(api, settings, 8, mode == 'bulk')
+
+    if mode == 'details':
+        week_hours = hours_fetcher.fetch_weekly_hours(START, END).get(START, {})
+        hours = [week_hours.get(member['uid'], 0) for member in members]
+    else:
+        hours = hours_fetcher.fetch_users_hours(members, START, END)
+
+    transport.close()
+    return hours, transport.retries
+
+
+def main(rosters, latency, throttle_every):
+    print "%.0f ms latency per request, a 429 every %d requests" % (latency * 1000, throttle_every)
+    print "{:>8}".format("users") + "{:>10}".format("mode") + "{:>12}".format("seconds") + "{:>12}".format("requests") + "{:>10}".format("retries")
+    for users in rosters:
+        toggl = FakeToggl(users, latency=latency, throttle_every=throttle_every, joined_before=datetime.date(2013, 12, 1)).start()
+        try:
+            members = toggl.create_client(toggl.get_toggl_configs()).get_workspace_members(toggl.workspace_id).json()
+            expected = [toggl.get_range_ms(member['uid'], datetime.date(2014, 1, 6), datetime.date(2014, 1, 12)) for member in members]
+
+            for mode in ('bulk', 'per_user', 'details'):
+                if mode == 'per_user' and users > MAX_PER_USER_ROSTER:
+                    continue
+                requests_before = toggl.get_request_count()
+                start = time.time()
+                hours, retries = fetch(toggl, mode, members)
+                elapsed = time.time() - start
+                assert hours == expected, mode + " hours do not match the generated hours"
+                print "{:>8}".format(users) + "{:>10}".format(mode) + "{:12.3f}".format(elapsed) + \
+                    "{:12}".format(toggl.get_request_count() - requests_before) + "{:10}".format(retries)
+        finally:
+            toggl.stop()
+
+
+if __name__ == '__main__':
+    main(
+        [int(users) for users in (sys.argv[1] if len(sys.argv) > 1 else '10,100,10000').split(',')],
+        float(sys.argv[2]) if len(sys.argv) > 2 else 0.005,
+        int(sys.argv[3]) if len(sys.argv) > 3 else 25
+    )
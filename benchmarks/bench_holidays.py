@@ -0,0 +1,68 @@
+'''
+Description: Microbenchmark of WorkDay.calculate_total_work_hours
+Usage: python -m benchmarks.bench_holidays [years]
+Compares the linear scan of holiday_utilization, the date-keyed holiday index, and the work day calendar totals, over a multi-year range.
+'''
+import sys
+import timeit
+import datetime
+
+from libs.invoke_workdays.workday import WorkDay
+
+FIRST_YEAR = 2000
+HOLIDAYS_PER_YEAR = 15
+
+
+def build_holidays(years):
+    holidays = {}
+    for year in range(FIRST_YEAR, FIRST_YEAR + years):
+        holidays[year] = []
+        for n in range(HOLIDAYS_PER_YEAR):
+            holiday = {'date': datetime.date(year, 1, 1) + datetime.timedelta(n * 23)}
+            if n % 3 == 0:
+                holiday['percent_used'] = 0.5
+            holidays[year].append(holiday)
+    return holidays
+
+
+def linear_total_work_hours(workday, working_hours, start_date, end_date):
+    minimum_hours = 0
+    for single_date in workday.daterange(start_date, end_date):
+        if workday.is_weekday(single_date, workday.work_days) is True:
+            holiday_utilization = WorkDay.holiday_utilization(single_date, workday.holidays)
+            if holiday_utilization is False:
+                minimum_hours = minimum_hours + working_hours
+            else:
+                minimum_hours = minimum_hours + (working_hours * (1 - holiday_utilization))
+    return minimum_hours
+
+
+def main(years):
+    holidays = build_holidays(years)
+    workday = WorkDay(holidays, [1, 2, 3, 4, 5], datetime.datetime(FIRST_YEAR + years, 1, 1))
+    start_date = datetime.datetime(FIRST_YEAR, 1, 1)
+    end_date = datetime.datetime(FIRST_YEAR + years - 1, 12, 31)
+
+    linear_hours = linear_total_work_hours(workday, 7.5, start_date, end_date)
+    indexed_hours = workday.sum_work_hours(7.5, start_date, end_date)
+    calendar_hours = workday.calculate_total_work_hours(7.5, start_date, end_date)
+    assert linear_hours == indexed_hours
+    assert abs(linear_hours - calendar_hours) < 1e-6
+
+    runs = 20
+    linear_time = timeit.timeit(lambda: linear_total_work_hours(workday, 7.5, start_date, end_date), number=runs) / runs
+    indexed_time = timeit.timeit(lambda: workday.sum_work_hours(7.5, start_date, end_date), number=runs) / runs
+    calendar_time = timeit.timeit(lambda: workday.calculate_total_work_hours(7.5, start_date, end_date), number=runs) / runs
+    build_time = timeit.timeit(lambda: WorkDay(holidays, [1, 2, 3, 4, 5], datetime.datetime(FIRST_YEAR + years, 1, 1)), number=runs) / runs
+
+    print "Range: %s to %s (%d years, %d holidays per year)" % (start_date.date(), end_date.date(), years, HOLIDAYS_PER_YEAR)
+    print "{:20}".format("linear scan") + "{:12.2f}".format(linear_time * 1000) + " ms"
+    print "{:20}".format("holiday index") + "{:12.2f}".format(indexed_time * 1000) + " ms"
+    print "{:20}".format("calendar totals") + "{:12.4f}".format(calendar_time * 1000) + " ms"
+    print "{:20}".format("calendar build") + "{:12.2f}".format(build_time * 1000) + " ms"
+    print "{:20}".format("index speedup") + "{:12.2f}".format(linear_time / indexed_time) + "x"
+    print "{:20}".format("calendar speedup") + "{:12.2f}".format(linear_time / calendar_time) + "x"
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
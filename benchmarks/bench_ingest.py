@@ -0,0 +1,77 @@
+'''
+Description: Benchmark of the peak memory and time of reading a detailed report, decoded as a whole versus parsed incrementally
+Usage: python -m benchmarks.bench_ingest [entries]
+Every mode is run in its own process, so the peak memory of one mode does not hide the peak memory of another. The report is generated
+in chunks, as it would arrive from the network, and the milliseconds tracked are added up per user.
+'''
+import sys
+import time
+import json
+import resource
+import subprocess
+
+from libs.invoke_toggl.json_stream import iter_json_array, CHUNK_SIZE
+
+USERS = 200
+
+
+def generate_report(entries):
+    yield '{"total_grand": %d, "total_count": %d, "per_page": %d, "data": [' % (entries * 1000, entries, entries)
+    chunk = []
+    for n in xrange(entries):
+        entry = json.dumps({
+            'id': n, 'uid': n % USERS, 'dur': 1000, 'start': '2014-01-06T09:00:00+01:00', 'end': '2014-01-06T09:00:01+01:00',
+            'description': 'Working on the weekly report of the workspace', 'project': 'Alma', 'tags': ['internal'], 'billable': False
+        })
+        chunk.append(entry if n == 0 else ',' + entry)
+        if len(chunk) == 100:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk) + ']}'
+
+
+def rechunk(chunks):
+    buffer = ''
+    for chunk in chunks:
+        buffer = buffer + chunk
+        while len(buffer) >= CHUNK_SIZE:
+            yield buffer[:CHUNK_SIZE]
+            buffer = buffer[CHUNK_SIZE:]
+    yield buffer
+
+
+def add_up(time_entries):
+    users_hours = {}
+    for time_entry in time_entries:
+        users_hours[time_entry['uid']] = users_hours.get(time_entry['uid'], 0) + time_entry['dur']
+    return users_hours
+
+
+def run_mode(mode, entries):
+    start = time.time()
+    if mode == 'decoded':
+        users_hours = add_up(json.loads(''.join(rechunk(generate_report(entries))))['data'])
+    else:
+        users_hours = add_up(iter_json_array(rechunk(generate_report(entries)), 'data'))
+    elapsed = time.time() - start
+
+    assert sum(users_hours.values()) == entries * 1000
+    print json.dumps({'seconds': elapsed, 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0})
+
+
+def main(entries_list):
+    print "{:>10}".format("entries") + "{:>12}".format("mode") + "{:>12}".format("seconds") + "{:>16}".format("peak RSS (MB)")
+    for entries in entries_list:
+        for mode in ['decoded', 'streamed']:
+            output = subprocess.check_output([sys.executable, '-m', 'benchmarks.bench_ingest', '--mode=' + mode, str(entries)])
+            result = json.loads(output)
+            print "{:>10}".format(entries) + "{:>12}".format(mode) + "{:12.2f}".format(result['seconds']) + "{:16.1f}".format(result['peak_rss_mb'])
+
+
+if __name__ == '__main__':
+    modes = [argument.split('=', 1)[1] for argument in sys.argv[1:] if argument.startswith('--mode=')]
+    counts = [int(argument) for argument in sys.argv[1:] if not argument.startswith('--')]
+    if modes:
+        run_mode(modes[0], counts[0])
+    else:
+        main(counts or [10000, 100000, 400000])
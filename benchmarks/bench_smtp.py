@@ -0,0 +1,43 @@
+'''
+Description: Benchmark of e-mail throughput, over a single connection and over pools of connections
+Usage: python -m benchmarks.bench_smtp [messages] [latency]
+Sends messages to a local SMTP sink, which delays every accepted message by latency seconds, to mimic a remote mail provider.
+'''
+import sys
+import time
+from email.mime.text import MIMEText
+
+from tests.fakes.smtp_sink import SMTPSink
+from libs.hours_alerts import create_mail_queue
+
+
+def send_messages(smtp_configs, messages):
+    mail_queue = create_mail_queue(smtp_configs)
+    msg = MIMEText('<p>Looks like you didn\'t log all your hours</p>', 'html')
+
+    start = time.time()
+    for n in range(messages):
+        mail_queue.enqueue('from@localhost', ['user' + str(n) + '@localhost', 'leads@localhost'], msg)
+    mail_queue.close()
+    elapsed = time.time() - start
+
+    assert mail_queue.get_failures() == []
+    return elapsed
+
+
+def main(messages, latency):
+    sink = SMTPSink(latency).start()
+    print "%d messages, %.0f ms latency per message" % (messages, latency * 1000)
+    print "{:12}".format("pool_size") + "{:>12}".format("seconds") + "{:>16}".format("messages/sec")
+    try:
+        for pool_size in [1, 2, 4, 8, 16]:
+            smtp_configs = sink.get_smtp_configs()
+            smtp_configs['pool_size'] = pool_size
+            elapsed = send_messages(smtp_configs, messages)
+            print "{:<12}".format(pool_size) + "{:12.2f}".format(elapsed) + "{:16.1f}".format(messages / elapsed)
+    finally:
+        sink.stop()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200, float(sys.argv[2]) if len(sys.argv) > 2 else 0.02)
@@ -0,0 +1,110 @@
+'''
+Description: Benchmark of the cold start of check.py, on an invocation that is stopped by the schedule gate - the most common invocation
+of an hourly worker
+Usage: python -m benchmarks.bench_startup [runs]
+Runs check.py in a new interpreter runs times, with date_restrict set to another weekday, and reports the median wall time next to an empty
+interpreter. Then lists the slowest modules imported before the run stopped. Python 2 has no -X importtime, so imports are timed with an
+import hook - on Python 3.7 and above, 'python -X importtime check.py [config path]' gives the same breakdown.
+'''
+import os
+import sys
+import json
+import time
+import runpy
+import shutil
+import tempfile
+import datetime
+import subprocess
+import __builtin__
+
+TOP_IMPORTS = 15
+# What a run that goes ahead imports - every invocation paid for these before the schedule gate came first
+FULL_RUN_IMPORTS = 'import yaml, datetime, libs.invoke_workdays.workday, libs.invoke_workdays.holiday_calendar, libs.invoke_report.workspace_runner, ' \
+    'libs.invoke_users.compliance, libs.date_functions'
+
+
+GATED_CONFIGS = """work_days: [1, 2, 3, 4, 5]
+admin: []
+smtp: {host: localhost, port: 25, username: '', password: ''}
+date_restrict: {to_restrict: True, weekday: %d, hour: 0}
+sendmail: {to_send: False}
+togglAPI: {token: token, user_agent: agent, workspace_id: 1}
+staff: {email_role_staff_resource: a@localhost, email_role_group_leads: b@localhost, from_email: c@localhost}
+"""
+
+
+def write_gated_configs(directory):
+    weekday = (datetime.datetime.now().weekday() + 1) % 7
+    config_path = os.path.join(directory, 'configs.yml')
+    with open(config_path, 'w') as config_file:
+        config_file.write(GATED_CONFIGS % weekday)
+    return config_path
+
+
+def median_wall_ms(command, runs):
+    timings = []
+    with open(os.devnull, 'w') as devnull:
+        for run in range(runs):
+            start = time.time()
+            subprocess.call(command, stdout=devnull, stderr=devnull)
+            timings.append((time.time() - start) * 1000)
+    return sorted(timings)[len(timings) // 2]
+
+
+'''
+Description: Runs check.py in this process, timing the first import of every module. Printed as JSON, for the parent process to read.
+The time of a module includes the modules it imports, as with -X importtime's cumulative column.
+'''
+def time_imports(config_path):
+    import_times = {}
+    original_import = __builtin__.__import__
+
+    def timed_import(name, *args, **kwargs):
+        if name in sys.modules:
+            return original_import(name, *args, **kwargs)
+        start = time.time()
+        try:
+            return original_import(name, *args, **kwargs)
+        finally:
+            import_times.setdefault(name, (time.time() - start) * 1000)
+
+    modules_before = set(sys.modules)
+    __builtin__.__import__ = timed_import
+    sys.argv = ['check.py', config_path]
+    try:
+        runpy.run_path('check.py', run_name='__main__')
+    except SystemExit:
+        pass
+    finally:
+        __builtin__.__import__ = original_import
+
+    loaded = [name for name in sys.modules if name not in modules_before and sys.modules[name] is not None]
+    sys.stdout.write(json.dumps({'imports': import_times, 'modules': len(loaded)}))
+
+
+def main(runs):
+    directory = tempfile.mkdtemp()
+    try:
+        config_path = write_gated_configs(directory)
+        empty_ms = median_wall_ms([sys.executable, '-c', 'pass'], runs)
+        gated_ms = median_wall_ms([sys.executable, 'check.py', config_path], runs)
+        full_imports_ms = median_wall_ms([sys.executable, '-c', FULL_RUN_IMPORTS], runs)
+        output = subprocess.check_output([sys.executable, '-m', 'benchmarks.bench_startup', '--imports', config_path])
+    finally:
+        shutil.rmtree(directory)
+
+    imports = json.loads(output[output.index('{'):])
+    print "%d runs, median wall time" % runs
+    print "{:32}".format("empty interpreter") + "{:10.1f}".format(empty_ms) + " ms"
+    print "{:32}".format("check.py, stopped by the gate") + "{:10.1f}".format(gated_ms) + " ms"
+    print "{:32}".format("imports of a full run") + "{:10.1f}".format(full_imports_ms) + " ms"
+    print "\n%d modules imported before the gate stopped the run. Slowest imports (cumulative):" % imports['modules']
+    for name, milliseconds in sorted(imports['imports'].items(), key=lambda item: -item[1])[:TOP_IMPORTS]:
+        print "  {:40}".format(name) + "{:8.1f}".format(milliseconds) + " ms"
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--imports':
+        time_imports(sys.argv[2])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
@@ -0,0 +1,105 @@
+'''
+Description: Benchmark of the missing hours e-mail rendering
+Usage: python -m benchmarks.bench_templates [recipients]
+Compares rendering the full alert template (as it was before it was split) for every recipient against HoursAlert, which renders the shared fragments once per run.
+Also compares compiling the templates without, and with a warm, bytecode cache.
+'''
+import sys
+import time
+import shutil
+import tempfile
+import datetime
+import jinja2
+
+from libs.hours_alerts import HoursAlert
+from libs.invoke_users.invoke_users import User
+from tests.fakes.templates import full_alert_source
+
+VIEWS_PATH = 'views'
+CONFIGS = {
+    'staff': {
+        'email_role_staff_resource': 'staff@localhost',
+        'email_role_group_leads': 'leads@localhost',
+        'from_email': 'from@localhost'
+    }
+}
+
+
+def build_users(recipients):
+    users = []
+    for n in range(recipients):
+        user = User({'uid': n, 'wid': 1, 'name': 'User Number' + str(n), 'email': 'user' + str(n) + '@localhost', 'inactive': False,
+                     'at': '2013-06-01T09:00:00+00:00'}, 37.5, n % 37)
+        user.set_toggl_url('2014-01-06', '2014-01-12')
+        users.append(user)
+    return users
+
+
+def render_full(template_env, start_date, end_date, users, minimum_hours_for_range):
+    for n, user in enumerate(users):
+        hours_worked = n % 37
+        template = template_env.get_template('hours_alert.html')
+        template.render({
+            "user": {
+                "firstname": (user.get_name().split())[0],
+                "togglURL": user.get_toggl_url(),
+                "hourflag": (minimum_hours_for_range - hours_worked) > 1
+            },
+            "hours_worked": str.format("{:15.2f}", hours_worked),
+            "hours_missing": str.format("{:15.2f}", (minimum_hours_for_range - hours_worked)),
+            "minimum_hours_for_range": minimum_hours_for_range,
+            "percent_worked": hours_worked / minimum_hours_for_range * 100,
+            "start_date": start_date.strftime('%d-%m-%Y'),
+            "end_date": end_date.strftime('%d-%m-%Y')
+        })
+
+
+def render_fragments(hours_alert, start_date, end_date, users, minimum_hours_for_range):
+    for n, user in enumerate(users):
+        hours_alert.render_hours_not_met(start_date, end_date, user, n % 37, minimum_hours_for_range)
+
+
+def compile_templates(template_configs):
+    hours_alert = HoursAlert(VIEWS_PATH, None, {'staff': CONFIGS['staff'], 'templates': template_configs})
+    for name in ['emails/hours_alert.html', 'emails/hours_alert_header.html', 'emails/hours_alert_reminder.html', 'emails/hours_summary.html']:
+        hours_alert.get_template(name)
+
+
+def main(recipients):
+    start_date = datetime.datetime(2014, 1, 6)
+    end_date = datetime.datetime(2014, 1, 12)
+    users = build_users(recipients)
+
+    full_env = jinja2.Environment(loader=jinja2.DictLoader({'hours_alert.html': full_alert_source()}))
+    render_full(full_env, start_date, end_date, users[:10], 37.5)
+    start = time.time()
+    render_full(full_env, start_date, end_date, users, 37.5)
+    full_time = time.time() - start
+
+    hours_alert = HoursAlert(VIEWS_PATH, None, CONFIGS)
+    render_fragments(hours_alert, start_date, end_date, users[:10], 37.5)
+    start = time.time()
+    render_fragments(hours_alert, start_date, end_date, users, 37.5)
+    fragments_time = time.time() - start
+
+    cache_dir = tempfile.mkdtemp()
+    try:
+        start = time.time()
+        compile_templates({'bytecode_cache_dir': cache_dir})
+        cold_time = time.time() - start
+        start = time.time()
+        compile_templates({'bytecode_cache_dir': cache_dir})
+        warm_time = time.time() - start
+    finally:
+        shutil.rmtree(cache_dir)
+
+    per_thousand = 1000.0 / recipients
+    print "%d recipients" % recipients
+    print "{:32}".format("full render per 1000") + "{:10.2f}".format(full_time * per_thousand * 1000) + " ms"
+    print "{:32}".format("fragment render per 1000") + "{:10.2f}".format(fragments_time * per_thousand * 1000) + " ms"
+    print "{:32}".format("compile, empty bytecode cache") + "{:10.2f}".format(cold_time * 1000) + " ms"
+    print "{:32}".format("compile, warm bytecode cache") + "{:10.2f}".format(warm_time * 1000) + " ms"
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,58 @@
+'''
+Description: Runs check.py, with its TogglClientApi replaced by a client of a local FakeToggl (tests/fakes/toggl_fake.py)
+Usage: Started by bench_e2e in its own process, so the peak memory of the run can be measured
+    FAKE_TOGGL_URL=http://127.0.0.1:port python -m benchmarks.run_check config.yml --report=run_report.json
+Once check.py is done, the peak RSS of the run is added to the run report as peak_rss_kb.
+'''
+import os
+import sys
+import imp
+import json
+import runpy
+import resource
+
+from tests.fakes.toggl_fake import TogglHttpClient
+
+
+class TogglClientApi(TogglHttpClient):
+
+    def __init__(self, settings):
+        url = os.environ['FAKE_TOGGL_URL']
+        TogglHttpClient.__init__(self, settings, url + '/api/v8', url + '/reports/api/v2')
+
+
+'''
+Description: Makes 'from toggle_client_api.api_client import TogglClientApi' import the FakeToggl client
+'''
+def install_client():
+    package = imp.new_module('toggle_client_api')
+    api_client = imp.new_module('toggle_client_api.api_client')
+    api_client.TogglClientApi = TogglClientApi
+    package.api_client = api_client
+    sys.modules['toggle_client_api'] = package
+    sys.modules['toggle_client_api.api_client'] = api_client
+
+
+'''
+Return: The peak resident memory of this process and its children, in KB (ru_maxrss is in KB on Linux)
+'''
+def get_peak_rss_kb():
+    return max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+
+
+def main(arguments):
+    install_client()
+    sys.argv = ['check.py'] + arguments
+    runpy.run_path('check.py', run_name='__main__')
+
+    report_path = next((argument.split('=', 1)[1] for argument in arguments if argument.startswith('--report=')), None)
+    if report_path:
+        with open(report_path) as report_file:
+            report = json.load(report_file)
+        report['peak_rss_kb'] = get_peak_rss_kb()
+        with open(report_path, 'w') as report_file:
+            json.dump(report, report_file, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -3,12 +3,18 @@
 
 # HOLIDAYS - THE YAML FILE TO EXTRACT HOLIDAYS FROM - EITHER A URL OR A FILEPATH IS ACCEPTABLE
 echo `heroku config:set HOLIDAY_CONFIG_PATH='your_path_or_url_here' --app your-app-name `
+# (OPTIONAL) WHERE THE PARSED HOLIDAYS ARE KEPT, AND THE SECONDS BEFORE A URL IS CHECKED FOR CHANGES
+# echo `heroku config:set HOLIDAY_SNAPSHOT_PATH='/tmp/alma_holidays.pickle' --app your-app-name `
+# echo `heroku config:set HOLIDAY_MAX_AGE=3600 --app your-app-name `
 
 # SMTP - THE SMTP DETAILS FOR YOUR MAIL PROVIDER
 echo `heroku config:set SMTP_HOST='smtp.yourhost.com' --app your-app-name `
 echo `heroku config:set SMTP_PORT='1234' --app your-app-name`
 echo `heroku config:set SMTP_USERNAME='your_username' --app your-app-name`
 echo `heroku config:set SMTP_PASSWORD='your_password' --app your-app-name`
+echo `heroku config:set SMTP_BATCH_SIZE=50 --app your-app-name`
+echo `heroku config:set SMTP_POOL_SIZE=1 --app your-app-name`
+echo `heroku config:set SMTP_RATE_LIMIT=0 --app your-app-name`
 
 # DATE RESTRICTION - THE DAY AND HOUR OF THE WEEK THAT THE SCRIPT IS RESTRICTED TO. SET FLAG TO FALSE TO ENABLE MANUAL MODE
 echo `heroku config:set DATE_RESTRICT_FLAG=False --app your-app-name`
@@ -22,9 +28,24 @@ echo `heroku config:set SENDMAIL_FLAG=False --app your-app-name`
 echo `heroku config:set TOGGL_TOKEN='your_token' --app your-app-name`
 echo `heroku config:set TOGGL_USER_AGENT='your_user_agent' --app your-app-name`
 echo `heroku config:set TOGGL_WORKSPACE_ID=12345 --app your-app-name`
+echo `heroku config:set TOGGL_CONCURRENCY=8 --app your-app-name`
+echo `heroku config:set TOGGL_BULK_FETCH=True --app your-app-name`
+echo `heroku config:set TOGGL_MAX_RETRIES=4 --app your-app-name`
+echo `heroku config:set TOGGL_RATE_LIMIT=1 --app your-app-name`
+echo `heroku config:set TOGGL_BURST=3 --app your-app-name`
+# echo `heroku config:set TOGGL_POOL_SIZE=8 --app your-app-name`
+
+# CACHE - (OPTIONAL) THE SQLITE FILE TOGGL RESPONSES ARE CACHED IN. LEAVE UNSET TO DISABLE CACHING
+# echo `heroku config:set TOGGL_CACHE_PATH='toggl_cache.sqlite' --app your-app-name`
+
+# STATE - (OPTIONAL) THE SQLITE FILE THE COMPUTED WEEKS ARE STORED IN. LEAVE UNSET TO COMPUTE EVERY WEEK AGAIN
+# echo `heroku config:set STATE_PATH='weekly_state.sqlite' --app your-app-name`
 
 # ADMIN - THE EMAIL ADDRESSES OF ADMINS WHO SHOULD NOT BE INCLUDED IN THE REPORT - YOU CAN ADD AS MANY EMAILS AS NEEEDED
 echo `heroku config:set ADMIN_EMAIL='["some_admin_user@somehost.com", "another_admin_user@somehost.com"]' --app your-app-name`
+# (OPTIONAL) MORE MEMBERS TO LEAVE OUT OF THE REPORT - JSON LISTS OF E-MAILS, E-MAIL DOMAINS, TOGGL USER IDS, TOGGL GROUP IDS AND ROLES (admin OR user)
+# echo `heroku config:set EXCLUDE_DOMAINS='["agency.com"]' --app your-app-name`
+# echo `heroku config:set EXCLUDE_UIDS='[1234567]' --app your-app-name`
 
 # STAFF - THE EMAIL ADDRESSES OF STAFF
 echo `heroku config:set STAFF_EMAIL_ROLE_STAFF_RESOURCE='person_who_gets_cc_of_missing_hour_reports@somehost.com' --app your-app-name`
@@ -25,6 +25,20 @@ def get_day_previous_week(day=0):
     last_weekday_datetime = now_datetime + relativedelta(days=weekday_num_difference, weeks=-1, weekday=day)
     return last_weekday_datetime
 
+'''
+Description: Splits a date range into the weeks that cover it. A week is defined as being from Monday to Sunday.
+Parameters: start_date [datetime], end_date [datetime] (the first and last day of the range)
+Return: A list of (Monday [datetime], Sunday [datetime]) tuples at midnight, from the week containing start_date, to the week containing end_date
+Usage: Useful when backfilling the reports of many past weeks at once
+'''
+def get_weeks_in_range(start_date, end_date):
+    monday = datetime.datetime(start_date.year, start_date.month, start_date.day) - datetime.timedelta(days=start_date.weekday())
+    weeks = []
+    while monday <= end_date:
+        weeks.append((monday, monday + datetime.timedelta(days=6)))
+        monday = monday + datetime.timedelta(weeks=1)
+    return weeks
+
 '''
 Description: Converts integer day of the month to ordinal day. Example: 5 becomes 5th
 Parameter: An integer, representing the current day of the month.
@@ -1,8 +1,262 @@
 import jinja2
 from jinja2 import Environment
-import sys
+import os
+import time
+import Queue
+import socket
+import smtplib
+import threading
 from email.mime.text import MIMEText
 from libs.date_functions import ordinal
+from libs.invoke_report.run_timer import NULL_TIMER
+
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_POOL_SIZE = 1
+DEFAULT_RATE_LIMIT = 0
+
+'''
+Description: Opens a logged in SMTP connection
+Parameters: smtp_configs (the smtp configurations - host, username and password are used.
+    If ssl is False, a plain connection is opened to host and port, and the login is skipped when there is no username)
+Return: A logged in SMTP connection
+'''
+def connect_smtp(smtp_configs):
+    if smtp_configs.get('ssl', True) is True:
+        email_conn = smtplib.SMTP_SSL(smtp_configs['host'])
+    else:
+        email_conn = smtplib.SMTP(smtp_configs['host'], int(smtp_configs['port']))
+    email_conn.set_debuglevel(False)
+    if smtp_configs.get('ssl', True) is True or smtp_configs['username']:
+        email_conn.login(smtp_configs['username'], smtp_configs['password'])
+    return email_conn
+
+'''
+Description: Creates the queue that e-mails are sent through. With a pool_size above 1, e-mails are sent concurrently over a pool of connections.
+Parameters: smtp_configs (the smtp configurations - batch_size, pool_size and rate_limit are used)
+    timer [RunTimer] (optional - times the sending of the e-mails)
+Return: A MailQueue, or a MailPool
+'''
+def create_mail_queue(smtp_configs, timer=None):
+    connect = lambda: connect_smtp(smtp_configs)
+    pool_size = int(smtp_configs.get('pool_size', DEFAULT_POOL_SIZE))
+    if pool_size > 1:
+        return MailPool(connect, pool_size, smtp_configs.get('rate_limit', DEFAULT_RATE_LIMIT), timer=timer)
+
+    return MailQueue(connect, smtp_configs.get('batch_size', DEFAULT_BATCH_SIZE), timer=timer)
+
+'''
+Description: Queues e-mails, and sends them in batches over a single SMTP connection. The connection is kept alive between batches,
+and is transparently re-opened if it was dropped. The outcome of every recipient is recorded, instead of a failure ending the run.
+Usage: Messages are queued with enqueue, and are sent once a batch is full. flush sends what is left in the queue, and close ends the connection.
+The outcome of each recipient can be read from results, as (recipient, sent, error) tuples
+'''
+class MailQueue:
+
+    '''
+    Parameters: connect (a function that returns a logged in SMTP connection)
+        batch_size (the amount of messages queued before they are sent)
+        max_retries (the amount of times a message is retried after the connection dropped)
+        timer [RunTimer] (optional - records the time spent sending, and the send time of every message)
+    '''
+    def __init__(self, connect, batch_size=DEFAULT_BATCH_SIZE, max_retries=DEFAULT_MAX_RETRIES, timer=None):
+        self.connect = connect
+        self.batch_size = max(1, int(batch_size))
+        self.max_retries = max_retries
+        self.timer = timer or NULL_TIMER
+        self.email_conn = None
+        self.queue = []
+        self.results = []
+
+    '''
+    Description: Queues a message to be sent. Sends the queued messages once a batch is full.
+    Parameters: from_email, recipients (a list of e-mail addresses), msg [MIMEText]
+    '''
+    def enqueue(self, from_email, recipients, msg):
+        self.queue.append((from_email, recipients, msg.as_string()))
+        if len(self.queue) >= self.batch_size:
+            self.flush()
+
+    '''
+    Description: Sends every queued message, over the same connection
+    Return: The (recipient, sent, error) results of every message sent so far
+    '''
+    def flush(self):
+        if not self.queue:
+            return self.results
+
+        batch = self.queue
+        self.queue = []
+        with self.timer.stage('sending'):
+            self.keep_alive()
+            for from_email, recipients, msg_string in batch:
+                self.send(from_email, recipients, msg_string)
+
+        return self.results
+
+    '''
+    Description: Sends a single message, re-opening the connection and retrying if it was dropped. Records the outcome of every recipient.
+    '''
+    def send(self, from_email, recipients, msg_string):
+        start = time.time()
+        try:
+            return self.send_with_retries(from_email, recipients, msg_string)
+        finally:
+            self.timer.record('smtp_send', time.time() - start)
+
+    def send_with_retries(self, from_email, recipients, msg_string):
+        attempt = 0
+        while True:
+            try:
+                if self.email_conn is None:
+                    self.email_conn = self.connect()
+                refused = self.email_conn.sendmail(from_email, recipients, msg_string)
+            except (smtplib.SMTPServerDisconnected, socket.error), exc:
+                self.email_conn = None
+                attempt = attempt + 1
+                if attempt > self.max_retries:
+                    self.record(recipients, {}, exc)
+                    return False
+                continue
+            except smtplib.SMTPRecipientsRefused, exc:
+                self.record(recipients, exc.recipients, None)
+                return False
+            except Exception, exc:
+                self.record(recipients, {}, exc)
+                return False
+
+            self.record(recipients, refused, None)
+            return len(refused) == 0
+
+    '''
+    Description: Records the outcome of each recipient of a message
+    Parameters: recipients, refused (a dict of the recipients the server refused), error (the error that stopped the message being sent, if any)
+    '''
+    def record(self, recipients, refused, error):
+        for recipient in recipients:
+            if error is not None:
+                self.results.append((recipient, False, str(error)))
+            elif recipient in refused:
+                self.results.append((recipient, False, str(refused[recipient])))
+            else:
+                self.results.append((recipient, True, None))
+
+    '''
+    Description: Checks that the open connection is still alive, and drops it if it is not, so that the next message re-opens it
+    '''
+    def keep_alive(self):
+        if self.email_conn is None:
+            return
+
+        try:
+            status = self.email_conn.noop()[0]
+        except (smtplib.SMTPException, socket.error):
+            status = None
+
+        if status != 250:
+            self.email_conn = None
+
+    '''
+    Return: The (recipient, error) of every recipient that could not be e-mailed
+    '''
+    def get_failures(self):
+        return [(recipient, error) for recipient, sent, error in self.results if sent is not True]
+
+    '''
+    Description: Sends what is left in the queue, and closes the connection
+    '''
+    def close(self):
+        self.flush()
+        if self.email_conn is not None:
+            try:
+                self.email_conn.quit()
+            except (smtplib.SMTPException, socket.error):
+                pass
+            self.email_conn = None
+
+'''
+Description: Sends e-mails concurrently over a pool of SMTP connections. Every connection is handled by its own worker thread,
+which keeps the connection alive, re-opens it if it drops, and sends no faster than rate_limit e-mails per second.
+Usage: Used in place of a MailQueue when there are many e-mails to send. The outcome of each recipient can be read from results
+once the pool has been flushed or closed.
+'''
+class MailPool(MailQueue):
+
+    '''
+    Parameters: connect (a function that returns a logged in SMTP connection)
+        pool_size (the amount of connections e-mails are sent over)
+        rate_limit (the maximum e-mails per second sent over each connection. 0 for no limit)
+        max_retries (the amount of times an e-mail is retried after the connection dropped)
+        timer [RunTimer] (optional - records the time spent waiting on the pool, and the send time of every message)
+    '''
+    def __init__(self, connect, pool_size, rate_limit=DEFAULT_RATE_LIMIT, max_retries=DEFAULT_MAX_RETRIES, timer=None):
+        MailQueue.__init__(self, connect, 1, max_retries, timer)
+        self.pool_size = max(1, int(pool_size))
+        self.send_interval = 1.0 / rate_limit if rate_limit else 0
+        self.queue = Queue.Queue()
+        self.workers = []
+        self.threads = []
+
+    '''
+    Description: Queues an e-mail to be sent by the next free connection. The worker threads are started with the first e-mail.
+    '''
+    def enqueue(self, from_email, recipients, msg):
+        self.start()
+        self.queue.put((from_email, recipients, msg.as_string()))
+
+    def start(self):
+        if self.threads:
+            return
+
+        for n in range(self.pool_size):
+            worker = MailQueue(self.connect, 1, self.max_retries, self.timer)
+            thread = threading.Thread(target=self.work, args=(worker,))
+            thread.daemon = True
+            thread.start()
+            self.workers.append(worker)
+            self.threads.append(thread)
+
+    '''
+    Description: Sends e-mails from the queue over the connection of worker, until the pool is closed
+    '''
+    def work(self, worker):
+        last_sent = 0
+        while True:
+            message = self.queue.get()
+            try:
+                if message is None:
+                    return
+
+                wait = last_sent + self.send_interval - time.time()
+                if wait > 0:
+                    time.sleep(wait)
+                last_sent = time.time()
+                worker.send(*message)
+            finally:
+                self.queue.task_done()
+
+    '''
+    Description: Waits for every queued e-mail to be sent
+    Return: The (recipient, sent, error) results of every e-mail sent so far
+    '''
+    def flush(self):
+        with self.timer.stage('sending'):
+            self.queue.join()
+        self.results = [result for worker in self.workers for result in worker.results]
+        return self.results
+
+    '''
+    Description: Sends what is left in the queue, stops the worker threads, and closes their connections
+    '''
+    def close(self):
+        self.flush()
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        for worker in self.workers:
+            worker.close()
+        self.threads = []
 
 '''
 Description: Handles e-mailing as well as e-mail preparation. Fires off missing hours emails, as well as a summary email.
@@ -11,29 +265,98 @@ Usage: Useful when iterating on users from a mailing list, to send emails to the
 class HoursAlert:
 
     template_env = None
-    email_conn = None
+    mail_queue = None
 
-    def __init__(self, views_path, email_conn, configs):
-        templateLoader = jinja2.FileSystemLoader(searchpath=views_path)
-        self.template_env = Environment(loader=templateLoader)
-        self.email_conn = email_conn
+    '''
+    Parameters: views_path (the folder containing the e-mail templates), mail_queue [MailQueue] (the queue e-mails are sent through)
+        configs (the configurations - the staff e-mail addresses, and the optional templates options are used)
+        timer [RunTimer] (optional - records the time spent rendering e-mails)
+        template_env [Environment] (optional - a template environment shared with other HoursAlerts. Created from views_path if not given)
+    '''
+    def __init__(self, views_path, mail_queue, configs, timer=None, template_env=None):
+        self.timer = timer or NULL_TIMER
+        self.template_env = template_env or HoursAlert.create_template_env(views_path, configs.get('templates') or {})
+        self.mail_queue = mail_queue
         self.email_role_staff_resource = configs['staff']['email_role_staff_resource']
         self.email_role_group_leads = configs['staff']['email_role_group_leads']
         self.from_email = configs['staff']['from_email']
+        self.templates = {}
+        self.run_fragments = {}
+
+    '''
+    Description: Creates the template environment. Compiled templates are kept in a bytecode cache on disk, so they are only compiled
+    again when the template changes. Templates are not checked for changes while the system runs.
+    Parameters: views_path (the folder containing the e-mail templates)
+        template_configs (the templates configurations - bytecode_cache_dir is used. Defaults to the temp folder of the system)
+    '''
+    @staticmethod
+    def create_template_env(views_path, template_configs):
+        templateLoader = jinja2.FileSystemLoader(searchpath=views_path)
+        if template_configs.get('bytecode_cache_dir'):
+            if not os.path.isdir(template_configs['bytecode_cache_dir']):
+                os.makedirs(template_configs['bytecode_cache_dir'])
+            bytecode_cache = jinja2.FileSystemBytecodeCache(template_configs['bytecode_cache_dir'])
+        else:
+            bytecode_cache = jinja2.FileSystemBytecodeCache()
+
+        return Environment(loader=templateLoader, bytecode_cache=bytecode_cache, auto_reload=False)
+
+    '''
+    Return: The compiled template. Each template is only loaded once.
+    '''
+    def get_template(self, name):
+        if name not in self.templates:
+            self.templates[name] = self.template_env.get_template(name)
+        return self.templates[name]
+
+    '''
+    Description: Renders the parts of the missing hours e-mail that are the same for every employee - the header, the reminder of the
+    minimum hours, the date strings and the subject. They are rendered once per reporting period.
+    Return: A dict of the rendered fragments
+    '''
+    def get_run_fragments(self, start_date, end_date, minimum_hours_for_range):
+        key = (start_date, end_date, minimum_hours_for_range)
+        if key not in self.run_fragments:
+            run_vars = {"minimum_hours_for_range": minimum_hours_for_range}
+            self.run_fragments[key] = {
+                "header": self.get_template('emails/hours_alert_header.html').render(run_vars),
+                "reminder": self.get_template('emails/hours_alert_reminder.html').render(run_vars),
+                "minimum_hours_for_range": minimum_hours_for_range,
+                "start_date": start_date.strftime('%d-%m-%Y'),
+                "end_date": end_date.strftime('%d-%m-%Y'),
+                "subject": "Looks like you didn't log all your hours for the week ending " + end_date.strftime('%Y-%m-%d')
+            }
+        return self.run_fragments[key]
 
     '''
     Description: Sends out a summary email, containing a summary table of the hours worked by each employee over the previous week
     Parameters: start_date [YYYY-MM-DD], end_date [YYYY-MM-DD] (date range of the previous week, or desired reporting period)
-        users_list (list of all employees - used to generate the summary table)
+        users_list (list of the User of every employee - used to generate the summary table)
         minimum_hours_for_range (the minimum hours that an employee must work for the given date period specified by start_date and end_date)
-    Usage: Used to send out a summary report.
+    Usage: Used to send out a summary report. The e-mail is queued in the mail queue, and sent once the queue is flushed.
     '''
     def send_hours_summary(self, start_date, end_date, users_list, minimum_hours_for_range, do_send=True):
 
         if do_send is not True:
             return False
 
-        template = self.template_env.get_template('emails/hours_summary.html')
+        with self.timer.stage('rendering'):
+            body = self.render_hours_summary(start_date, end_date, users_list, minimum_hours_for_range)
+
+        msg = MIMEText(body, 'html')
+        msg['Subject'] = "Team Hours Summary for Week ending " + end_date.strftime('%Y-%m-%d')
+        msg['From'] = 'alma@invokelabs.com'
+        msg['To'] = self.email_role_staff_resource
+        self.mail_queue.enqueue(msg['From'], [msg['To']], msg)
+        return True
+
+    '''
+    Description: Renders the summary e-mail
+    Parameters: the same as send_hours_summary
+    Return: The html body of the e-mail
+    '''
+    def render_hours_summary(self, start_date, end_date, users_list, minimum_hours_for_range):
+        template = self.get_template('emails/hours_summary.html')
         template_vars = {
             "users_list": users_list,
             "minimum_hours_for_range": minimum_hours_for_range,
@@ -45,66 +368,50 @@ class HoursAlert:
             "end_dayMonth": ordinal(int(end_date.strftime("%d")))
 
         }
-        body = template.render(template_vars)
-
-        try:
-            msg = MIMEText(body, 'html')
-            msg['Subject'] = "Team Hours Summary for Week ending " + end_date.strftime('%Y-%m-%d')
-            msg['From'] = 'alma@invokelabs.com'
-            msg['To'] = self.email_role_staff_resource
-            conn = self.email_conn
-            try:
-                conn.sendmail(msg['From'], msg['To'], msg.as_string())
-            finally:
-                return True
-
-        except Exception, exc:
-            sys.exit("mail failed; %s" % str(exc))  # give a error message
+        return template.render(template_vars)
 
     '''
     Description: Sends an e-mail to an employee who has not met their quota of hours, describing how many they need, and providing a link to the report of their hours
     Parameters: start_date [YYYY-MM-DD], end_date [YYYY-MM-DD] (The range of the report desired (usually last Monday to Sunday))
-        user (The employee that will be e-mailed. The employee should not have met their hour quota for the previous week)
+        user [User] (The employee that will be e-mailed. The employee should not have met their hour quota for the previous week)
         hours_worked (The amount of hours that the employee worked in the date range specified by start_date and end_date
         minimum_hours_for_range (The minimum hours that the employee is required to work for the date range specified by start_date and end_date)
-    Usage: Used when iterating through a mailing list of all users who have not tracked enough hours
+    Usage: Used when iterating through a mailing list of all users who have not tracked enough hours. The e-mail is queued in the mail queue,
+    and sent once the queue is flushed.
     '''
     def send_hours_not_met(self, start_date, end_date, user, hours_worked, minimum_hours_for_range, do_send=True):
         if do_send is not True:
             return False
 
-        print "Emailing: " + user['name'] + " at " + user['email'] + " CC: " + self.email_role_staff_resource
-        user["firstname"] = (user["name"].split())[0]
+        print "Emailing: " + user.get_name() + " at " + user.get_email() + " CC: " + self.email_role_staff_resource
+        with self.timer.stage('rendering'):
+            body = self.render_hours_not_met(start_date, end_date, user, hours_worked, minimum_hours_for_range)
 
-        #Used to fix the plural form of hour(s) in the email
-        if (minimum_hours_for_range - hours_worked) > 1:
-            user["hourflag"] = 1
+        msg = MIMEText(body, 'html')
+        msg['Subject'] = self.get_run_fragments(start_date, end_date, minimum_hours_for_range)["subject"]
+        msg['From'] = self.from_email
 
-        template = self.template_env.get_template('emails/hours_alert.html')
-        template_vars = {
-            "user": user,
-            "hours_worked": str.format("{:15.2f}", hours_worked),
-            "hours_missing": str.format("{:15.2f}", (minimum_hours_for_range - hours_worked)),
-            "minimum_hours_for_range": minimum_hours_for_range,
-            "percent_worked": hours_worked / minimum_hours_for_range * 100,
-            "start_date": start_date.strftime('%d-%m-%Y'),
-            "end_date": end_date.strftime('%d-%m-%Y')
-        }
-        body = template.render(template_vars)
+        msg['To'] = user.get_email()
+        msg['cc'] = self.email_role_group_leads
 
-        try:
-            msg = MIMEText(body, 'html')
-            msg['Subject'] = "Looks like you didn't log all your hours for the week ending " + end_date.strftime('%Y-%m-%d')
-            msg['From'] = self.from_email
+        self.mail_queue.enqueue(msg['From'], [msg['To'], msg['cc']], msg)
+        return True
 
-            msg['To'] = user['email']
-            msg['cc'] = self.email_role_group_leads
+    '''
+    Description: Renders the missing hours e-mail of an employee. Only the parts that differ between employees are rendered,
+    the rest comes from the fragments rendered once per reporting period.
+    Parameters: the same as send_hours_not_met
+    Return: The html body of the e-mail
+    '''
+    def render_hours_not_met(self, start_date, end_date, user, hours_worked, minimum_hours_for_range):
+        template_vars = dict(self.get_run_fragments(start_date, end_date, minimum_hours_for_range))
+        template_vars["firstname"] = (user.get_name().split())[0]
+        template_vars["toggl_url"] = user.get_toggl_url()
 
-            conn = self.email_conn
-            try:
-                conn.sendmail(msg['From'], [msg['To'], msg['cc']], msg.as_string())
-            finally:
-                return True
+        #Used to fix the plural form of hour(s) in the email
+        template_vars["hourflag"] = (minimum_hours_for_range - hours_worked) > 1
+        template_vars["hours_worked"] = str.format("{:15.2f}", hours_worked)
+        template_vars["hours_missing"] = str.format("{:15.2f}", (minimum_hours_for_range - hours_worked))
+        template_vars["percent_worked"] = hours_worked / minimum_hours_for_range * 100
 
-        except Exception, exc:
-            sys.exit("mail failed; %s" % str(exc))  # give a error message
+        return self.get_template('emails/hours_alert.html').render(template_vars)
@@ -0,0 +1,91 @@
+import os
+import time
+import errno
+import pickle
+import hashlib
+import logging
+
+SNAPSHOT_VERSION = 1
+
+'''
+Description: Caches the parsed configuration file in a pickle snapshot, keyed by the path, modification time and hash of the file. While the
+modification time and size are unchanged, the snapshot is used without reading the file, and yaml is not even imported. A file that was
+touched but not changed is matched by its hash, and only a changed file is parsed again. The snapshot holds the SMTP password and Toggl
+token, so it is only written when a snapshot_path is given - never to a shared folder by default.
+Usage: Used by Loadup, in place of parsing the configuration file every run
+    configs = ConfigCache(snapshot_path).load(open(config_path, 'r'))
+'''
+class ConfigCache:
+
+    '''
+    Parameters: snapshot_path (optional - the file the parsed configurations are stored in. Nothing is cached if not given)
+    '''
+    def __init__(self, snapshot_path=None):
+        self.snapshot_path = snapshot_path
+
+    '''
+    Parameters: config_stream (the open configuration file. It is closed once it is read)
+    Return: The parsed configurations
+    '''
+    def load(self, config_stream):
+        try:
+            path = os.path.abspath(config_stream.name)
+            stat = os.fstat(config_stream.fileno())
+            snapshot = self.read_snapshot(path)
+            if snapshot is not None and snapshot['mtime'] == stat.st_mtime and snapshot['size'] == stat.st_size:
+                return snapshot['configs']
+
+            content = config_stream.read()
+        finally:
+            config_stream.close()
+
+        digest = hashlib.sha1(content).hexdigest()
+        if snapshot is not None and snapshot['hash'] == digest:
+            configs = snapshot['configs']
+        else:
+            import yaml
+            configs = yaml.load(content)
+        self.write_snapshot(path, stat, digest, configs)
+        return configs
+
+    '''
+    Return: The snapshot of the configuration file at path, or None if there is no readable snapshot
+    '''
+    def read_snapshot(self, path):
+        if not self.snapshot_path:
+            return None
+        try:
+            with open(self.snapshot_path, 'rb') as snapshot_file:
+                # A snapshot written by another user is never unpickled
+                if os.fstat(snapshot_file.fileno()).st_uid != os.getuid():
+                    return None
+                snapshot = pickle.load(snapshot_file)
+        except (IOError, EOFError, pickle.UnpicklingError, ValueError, TypeError, AttributeError, ImportError):
+            return None
+
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION or snapshot.get('path') != path:
+            return None
+        return snapshot
+
+    '''
+    Description: Writes the snapshot to a temporary file first, then renames it, so a run never reads a partly written snapshot.
+    The snapshot holds the SMTP password and Toggl token, so it is only readable by its owner
+    '''
+    def write_snapshot(self, path, stat, digest, configs):
+        if not self.snapshot_path:
+            return
+
+        snapshot = {'version': SNAPSHOT_VERSION, 'path': path, 'mtime': stat.st_mtime, 'size': stat.st_size, 'hash': digest,
+                    'cached_at': time.time(), 'configs': configs}
+        temporary_path = self.snapshot_path + '.' + str(os.getpid())
+        try:
+            with os.fdopen(os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600), 'wb') as snapshot_file:
+                pickle.dump(snapshot, snapshot_file, pickle.HIGHEST_PROTOCOL)
+            os.rename(temporary_path, self.snapshot_path)
+        except (IOError, OSError), exc:
+            logging.warn("Could not write the configurations snapshot to " + self.snapshot_path + "; %s" % str(exc))
+            try:
+                os.remove(temporary_path)
+            except OSError, remove_exc:
+                if remove_exc.errno != errno.ENOENT:
+                    raise
@@ -0,0 +1,176 @@
+'''
+Description: The fields of the configurations - their type, whether they are required, and the range of numbers. Every field is checked in
+one pass, and every problem is reported at once. Values are coerced to their type, so configurations from environment variables, which are
+all strings, are the same as configurations from YAML - 'False' becomes False, and '1234' becomes 1234
+Usage: Used by Loadup once the configurations are loaded
+    configs = ConfigSchema.coerce(configs)
+'''
+
+# (section, field, type, required, minimum, maximum). A section of None is a top level field
+FIELDS = [
+    (None, 'work_days', 'work_days', True, None, None),
+    (None, 'admin', 'collection', True, None, None),
+    (None, 'work_schedules', 'list', False, None, None),
+    ('smtp', 'host', 'text', True, None, None),
+    ('smtp', 'port', 'integer', True, 1, 65535),
+    ('smtp', 'username', 'text', True, None, None),
+    ('smtp', 'password', 'text', True, None, None),
+    ('smtp', 'batch_size', 'integer', False, 1, None),
+    ('smtp', 'pool_size', 'integer', False, 1, None),
+    ('smtp', 'rate_limit', 'number', False, 0, None),
+    ('smtp', 'ssl', 'boolean', False, None, None),
+    ('date_restrict', 'to_restrict', 'boolean', True, None, None),
+    ('date_restrict', 'weekday', 'integer', True, 0, 6),
+    ('date_restrict', 'hour', 'integer', True, 0, 23),
+    ('sendmail', 'to_send', 'boolean', True, None, None),
+    ('togglAPI', 'token', 'text', True, None, None),
+    ('togglAPI', 'user_agent', 'text', True, None, None),
+    ('togglAPI', 'workspace_id', 'integer', True, None, None),
+    ('togglAPI', 'concurrency', 'integer', False, 1, None),
+    ('togglAPI', 'bulk_fetch', 'boolean', False, None, None),
+    ('togglAPI', 'pool_size', 'integer', False, 1, None),
+    ('togglAPI', 'max_retries', 'integer', False, 0, None),
+    ('togglAPI', 'rate_limit', 'number', False, 0, None),
+    ('togglAPI', 'burst', 'integer', False, 1, None),
+    ('togglAPI', 'backoff_base', 'number', False, 0, None),
+    ('togglAPI', 'backoff_max', 'number', False, 0, None),
+    ('cache', 'path', 'text', True, None, None),
+    ('cache', 'max_entries', 'integer', False, 1, None),
+    ('cache', 'open_ttl', 'integer', False, 0, None),
+    ('cache', 'closed_ttl', 'integer', False, 0, None),
+    ('cache', 'closed_after_days', 'integer', False, 0, None),
+    ('state', 'path', 'text', True, None, None),
+    ('scheduler', 'last_run_path', 'text', True, None, None),
+    ('scheduler', 'catch_up', 'integer', False, 0, None),
+    ('exclude', 'emails', 'list', False, None, None),
+    ('exclude', 'domains', 'list', False, None, None),
+    ('exclude', 'uids', 'list', False, None, None),
+    ('exclude', 'groups', 'list', False, None, None),
+    ('exclude', 'roles', 'list', False, None, None),
+    ('staff', 'email_role_staff_resource', 'text', True, None, None),
+    ('staff', 'email_role_group_leads', 'text', True, None, None),
+    ('staff', 'from_email', 'text', True, None, None)
+]
+# Sections that are left out when they are not configured
+OPTIONAL_SECTIONS = ['cache', 'state', 'scheduler', 'exclude']
+TRUE_VALUES = ['true', 'yes', 'on', '1']
+FALSE_VALUES = ['false', 'no', 'off', '0']
+
+
+class ConfigSchema:
+
+    '''
+    Description: Checks and coerces every field of the configurations, and of every entry of the workspaces list. Workspace entries are
+    merged over the configurations, so their fields are all optional
+    Return: A copy of the configurations, with every field coerced to its type
+    Raises: ValueError listing every invalid field
+    '''
+    @staticmethod
+    def coerce(configs):
+        if not isinstance(configs, dict):
+            raise ValueError("Invalid configurations:\n  the configurations must be a mapping")
+
+        errors = []
+        coerced = ConfigSchema.coerce_fields(configs, True, '', errors)
+        if isinstance(configs.get('workspaces'), list):
+            coerced['workspaces'] = [
+                ConfigSchema.coerce_fields(workspace, False, 'workspaces ' + str(index + 1) + ': ', errors)
+                for index, workspace in enumerate(configs['workspaces'])
+            ]
+        elif configs.get('workspaces') is not None:
+            errors.append("workspaces: must be a list")
+
+        if errors:
+            raise ValueError("Invalid configurations:\n  " + "\n  ".join(errors))
+        return coerced
+
+    '''
+    Description: Coerces the fields of one set of configurations, adding the problems to errors
+    Parameters: configs (the configurations), required (False to treat every field as optional), prefix (the start of every error), errors
+    Return: A copy of the configurations, with the fields coerced to their type
+    '''
+    @staticmethod
+    def coerce_fields(configs, required, prefix, errors):
+        if not isinstance(configs, dict):
+            errors.append(prefix + "must be a mapping")
+            return configs
+
+        coerced = dict(configs)
+        checked_sections = set()
+        for section, field, field_type, field_required, minimum, maximum in FIELDS:
+            values = coerced
+            name = prefix + field
+            if section is not None:
+                name = prefix + section + " - " + field
+                if section not in checked_sections:
+                    # Sections are copied before they are coerced, so the nested dicts of the configurations are never changed
+                    checked_sections.add(section)
+                    if coerced.get(section) is None:
+                        if required and section not in OPTIONAL_SECTIONS:
+                            errors.append(prefix + section + ": is required")
+                    elif not isinstance(coerced[section], dict):
+                        errors.append(prefix + section + ": must be a mapping")
+                    else:
+                        coerced[section] = dict(coerced[section])
+                if not isinstance(coerced.get(section), dict):
+                    continue
+                values = coerced[section]
+
+            if values.get(field) is None:
+                if field_required and required:
+                    errors.append(name + ": is required")
+                continue
+
+            try:
+                values[field] = ConfigSchema.coerce_value(values[field], field_type, minimum, maximum)
+            except ValueError, exc:
+                errors.append(name + ": " + str(exc) + " (got " + repr(values[field]) + ")")
+
+        return coerced
+
+    '''
+    Return: The value coerced to the type
+    Raises: ValueError describing what the value must be
+    '''
+    @staticmethod
+    def coerce_value(value, field_type, minimum=None, maximum=None):
+        if field_type == 'text':
+            if isinstance(value, bool) or not isinstance(value, (basestring, int, long, float)):
+                raise ValueError("must be text")
+            return value if isinstance(value, basestring) else str(value)
+
+        if field_type == 'boolean':
+            if isinstance(value, bool):
+                return value
+            if isinstance(value, basestring) and value.strip().lower() in TRUE_VALUES + FALSE_VALUES:
+                return value.strip().lower() in TRUE_VALUES
+            raise ValueError("must be True or False")
+
+        if field_type == 'list':
+            if not isinstance(value, list):
+                raise ValueError("must be a list")
+            return value
+
+        if field_type == 'collection':
+            if not isinstance(value, (list, dict)):
+                raise ValueError("must be a list")
+            return value
+
+        if field_type == 'work_days':
+            if not isinstance(value, list) or not value:
+                raise ValueError("must be a list of days, from 0 (Sunday) to 6 (Saturday)")
+            return [ConfigSchema.coerce_value(day, 'integer', 0, 6) for day in value]
+
+        if isinstance(value, bool):
+            raise ValueError("must be a number")
+        try:
+            if field_type == 'integer':
+                number = int(value) if isinstance(value, (int, long)) else int(str(value).strip())
+            else:
+                number = float(value)
+        except (TypeError, ValueError):
+            raise ValueError("must be a whole number" if field_type == 'integer' else "must be a number")
+
+        if (minimum is not None and number < minimum) or (maximum is not None and number > maximum):
+            raise ValueError("must be " + ("from " + str(minimum) + " to " + str(maximum) if maximum is not None else "at least " + str(minimum)))
+        return number
@@ -1,8 +1,10 @@
 import datetime
 import os
-import yaml
 import json
 
+from libs.invoke_loadup.config_schema import ConfigSchema
+from libs.invoke_loadup.config_cache import ConfigCache
+
 '''
 Description: Sets the configuration for the system based on the command line arguments passed in
 Usage: Used at the beginning, when the script is run, in order to define the expected system behaviour
@@ -11,6 +13,9 @@ SMTP_HOST: smtp host
 SMTP_PORT: the smtp port
 SMTP_USERNAME: username for smtp
 SMTP_PASSWORD: password for smtp
+SMTP_BATCH_SIZE: (optional) the amount of e-mails queued before they are sent. Defaults to 50
+SMTP_POOL_SIZE: (optional) the amount of connections e-mails are sent over at the same time. Defaults to 1
+SMTP_RATE_LIMIT: (optional) the maximum e-mails per second sent over each connection. 0 for no limit. Defaults to 0
 
 DATE_RESTRICT_FLAG: True to restrict datetime that script can be run. False to allow manual execution
 DATE_RESTRICT_WEEKDAY: The weekday to restrict script execution to. 0 = Monday
@@ -21,9 +26,30 @@ SENDMAIL_FLAG: True to have the system send out mail. False to disable sending o
 TOGGL_TOKEN: toggl api token
 TOGGL_USER_AGENT: toggl api user agent
 TOGGL_WORKSPACE_ID: toggl workspace id
+TOGGL_CONCURRENCY: (optional) the maximum amount of toggl requests made at the same time. Defaults to 8
+TOGGL_CACHE_PATH: (optional) the SQLite file in which toggl responses are cached. No caching is done if not set
+TOGGL_CACHE_MAX_ENTRIES: (optional) the maximum amount of cached responses. Defaults to 10000
+TOGGL_CACHE_OPEN_TTL: (optional) the seconds that responses which can still change are cached for. Defaults to 3600
+TOGGL_CACHE_CLOSED_TTL: (optional) the seconds that responses for closed date ranges are cached for. Defaults to 2592000 (30 days)
+TOGGL_CACHE_CLOSED_AFTER_DAYS: (optional) the days after which a date range is considered closed. Defaults to 7
+TOGGL_BULK_FETCH: (optional) True to fetch the hours of the whole workspace in one request. False to make one request per user. Defaults to True
+TOGGL_POOL_SIZE: (optional) the amount of kept-alive connections toggl requests are sent over. Defaults to TOGGL_CONCURRENCY
+TOGGL_MAX_RETRIES: (optional) the amount of times a failed toggl request is retried. Defaults to 4
+TOGGL_RATE_LIMIT: (optional) the maximum toggl requests per second. 0 for no limit. Defaults to 1
+TOGGL_BURST: (optional) the amount of toggl requests that may be sent at once before the rate limit applies. Defaults to 3
+
+STATE_PATH: (optional) the SQLite file in which the computed weeks are stored. Weeks are not stored if not set
+
+SCHEDULER_LAST_RUN_PATH: (optional) the file scheduler.py keeps the time of its last run in, so runs missed by a restart are caught up.
+Nothing is caught up if not set
+
+CONFIG_SNAPSHOT_PATH: (optional) the file the parsed configuration file is cached in. It holds the SMTP password and Toggl token, so keep it in a
+private folder, such as next to the configuration file. The configuration file is parsed every run if not set
 
 ADMIN_EMAIL_1: an email of admin - emails wont be sent to the admin
 ADMIN_EMAIL_2: another email of another admin - emails wont be sent to this admin
+EXCLUDE_EMAILS, EXCLUDE_DOMAINS, EXCLUDE_UIDS, EXCLUDE_GROUPS, EXCLUDE_ROLES: (optional) JSON lists of the e-mails, e-mail domains, Toggl user ids,
+Toggl group ids and Toggl roles (admin or user) of members who are left out of the report
 
 STAFF_EMAIL_ROLE_STAFF_RESOURCE: email of the staff resource
 STAFF_EMAIL_ROLE_GROUP_LEADS: email of the group leads
@@ -35,12 +61,40 @@ class Loadup:
     '''
     def __init__(self, command_args):
         self.arguments = command_args
+        self.config_path = None
+        self.config_mtime = None
+        self.missing_variables = []
+        self.config_cache = ConfigCache(os.environ.get('CONFIG_SNAPSHOT_PATH') or None)
 
     '''
-    Description: Initialized the configuration options. Either loaded from YAML, or loaded from ENVIRONMENT
+    Description: Initialized the configuration options. Either loaded from YAML, or loaded from ENVIRONMENT. Every field is validated and
+    coerced to its type. Terminates the script, listing every invalid field, if the configurations are invalid
     '''
     def initialize_configs(self):
-        self.configs = self.create_config(self.arguments)
+        try:
+            self.configs = ConfigSchema.coerce(self.create_config(self.arguments))
+        except ValueError, exc:
+            print str(exc) + "\nSystem terminating"
+            quit()
+
+    '''
+    Description: Loads the configurations again, if their file changed since they were loaded. Used by long-running processes, such as
+    the scheduler. Configurations loaded from environment variables are never reloaded
+    Return: True if the configurations were loaded again, False if they did not change
+    Raises: ValueError listing every invalid field, if the changed configurations are invalid. The previous configurations are kept
+    '''
+    def reload(self):
+        if not self.config_path:
+            return False
+        try:
+            config_mtime = os.stat(self.config_path).st_mtime
+        except OSError:
+            return False
+        if config_mtime == self.config_mtime:
+            return False
+
+        self.configs = ConfigSchema.coerce(self.create_config(self.arguments))
+        return True
 
     '''
     Return: Dict containing all of the configurations
@@ -49,9 +103,13 @@ class Loadup:
         configs_yml_stream = self.load_configs(arguments)
 
         if configs_yml_stream is False:
+            self.config_path = None
             configs = self.generate_config_from_environment()
         else:
-            configs = yaml.load(configs_yml_stream)
+            # The parsed file is cached until it changes. yaml is only imported to parse a changed file, so most runs start faster
+            self.config_path = configs_yml_stream.name
+            self.config_mtime = os.fstat(configs_yml_stream.fileno()).st_mtime
+            configs = self.config_cache.load(configs_yml_stream)
 
         return configs
 
@@ -126,22 +184,38 @@ class Loadup:
 
     '''
     Return: If a config path has been passed in via command line, the path is returned. Otherwise, False is returned
+    Command line flags (arguments starting with --) are not considered to be config paths
     '''
     def get_config_path(self, arguments):
         try:
-            config_path = arguments[1]
+            config_path = [argument for argument in arguments[1:] if not argument.startswith('--')][0]
         except IndexError:
             config_path = False
 
         return config_path
 
+    '''
+    Description: Reads a flag from the command line arguments. Flags are passed in as --name or --name=value
+    Parameter: name (the name of the flag, without the leading --)
+    Return: The value of the flag if it has one, True if the flag was passed in without a value, False if it was not passed in
+    '''
+    def get_flag(self, name):
+        for argument in self.arguments[1:]:
+            if argument == '--' + name:
+                return True
+            if argument.startswith('--' + name + '='):
+                return argument.split('=', 1)[1]
+
+        return False
+
 
     '''
-    Description: Uses environment variables to generate a config dict
-    Return: A dict containing all configuration options
+    Description: Uses environment variables to generate a config dict. Every missing environment variable is listed at once
+    Return: A dict containing all configuration options. Terminates the script if a required environment variable is missing
     '''
     def generate_config_from_environment(self):
         configs = {}
+        self.missing_variables = []
 
         #Default options
         work_days = [1, 2, 3, 4, 5]
@@ -153,87 +227,140 @@ class Loadup:
         configs['togglAPI'] = self.generate_toggl_api_configs()
         configs['admin'] = self.generate_admin_configs()
         configs['staff'] = self.generate_staff_configs()
+        if 'TOGGL_CACHE_PATH' in os.environ:
+            configs['cache'] = self.generate_cache_configs()
+        if 'STATE_PATH' in os.environ:
+            configs['state'] = {'path': os.environ['STATE_PATH']}
+        if 'SCHEDULER_LAST_RUN_PATH' in os.environ:
+            configs['scheduler'] = {'last_run_path': os.environ['SCHEDULER_LAST_RUN_PATH']}
+        exclude_configs = self.generate_exclude_configs()
+        if exclude_configs:
+            configs['exclude'] = exclude_configs
+
+        if self.missing_variables:
+            print "Please ensure that these environment variables are configured: " + ", ".join(self.missing_variables) + ". System terminating"
+            quit()
 
         return configs
 
+    '''
+    Return: The value of a required environment variable. A missing variable is added to missing_variables, and None is returned
+    '''
+    def get_environment(self, name):
+        if name not in os.environ:
+            self.missing_variables.append(name)
+            return None
+        return os.environ[name]
+
+    '''
+    Description: Adds the optional environment variables that are set to configs. The values are coerced to their type by ConfigSchema
+    Parameters: configs (the dict to add to), names (a dict of config keys to environment variable names)
+    '''
+    @staticmethod
+    def add_optional_environment(configs, names):
+        for key, name in sorted(names.items()):
+            if name in os.environ:
+                configs[key] = os.environ[name]
+
     '''
     Return: Date configurations from environment variables
     '''
     def generate_date_configs(self):
-        try:
-            date_configs = {}
-            date_configs['to_restrict'] = os.environ['DATE_RESTRICT_FLAG']
-            date_configs['weekday'] = os.environ['DATE_RESTRICT_WEEKDAY']
-            date_configs['hour'] = os.environ['DATE_RESTRICT_HOUR']
-        except KeyError:
-            print "Please ensure that your DATE_RESTRICT environment variables are configured properly. System terminating"
-            quit()
-
+        date_configs = {}
+        date_configs['to_restrict'] = self.get_environment('DATE_RESTRICT_FLAG')
+        date_configs['weekday'] = self.get_environment('DATE_RESTRICT_WEEKDAY')
+        date_configs['hour'] = self.get_environment('DATE_RESTRICT_HOUR')
         return date_configs
 
     '''
     Return: SMTP configurations from environment variables
     '''
     def generate_smtp_configs(self):
-        try:
-            smtp_configs = {}
-            smtp_configs['host'] = os.environ['SMTP_HOST']
-            smtp_configs['port'] = os.environ['SMTP_PORT']
-            smtp_configs['username'] = os.environ['SMTP_USERNAME']
-            smtp_configs['password'] = os.environ['SMTP_PASSWORD']
-        except KeyError:
-            print "Please ensure that your SMTP environment variables are configured properly. System terminating"
-            quit()
+        smtp_configs = {}
+        smtp_configs['host'] = self.get_environment('SMTP_HOST')
+        smtp_configs['port'] = self.get_environment('SMTP_PORT')
+        smtp_configs['username'] = self.get_environment('SMTP_USERNAME')
+        smtp_configs['password'] = self.get_environment('SMTP_PASSWORD')
+        Loadup.add_optional_environment(smtp_configs, {
+            'batch_size': 'SMTP_BATCH_SIZE',
+            'pool_size': 'SMTP_POOL_SIZE',
+            'rate_limit': 'SMTP_RATE_LIMIT'
+        })
         return smtp_configs
 
     '''
     Return: Sendmail configurations from environment variables
     '''
     def generate_sendmail_configs(self):
-        try:
-            mail_configs = {}
-            mail_configs['to_send'] = os.environ['SENDMAIL_FLAG']
-        except KeyError:
-            print "Please ensure that your SENDMAIL environment variables are configured properly. System terminating"
-            quit()
+        mail_configs = {}
+        mail_configs['to_send'] = self.get_environment('SENDMAIL_FLAG')
         return mail_configs
 
     '''
     Return: Toggl API configurations from environment variables
     '''
     def generate_toggl_api_configs(self):
-        try:
-            api_configs = {}
-            api_configs['token'] = os.environ['TOGGL_TOKEN']
-            api_configs['user_agent'] = os.environ['TOGGL_USER_AGENT']
-            api_configs['workspace_id'] = os.environ['TOGGL_WORKSPACE_ID']
-        except KeyError:
-            print "Please ensure that your TOGGL environment variables are configured properly. System terminating"
-            quit()
+        api_configs = {}
+        api_configs['token'] = self.get_environment('TOGGL_TOKEN')
+        api_configs['user_agent'] = self.get_environment('TOGGL_USER_AGENT')
+        api_configs['workspace_id'] = self.get_environment('TOGGL_WORKSPACE_ID')
+        Loadup.add_optional_environment(api_configs, {
+            'concurrency': 'TOGGL_CONCURRENCY',
+            'bulk_fetch': 'TOGGL_BULK_FETCH',
+            'pool_size': 'TOGGL_POOL_SIZE',
+            'max_retries': 'TOGGL_MAX_RETRIES',
+            'rate_limit': 'TOGGL_RATE_LIMIT',
+            'burst': 'TOGGL_BURST'
+        })
         return api_configs
 
     '''
     Return: Admin configurations from environment variables
     '''
     def generate_admin_configs(self):
+        admin_emails = self.get_environment('ADMIN_EMAIL')
+        if admin_emails is None:
+            return []
         try:
-            admin_configs = {}
-            admin_configs = json.loads(os.environ['ADMIN_EMAIL'])
-        except KeyError:
-            print "Please ensure that your ADMIN environment variables are configured properly. System terminating"
-            quit()
-        return admin_configs
+            return json.loads(admin_emails)
+        except ValueError:
+            self.missing_variables.append('ADMIN_EMAIL (a JSON list of e-mail addresses)')
+            return []
+
+    '''
+    Return: Exclusion rules from environment variables, each a JSON list. Empty if none are set
+    '''
+    def generate_exclude_configs(self):
+        exclude_configs = {}
+        for key in ['emails', 'domains', 'uids', 'groups', 'roles']:
+            name = 'EXCLUDE_' + key.upper()
+            if name in os.environ:
+                try:
+                    exclude_configs[key] = json.loads(os.environ[name])
+                except ValueError:
+                    self.missing_variables.append(name + ' (a JSON list)')
+        return exclude_configs
+
+    '''
+    Return: Toggl response cache configurations from environment variables. Only the path is required.
+    '''
+    def generate_cache_configs(self):
+        cache_configs = {}
+        cache_configs['path'] = os.environ['TOGGL_CACHE_PATH']
+        Loadup.add_optional_environment(cache_configs, {
+            'max_entries': 'TOGGL_CACHE_MAX_ENTRIES',
+            'open_ttl': 'TOGGL_CACHE_OPEN_TTL',
+            'closed_ttl': 'TOGGL_CACHE_CLOSED_TTL',
+            'closed_after_days': 'TOGGL_CACHE_CLOSED_AFTER_DAYS'
+        })
+        return cache_configs
 
     '''
     Return: Staff configurations from environment variables
     '''
     def generate_staff_configs(self):
-        try:
-            staff_configs = {}
-            staff_configs['email_role_staff_resource'] = os.environ['STAFF_EMAIL_ROLE_STAFF_RESOURCE']
-            staff_configs['email_role_group_leads'] = os.environ['STAFF_EMAIL_ROLE_GROUP_LEADS']
-            staff_configs['from_email'] = os.environ['STAFF_FROM_EMAIL']
-        except KeyError:
-            print "Please ensure that your STAFF environment variables are configured properly. System terminating"
-            quit()
+        staff_configs = {}
+        staff_configs['email_role_staff_resource'] = self.get_environment('STAFF_EMAIL_ROLE_STAFF_RESOURCE')
+        staff_configs['email_role_group_leads'] = self.get_environment('STAFF_EMAIL_ROLE_GROUP_LEADS')
+        staff_configs['from_email'] = self.get_environment('STAFF_FROM_EMAIL')
         return staff_configs
\ No newline at end of file
@@ -0,0 +1,189 @@
+import json
+import time
+import datetime
+import threading
+from contextlib import contextmanager
+
+HISTOGRAM_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
+
+'''
+Description: Times the stages of a run, and collects latency samples (such as Toggl requests and e-mail sends), from any thread
+Usage: Stages are timed with "with timer.stage('name'):". A stage that is entered more than once accumulates its time.
+Single samples are added with record. get_report returns everything as a dict, and write_report saves it as a JSON run report.
+'''
+class RunTimer:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = datetime.datetime.now()
+        self.start_time = time.time()
+        self.stages = {}
+        self.stage_order = []
+        self.samples = {}
+        self.counts = {}
+
+    '''
+    Description: Times the code run inside the with block, and adds it to the stage
+    Parameter: name (the name of the stage)
+    '''
+    @contextmanager
+    def stage(self, name):
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.add_stage_time(name, time.time() - start)
+
+    def add_stage_time(self, name, seconds, calls=1):
+        with self.lock:
+            if name not in self.stages:
+                self.stages[name] = {'seconds': 0, 'calls': 0}
+                self.stage_order.append(name)
+            self.stages[name]['seconds'] = self.stages[name]['seconds'] + seconds
+            self.stages[name]['calls'] = self.stages[name]['calls'] + calls
+
+    '''
+    Description: Adds a latency sample
+    Parameters: name (the name of what was timed, such as toggl.get_user_hours_range), seconds
+    '''
+    def record(self, name, seconds):
+        with self.lock:
+            self.samples.setdefault(name, []).append(seconds)
+
+    '''
+    Description: Sets a count to be included in the run report, such as the amount of users
+    '''
+    def count(self, name, value):
+        with self.lock:
+            self.counts[name] = value
+
+    '''
+    Return: The raw stage times, samples and counts, which can be passed between processes and merged into another RunTimer
+    '''
+    def export(self):
+        with self.lock:
+            return {
+                'stages': [(name, self.stages[name]['seconds'], self.stages[name]['calls']) for name in self.stage_order],
+                'samples': dict((name, list(samples)) for name, samples in self.samples.items()),
+                'counts': dict(self.counts)
+            }
+
+    '''
+    Description: Adds the stage times, samples and counts exported from another RunTimer to this one. Counts are added together.
+    '''
+    def merge(self, exported):
+        for name, seconds, calls in exported['stages']:
+            self.add_stage_time(name, seconds, calls)
+        with self.lock:
+            for name, samples in exported['samples'].items():
+                self.samples.setdefault(name, []).extend(samples)
+            for name, value in exported['counts'].items():
+                self.counts[name] = self.counts.get(name, 0) + value
+
+    '''
+    Return: A dict containing the total time of the run, the time of each stage, the counts, and a latency histogram of every sample name
+    '''
+    def get_report(self):
+        with self.lock:
+            stages = [dict(name=name, **self.stages[name]) for name in self.stage_order]
+            latencies = dict((name, RunTimer.summarize(samples)) for name, samples in self.samples.items())
+            counts = dict(self.counts)
+
+        return {
+            'started_at': self.started_at.strftime('%Y-%m-%dT%H:%M:%S'),
+            'total_seconds': time.time() - self.start_time,
+            'stages': stages,
+            'latencies': latencies,
+            'counts': counts
+        }
+
+    '''
+    Description: Writes the run report as JSON
+    Parameters: path (the file to write the report to), report (optional - the report to write. Defaults to get_report)
+    '''
+    def write_report(self, path, report=None):
+        report_file = open(path, 'w')
+        try:
+            json.dump(report or self.get_report(), report_file, indent=2, sort_keys=True)
+        finally:
+            report_file.close()
+
+    def print_stages(self):
+        print "\nRun Stages:"
+        for stage in self.get_report()['stages']:
+            print "{:20}".format(stage['name']) + "{:12.3f}".format(stage['seconds']) + "s"
+
+    '''
+    Description: Summarizes latency samples
+    Parameter: samples (a list of seconds)
+    Return: A dict with the count, total, min, mean, percentiles and max in milliseconds, and a histogram of the samples.
+        The histogram maps the upper bound of each bucket, in milliseconds, to the amount of samples in it
+    '''
+    @staticmethod
+    def summarize(samples):
+        samples_ms = sorted(sample * 1000 for sample in samples)
+        percentile = lambda fraction: samples_ms[min(len(samples_ms) - 1, int(fraction * len(samples_ms)))]
+
+        histogram = {}
+        for sample in samples_ms:
+            bucket = next((str(bound) for bound in HISTOGRAM_BUCKETS_MS if sample <= bound), 'inf')
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+
+        return {
+            'count': len(samples_ms),
+            'total_ms': sum(samples_ms),
+            'min_ms': samples_ms[0],
+            'mean_ms': sum(samples_ms) / len(samples_ms),
+            'p50_ms': percentile(0.5),
+            'p90_ms': percentile(0.9),
+            'p99_ms': percentile(0.99),
+            'max_ms': samples_ms[-1],
+            'histogram': histogram
+        }
+
+
+'''
+Description: Stands in for a RunTimer when a run is not being timed. Every call does nothing.
+'''
+class NullTimer:
+
+    @contextmanager
+    def stage(self, name):
+        yield
+
+    def record(self, name, seconds):
+        return None
+
+    def count(self, name, value):
+        return None
+
+NULL_TIMER = NullTimer()
+
+
+'''
+Description: Wraps a client, such as the TogglClientApi, timing every call of the given methods into a RunTimer.
+Each call is recorded under prefix.method_name, as well as under prefix itself.
+'''
+class TimedClient:
+
+    def __init__(self, client, timer, methods, prefix='toggl'):
+        self.client = client
+        self.timer = timer
+        self.methods = methods
+        self.prefix = prefix
+
+    def __getattr__(self, name):
+        attribute = getattr(self.client, name)
+        if name not in self.methods:
+            return attribute
+
+        def timed(*args, **kwargs):
+            start = time.time()
+            try:
+                return attribute(*args, **kwargs)
+            finally:
+                seconds = time.time() - start
+                self.timer.record(self.prefix + '.' + name, seconds)
+                self.timer.record(self.prefix, seconds)
+
+        return timed
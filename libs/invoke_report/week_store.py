@@ -0,0 +1,136 @@
+import time
+import sqlite3
+import threading
+
+RESULT_COLUMNS = ['uid', 'name', 'email', 'hours', 'percent_worked', 'missing_hours', 'hours_reduction', 'new_flag', 'mark_notice', 'contacted']
+
+'''
+Description: A persistent store of the weekly results of every user, backed by SQLite. A week is stored as a whole - its minimum hours,
+the hours, percent_worked, missing_hours and new hire hours reduction each user was computed with, and whether its alerts were delivered.
+Usage: Used by WorkspaceRunner, so that weeks which were already computed are not fetched and computed again, and by trend.py,
+which reports on the stored weeks without calling the Toggl API
+'''
+class WeekStore:
+
+    '''
+    Parameters: path (the SQLite file to store the weeks in. ':memory:' keeps the weeks in memory)
+    '''
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS weeks ("
+            "workspace_id TEXT NOT NULL, week_start TEXT NOT NULL, week_end TEXT NOT NULL, minimum_hours REAL NOT NULL, "
+            "computed_at REAL NOT NULL, alerts_sent INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (workspace_id, week_start))"
+        )
+        # Stores created before alerts_sent was recorded get the column, with their weeks counted as not e-mailed
+        columns = [row[1] for row in self.connection.execute("PRAGMA table_info(weeks)")]
+        if 'alerts_sent' not in columns:
+            self.connection.execute("ALTER TABLE weeks ADD COLUMN alerts_sent INTEGER NOT NULL DEFAULT 0")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS user_weeks ("
+            "workspace_id TEXT NOT NULL, week_start TEXT NOT NULL, uid INTEGER NOT NULL, name TEXT, email TEXT, "
+            "hours REAL NOT NULL, percent_worked REAL NOT NULL, missing_hours REAL NOT NULL, hours_reduction REAL NOT NULL, "
+            "new_flag INTEGER NOT NULL, mark_notice TEXT NOT NULL, contacted INTEGER NOT NULL, "
+            "PRIMARY KEY (workspace_id, week_start, uid))"
+        )
+        self.connection.commit()
+
+    '''
+    Parameters: workspace_id, week_start [YYYY-MM-DD], alerts_sent (optional - True to only count the week if its alerts were delivered)
+    Return: True if the week has been stored for the workspace, and has not been invalidated
+    '''
+    def has_week(self, workspace_id, week_start, alerts_sent=False):
+        query = "SELECT 1 FROM weeks WHERE workspace_id = ? AND week_start = ?"
+        if alerts_sent is True:
+            query = query + " AND alerts_sent = 1"
+
+        with self.lock:
+            row = self.connection.execute(query, (str(workspace_id), week_start)).fetchone()
+        return row is not None
+
+    '''
+    Description: Stores the results of a week, replacing the week if it was stored before
+    Parameters: workspace_id, week_start [YYYY-MM-DD], week_end [YYYY-MM-DD], minimum_hours (the minimum hours of the week)
+        users (the User objects of the report, after setup_missing_hours)
+        alerts_sent (optional - True only if the alerts of the week were sent, and every e-mail was delivered. Backfilled weeks and
+        dry runs are stored as computed, not e-mailed)
+    '''
+    def save_week(self, workspace_id, week_start, week_end, minimum_hours, users, alerts_sent=False):
+        rows = [(
+            str(workspace_id), week_start, user.get_id(), user.get_name(), user.get_email(), user.hours, user.percent_worked,
+            user.missing_hours, user.hours_reduction, int(getattr(user, 'new_flag', False) is True), user.mark_notice,
+            int(user.mark_notice == '*')
+        ) for user in users]
+
+        with self.lock:
+            self.connection.execute("DELETE FROM user_weeks WHERE workspace_id = ? AND week_start = ?", (str(workspace_id), week_start))
+            self.connection.executemany(
+                "INSERT INTO user_weeks (workspace_id, week_start, " + ", ".join(RESULT_COLUMNS) + ") "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+            self.connection.execute(
+                "INSERT OR REPLACE INTO weeks (workspace_id, week_start, week_end, minimum_hours, computed_at, alerts_sent) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (str(workspace_id), week_start, week_end, minimum_hours, time.time(), int(alerts_sent is True))
+            )
+            self.connection.commit()
+
+    '''
+    Return: The stored results of every user for the week, as a list of dicts with the RESULT_COLUMNS, sorted by percent_worked
+    '''
+    def get_week(self, workspace_id, week_start):
+        return self.get_user_weeks(workspace_id, week_start, week_start)
+
+    '''
+    Return: The minimum hours the stored week was computed with, or None if the week is not stored
+    '''
+    def get_minimum_hours(self, workspace_id, week_start):
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT minimum_hours FROM weeks WHERE workspace_id = ? AND week_start = ?", (str(workspace_id), week_start)
+            ).fetchone()
+        return None if row is None else row[0]
+
+    '''
+    Description: Reads the stored results of a range of weeks
+    Parameters: workspace_id, since [YYYY-MM-DD], until [YYYY-MM-DD] (the first and last week_start to read), uid (optional - a single user)
+    Return: A list of dicts with the week_start and RESULT_COLUMNS of every user week, ordered by week, then by percent_worked
+    '''
+    def get_user_weeks(self, workspace_id, since, until, uid=None):
+        query = "SELECT week_start, " + ", ".join(RESULT_COLUMNS) + " FROM user_weeks WHERE workspace_id = ? AND week_start BETWEEN ? AND ?"
+        parameters = [str(workspace_id), since, until]
+        if uid is not None:
+            query = query + " AND uid = ?"
+            parameters.append(uid)
+
+        with self.lock:
+            rows = self.connection.execute(query + " ORDER BY week_start, percent_worked", parameters).fetchall()
+
+        return [dict(zip(['week_start'] + RESULT_COLUMNS, row)) for row in rows]
+
+    '''
+    Return: The week_start of every stored week of the workspace, oldest first
+    '''
+    def get_weeks(self, workspace_id):
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT week_start FROM weeks WHERE workspace_id = ? ORDER BY week_start", (str(workspace_id),)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    '''
+    Description: Removes a stored week so it is computed again, or every week of the workspace if no week_start is given
+    '''
+    def invalidate(self, workspace_id, week_start=None):
+        with self.lock:
+            for table in ('weeks', 'user_weeks'):
+                if week_start is None:
+                    self.connection.execute("DELETE FROM " + table + " WHERE workspace_id = ?", (str(workspace_id),))
+                else:
+                    self.connection.execute("DELETE FROM " + table + " WHERE workspace_id = ? AND week_start = ?", (str(workspace_id), week_start))
+            self.connection.commit()
+
+    def close(self):
+        self.connection.close()
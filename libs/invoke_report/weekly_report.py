@@ -0,0 +1,172 @@
+from libs.invoke_users.invoke_users import User
+from libs.invoke_users.exclusions import ExclusionIndex
+from libs.invoke_workdays.work_schedules import WorkSchedules
+from libs.date_functions import convert_milliseconds_to_hours
+from libs.invoke_report.run_timer import NULL_TIMER
+
+DEFAULT_WORKING_HOURS = 7.5
+
+'''
+Description: Computes the hours report of a workspace for a reporting period - the hours each user tracked, the percent of their
+required hours they worked, and who should be e-mailed about missing hours.
+Usage: Created once the configurations and holidays are loaded. Users are added with the hours they tracked, after which the report
+can be printed and e-mailed. run_pipelined can be used instead, to e-mail users while the hours of other users are still being fetched.
+'''
+class WeeklyReport:
+
+    '''
+    Parameters: configs (the configurations), api [TogglClientApi], work_day [WorkDay]
+        start_date [datetime], end_date [datetime] (the reporting period, usually last Monday to Sunday)
+        working_hours (the amount of hours expected in a full work day)
+        timer [RunTimer] (optional - records the time spent fetching members, and computing users)
+        work_schedules [WorkSchedules] (optional - the work schedules of the members. Created from the configurations by default)
+    '''
+    def __init__(self, configs, api, work_day, start_date, end_date, working_hours=DEFAULT_WORKING_HOURS, timer=None, work_schedules=None):
+        self.timer = timer or NULL_TIMER
+        self.configs = configs
+        self.api = api
+        self.work_day = work_day
+        self.working_hours = working_hours
+        self.start_date = start_date
+        self.end_date = end_date
+        self.start = start_date.strftime('%Y-%m-%d')
+        self.end = end_date.strftime('%Y-%m-%d')
+        # The minimum hours of each member depend on their work schedule. minimum_hours is that of the default schedule
+        self.work_schedules = work_schedules or WorkSchedules(configs, work_day, working_hours)
+        self.minimum_hours = self.work_schedules.get_minimum_hours(self.work_schedules.default, start_date, end_date)
+        # Inactive members, admins and the exclude rules, indexed once for every member of the report
+        self.exclusions = ExclusionIndex(configs)
+        # The Users of the report. users_to_contact refers to the same User objects as users_to_output
+        self.users_to_output = []
+        self.users_to_contact = []
+
+    '''
+    Return: The members of the workspace
+    '''
+    def fetch_members(self):
+        with self.timer.stage('member_fetch'):
+            user_list_response = self.api.get_workspace_members(self.configs['togglAPI']['workspace_id'])
+            return user_list_response.json()
+
+    '''
+    Description: Computes the hours of a single user, and whether they should be contacted about missing hours
+    Parameters: member (the user, as returned by get_workspace_members), time_tracked (the milliseconds the user tracked)
+    Return: A tuple of the User, and a list containing the User if they should be contacted. (None, []) if the user is skipped
+    '''
+    def compute_user(self, member, time_tracked):
+        with self.timer.stage('user_computation'):
+            return self.compute_user_hours(member, time_tracked)
+
+    def compute_user_hours(self, member, time_tracked):
+        if self.exclusions.is_excluded(member):
+            return None, []
+
+        schedule = self.work_schedules.get_schedule(member)
+        minimum_hours = self.work_schedules.get_minimum_hours(schedule, self.start_date, self.end_date)
+        user = User(member, minimum_hours, convert_milliseconds_to_hours(time_tracked))
+
+        user.prepare_user(self.start, self.end)
+
+        hours_reduction = 0
+        if user.is_new(self.start_date):
+            hours_reduction = self.work_schedules.get_hours_reduction(schedule, self.start_date, self.end_date, user.joined_date)
+            user.new_flag = True
+        else:
+            user.new_flag = False
+
+        user_to_contact = []
+        user.setup_missing_hours(minimum_hours, user_to_contact, hours_reduction)
+        return user, user_to_contact
+
+    '''
+    Description: Computes the hours of a user, and adds them to the report
+    Return: The User, or None if the user is skipped
+    '''
+    def add_user(self, member, time_tracked):
+        user, user_to_contact = self.compute_user(member, time_tracked)
+        if user is None:
+            return None
+
+        self.users_to_output.append(user)
+        self.users_to_contact.extend(user_to_contact)
+        return user
+
+    '''
+    Description: Computes the hours of every member at once with a ComplianceEngine, and adds the users to the report in the order of
+    members - the same users, in the same order, as when they are added one by one with add_user. The Users are built from the columns of
+    the results of the reported members, with the fields the engine read from the members once
+    Parameters: engine [ComplianceEngine] (created from the members), tracked_ms (the milliseconds tracked by each member)
+        included (optional - an array which is False for members that are not part of the report)
+    '''
+    def add_users_batch(self, engine, tracked_ms, included=None):
+        with self.timer.stage('user_computation'):
+            results = engine.compute(tracked_ms, self.start_date, self.end_date, self.minimum_hours, included)
+            reported = results['reported'].nonzero()[0]
+            columns = [results[name][reported].tolist() for name in ('hours', 'minimum_hours', 'percent_worked', 'missing_hours', 'hours_reduction',
+                                                                     'new_flag', 'mark_notice')]
+            period = self.start + "/to/" + self.end
+            toggl_urls = [url_start + period + url_end for url_start, url_end in (engine.toggl_urls[index] for index in reported.tolist())]
+            users = [User.from_values(engine.user_fields[index], *values) for index, values in zip(reported.tolist(), zip(toggl_urls, *columns))]
+
+            self.users_to_output.extend(users)
+            self.users_to_contact.extend(user for user, contact in zip(users, results['contact'][reported].tolist()) if contact)
+
+    '''
+    Description: Fetches and computes the hours of every member, e-mailing each user who is missing hours as soon as their hours
+    are known. Users are kept in the order of members, so the report is the same as when users are added one by one.
+    Parameters: members, hours_fetcher [HoursFetcher], hours_alert [HoursAlert], do_send (True to send e-mails)
+    '''
+    def run_pipelined(self, members, hours_fetcher, hours_alert, do_send=True):
+        users = {}
+        users_to_contact = {}
+        for index, time_tracked in hours_fetcher.iter_users_hours(members, self.start, self.end):
+            user, user_to_contact = self.compute_user(members[index], time_tracked)
+            if user is None:
+                continue
+
+            users[index] = user
+            users_to_contact[index] = user_to_contact
+            for user_to_email in user_to_contact:
+                self.send_user_hours_not_met(hours_alert, user_to_email, do_send)
+
+        self.users_to_output = [users[index] for index in sorted(users)]
+        self.users_to_contact = [user for index in sorted(users_to_contact) for user in users_to_contact[index]]
+        self.sort_users()
+
+    '''
+    Description: Sorts the users by the percent of their required hours they worked
+    '''
+    def sort_users(self):
+        self.users_to_output.sort(key=lambda x: x.percent_worked, reverse=False)
+
+    def print_header(self):
+        print "\n\nTime Tracked for " + self.start + " until " + self.end
+        print "Minimum Hours Required: " + str(self.minimum_hours) + "\n"
+
+    def print_report(self):
+        for user in self.users_to_output:
+            print "{:20}".format(user.mark_notice+user.get_name()) + "{:15.2f}".format(user.hours) + "{:15.2f}".format(user.percent_worked) + '%'
+
+    '''
+    Description: Prints the user weeks read from a WeekStore, in the same format as print_report
+    '''
+    def print_stored_report(self, rows):
+        for row in rows:
+            print "{:20}".format(row['mark_notice']+row['name']) + "{:15.2f}".format(row['hours']) + "{:15.2f}".format(row['percent_worked']) + '%'
+
+    '''
+    Description: Sends the summary e-mail of the report
+    '''
+    def send_hours_summary(self, hours_alert, do_send=True):
+        users_sorted = sorted(self.users_to_output, key=lambda user: user.hours)
+        hours_alert.send_hours_summary(self.start_date, self.end_date, users_sorted, self.minimum_hours, do_send)
+
+    '''
+    Description: E-mails every user who is missing hours
+    '''
+    def send_hours_not_met(self, hours_alert, do_send=True):
+        for user in self.users_to_contact:
+            self.send_user_hours_not_met(hours_alert, user, do_send)
+
+    def send_user_hours_not_met(self, hours_alert, user, do_send=True):
+        hours_alert.send_hours_not_met(self.start_date, self.end_date, user, user.hours, user.min_hours, do_send)
@@ -0,0 +1,411 @@
+import sys
+import copy
+import StringIO
+import logging
+import traceback
+import multiprocessing
+
+from libs.invoke_workdays.workday import WorkDay
+from libs.invoke_workdays.work_schedules import WorkSchedules
+from libs.invoke_toggl.hours_fetcher import HoursFetcher, DEFAULT_CONCURRENCY
+from libs.invoke_toggl.transport import TogglTransport
+from libs.invoke_toggl.toggl_cache import TogglCache, CachedTogglClient, DEFAULT_MAX_ENTRIES
+from libs.invoke_report.weekly_report import WeeklyReport, DEFAULT_WORKING_HOURS
+from libs.invoke_report.run_timer import RunTimer, TimedClient
+from libs.invoke_report.week_store import WeekStore
+from libs.hours_alerts import HoursAlert, create_mail_queue
+
+TEMPLATES = [
+    'emails/hours_summary.html',
+    'emails/hours_alert.html',
+    'emails/hours_alert_header.html',
+    'emails/hours_alert_reminder.html'
+]
+TOGGL_METHODS = ['get_workspace_members', 'get_user_hours_range', 'query_report']
+
+# The runner used by the processes of the pool. It is set before the pool is created, so every process inherits it when it is forked
+pooled_runner = None
+
+'''
+Description: Runs the weekly report of every workspace in the configurations. Workspaces are run in parallel in a process pool.
+The holidays are parsed, the work day calendars built and the templates compiled once, before the pool is created, so every
+process shares them instead of loading them again.
+Usage: Created by check.py once the configurations and holidays are loaded
+    runner = WorkspaceRunner(configs, holidays, TogglClientApi, now=WorkDay.get_now())
+    results = runner.run_all(timer)
+'''
+class WorkspaceRunner:
+
+    '''
+    Parameters: configs (the configurations. A workspaces list runs each workspace with its own configurations)
+        holidays (the parsed holidays), api_factory (creates the Toggl api from the toggl settings, usually TogglClientApi)
+        start_date [datetime], end_date [datetime] (the reporting period)
+        views_path (the folder containing the e-mail templates), flags (the command line flags - refresh, recompute and pipeline are used)
+        now [datetime] (the current time, used to build the work day calendars)
+        backfill_weeks (optional - a list of (Monday [datetime], Sunday [datetime]) weeks to backfill instead of running the reporting period)
+    '''
+    def __init__(self, configs, holidays, api_factory, start_date, end_date, views_path='views', flags=None, now=None, backfill_weeks=None):
+        self.backfill_weeks = backfill_weeks
+        self.configs = configs
+        self.holidays = holidays
+        self.api_factory = api_factory
+        self.start_date = start_date
+        self.end_date = end_date
+        self.views_path = views_path
+        self.flags = flags or {}
+        self.now = now or WorkDay.get_now()
+        self.workspaces = WorkspaceRunner.get_workspace_configs(configs)
+
+        self.template_env = HoursAlert.create_template_env(views_path, configs.get('templates') or {})
+        for name in TEMPLATES:
+            self.template_env.get_template(name)
+
+        self.work_day_calendars = {}
+        for workspace_configs in self.workspaces:
+            self.get_work_day(workspace_configs['work_days'])
+
+    '''
+    Description: Splits the configurations into the configurations of each workspace. Every entry of the workspaces list is merged
+    over the top level configurations - dicts, such as togglAPI and staff, are merged key by key, everything else is replaced.
+    Return: A list of configurations, one per workspace. The configurations themselves if there is no workspaces list.
+    '''
+    @staticmethod
+    def get_workspace_configs(configs):
+        if not configs.get('workspaces'):
+            return [configs]
+
+        workspaces = []
+        for workspace in configs['workspaces']:
+            workspace_configs = dict((key, value) for key, value in configs.items() if key != 'workspaces')
+            for key, value in workspace.items():
+                if isinstance(value, dict) and isinstance(configs.get(key), dict):
+                    value = dict(configs[key], **value)
+                workspace_configs[key] = value
+            workspaces.append(workspace_configs)
+        return workspaces
+
+    '''
+    Return: The WorkDay calendar for the work days. Workspaces with the same work days share one calendar.
+    '''
+    def get_work_day(self, work_days):
+        key = tuple(work_days)
+        if key not in self.work_day_calendars:
+            self.work_day_calendars[key] = WorkDay(self.holidays, work_days, self.now)
+        return self.work_day_calendars[key]
+
+    '''
+    Return: The WorkSchedules of the workspace. The calendars of schedules with other work days are shared like those of workspaces
+    '''
+    def get_work_schedules(self, workspace_configs, work_day):
+        return WorkSchedules(workspace_configs, work_day, DEFAULT_WORKING_HOURS, self.get_work_day)
+
+    '''
+    Description: Creates a runner for another reporting period, which shares the templates and work day calendars of this runner.
+    Used by the scheduler, which keeps one runner for as long as it runs. The calendars are only built again once now is in another year
+    Parameters: start_date [datetime], end_date [datetime] (the reporting period)
+        overrides (optional - configurations that replace those of every workspace, such as sendmail), now [datetime] (the current time)
+    Return: The WorkspaceRunner of the period
+    '''
+    def for_period(self, start_date, end_date, overrides=None, now=None):
+        if now is not None and now.year != self.now.year:
+            self.now = now
+            self.work_day_calendars = {}
+            for workspace_configs in self.workspaces:
+                self.get_work_day(workspace_configs['work_days'])
+
+        runner = copy.copy(self)
+        runner.start_date = start_date
+        runner.end_date = end_date
+        runner.backfill_weeks = None
+        if overrides:
+            runner.workspaces = [dict(workspace_configs, **overrides) for workspace_configs in self.workspaces]
+        return runner
+
+    '''
+    Description: Runs every workspace, and merges the stage times, latencies and counts of every workspace into timer
+    Parameters: timer [RunTimer], processes (the amount of processes workspaces are run in. Defaults to one per workspace, up to the cpu count)
+    Return: A list of the results of every workspace, in the order of the configurations
+    '''
+    def run_all(self, timer, processes=None):
+        global pooled_runner
+
+        if processes is None:
+            processes = min(len(self.workspaces), multiprocessing.cpu_count())
+
+        if processes <= 1 or len(self.workspaces) == 1:
+            results = [self.run_workspace_safely(index) for index in range(len(self.workspaces))]
+        else:
+            pooled_runner = self
+            pool = multiprocessing.Pool(processes)
+            try:
+                results = pool.map(run_pooled_workspace, range(len(self.workspaces)), 1)
+            finally:
+                pool.close()
+                pool.join()
+                pooled_runner = None
+
+        for result in results:
+            timer.merge(result['timings'])
+        return results
+
+    '''
+    Description: Runs a workspace. An error in a workspace is reported in its result, so it does not stop the other workspaces.
+    Return: The result of the workspace
+    '''
+    def run_workspace_safely(self, index):
+        workspace_configs = self.workspaces[index]
+        try:
+            # An empty list of weeks is still a backfill, so it never falls through to the weekly run, which sends e-mails
+            if self.backfill_weeks is not None:
+                return self.backfill_workspace(workspace_configs)
+            return self.run_workspace(workspace_configs)
+        except Exception:
+            error = traceback.format_exc()
+            print "Workspace " + str(workspace_configs['togglAPI']['workspace_id']) + " failed:\n" + error
+            return WorkspaceRunner.get_result(workspace_configs, RunTimer(), error=error)
+
+    '''
+    Return: The Toggl API settings of the workspace
+    '''
+    @staticmethod
+    def get_settings(workspace_configs):
+        return {
+            'token': workspace_configs['togglAPI']['token'],
+            'user_agent': workspace_configs['togglAPI']['user_agent'],
+            'workspace_id': workspace_configs['togglAPI']['workspace_id']
+        }
+
+    '''
+    Description: Creates the Toggl api of the workspace. Requests are sent over a pooled, rate limited and retrying TogglTransport,
+    every Toggl request is timed, and responses are cached if the cache is configured
+    Return: A tuple of the api, and a list of what must be closed once the workspace is done - the transport and the TogglCache
+    '''
+    def create_api(self, workspace_configs, settings, timer):
+        api = self.api_factory(settings)
+        transport = TogglTransport(workspace_configs['togglAPI'], timer)
+        if not transport.attach(api) and 'rate_limit' in workspace_configs['togglAPI']:
+            logging.warn("The Toggl client does not support the pooled transport; requests are sent without rate limiting or retries")
+        resources = [transport]
+        api = TimedClient(api, timer, TOGGL_METHODS)
+
+        # Toggl Response Cache. Pass --refresh to ignore cached responses
+        if workspace_configs.get('cache'):
+            toggl_cache = TogglCache(workspace_configs['cache']['path'], workspace_configs['cache'].get('max_entries', DEFAULT_MAX_ENTRIES))
+            api = CachedTogglClient(api, toggl_cache, workspace_configs['cache'], self.flags.get('refresh') is True)
+            resources.append(toggl_cache)
+
+        return api, resources
+
+    '''
+    Description: Closes every resource that is still open, and removes it from the list, so calling it again only closes what was opened
+    since. A resource that fails to close is logged, so the others are still closed, and the error of the workspace is not hidden
+    '''
+    @staticmethod
+    def close_all(resources):
+        while resources:
+            resource = resources.pop(0)
+            try:
+                resource.close()
+            except Exception:
+                logging.warn("Could not close " + resource.__class__.__name__ + ":\n" + traceback.format_exc())
+
+    '''
+    Description: Fetches, computes, prints and e-mails the weekly report of a single workspace. The Toggl transport and cache, the mail
+    queue and the state store are closed even if the workspace fails
+    Parameters: workspace_configs (the configurations of the workspace)
+    Return: The result of the workspace - its name, workspace_id, counts, mail failures and run report
+    '''
+    def run_workspace(self, workspace_configs):
+        timer = RunTimer()
+        settings = WorkspaceRunner.get_settings(workspace_configs)
+        api, resources = self.create_api(workspace_configs, settings, timer)
+        try:
+            work_day = self.get_work_day(workspace_configs['work_days'])
+            report = WeeklyReport(workspace_configs, api, work_day, self.start_date, self.end_date, timer=timer,
+                                  work_schedules=self.get_work_schedules(workspace_configs, work_day))
+
+            # Weeks whose alerts were already delivered are read from the state store. Pass --recompute to compute the week again.
+            # Weeks that were stored by a backfill or a dry run, or whose e-mails failed, are computed and e-mailed again
+            week_store = None
+            if workspace_configs.get('state'):
+                week_store = WeekStore(workspace_configs['state']['path'])
+                resources.append(week_store)
+                if self.flags.get('recompute') is True:
+                    week_store.invalidate(settings['workspace_id'], report.start)
+                elif week_store.has_week(settings['workspace_id'], report.start, alerts_sent=True):
+                    return self.report_stored_week(workspace_configs, report, week_store, timer)
+
+            users = report.fetch_members()
+            report.print_header()
+
+            concurrency = workspace_configs['togglAPI'].get('concurrency', DEFAULT_CONCURRENCY)
+            bulk_fetch = workspace_configs['togglAPI'].get('bulk_fetch', True)
+            hours_fetcher = HoursFetcher(api, settings, concurrency, bulk_fetch)
+
+            mail_queue = create_mail_queue(workspace_configs['smtp'], timer)
+            resources.append(mail_queue)
+            hours_alert = HoursAlert(self.views_path, mail_queue, workspace_configs, timer, self.template_env)
+            to_send = workspace_configs['sendmail']['to_send']
+
+            if self.flags.get('pipeline') is True:
+                # E-mail users as soon as their hours are known, while the hours of other users are still being fetched
+                with timer.stage('pipeline'):
+                    report.run_pipelined(users, hours_fetcher, hours_alert, to_send)
+                report.print_report()
+                report.send_hours_summary(hours_alert, to_send)
+            else:
+                with timer.stage('user_fetch'):
+                    users_time_tracked = hours_fetcher.fetch_users_hours(users, report.start, report.end)
+                for user, time_tracked in zip(users, users_time_tracked):
+                    report.add_user(user, time_tracked)
+
+                report.sort_users()
+                report.print_report()
+                report.send_hours_summary(hours_alert, to_send)
+                report.send_hours_not_met(hours_alert, to_send)
+
+            # Closing the mail queue sends what is left in it, so the failures are only read, and the week only stored, once it is closed
+            resources.remove(mail_queue)
+            mail_queue.close()
+            mail_failures = mail_queue.get_failures()
+            if week_store is not None:
+                alerts_sent = to_send is True and not mail_failures
+                week_store.save_week(settings['workspace_id'], report.start, report.end, report.minimum_hours, report.users_to_output, alerts_sent)
+        finally:
+            WorkspaceRunner.close_all(resources)
+
+        for recipient, error in mail_failures:
+            print "Mail failed: " + recipient + "; " + error
+
+        timer.count('members', len(users))
+        timer.count('users_reported', len(report.users_to_output))
+        timer.count('users_contacted', len(report.users_to_contact))
+        timer.count('mail_failures', len(mail_failures))
+        return WorkspaceRunner.get_result(workspace_configs, timer, mail_failures)
+
+    '''
+    Description: Computes and prints the report of every backfilled week of a single workspace. The time entries of all the weeks are
+    fetched at once, and split into weeks in memory. No e-mails are sent for backfilled weeks. If the state store is configured, the
+    weeks are stored, and weeks that are already stored are skipped, unless --recompute is passed.
+    Parameters: workspace_configs (the configurations of the workspace)
+    Return: The result of the workspace
+    '''
+    def backfill_workspace(self, workspace_configs):
+        timer = RunTimer()
+        settings = WorkspaceRunner.get_settings(workspace_configs)
+        work_day = self.get_work_day(workspace_configs['work_days'])
+        if not self.backfill_weeks:
+            print "There are no weeks to backfill"
+            return WorkspaceRunner.get_result(workspace_configs, timer)
+
+        resources = []
+        try:
+            week_store = None
+            weeks = self.backfill_weeks
+            if workspace_configs.get('state'):
+                week_store = WeekStore(workspace_configs['state']['path'])
+                resources.append(week_store)
+                if self.flags.get('recompute') is not True:
+                    weeks = [week for week in weeks if not week_store.has_week(settings['workspace_id'], week[0].strftime('%Y-%m-%d'))]
+                timer.count('stored_weeks', len(self.backfill_weeks) - len(weeks))
+
+            if not weeks:
+                print "Every week from " + self.backfill_weeks[0][0].strftime('%Y-%m-%d') + " is already computed"
+                return WorkspaceRunner.get_result(workspace_configs, timer)
+
+            api, api_resources = self.create_api(workspace_configs, settings, timer)
+            resources.extend(api_resources)
+            # The weeks share the work schedules, so the minimum hours of a schedule are computed once per week
+            work_schedules = self.get_work_schedules(workspace_configs, work_day)
+            reports = [WeeklyReport(workspace_configs, api, work_day, start_date, end_date, timer=timer, work_schedules=work_schedules)
+                       for start_date, end_date in weeks]
+            users = reports[0].fetch_members()
+
+            hours_fetcher = HoursFetcher(api, settings)
+            with timer.stage('user_fetch'):
+                weekly_hours = hours_fetcher.fetch_weekly_hours(reports[0].start, reports[-1].end)
+
+            # The members are parsed once, and every week is computed at once over all of them. numpy is only imported by backfills
+            from libs.invoke_users.compliance import ComplianceEngine
+            engine = ComplianceEngine(users, workspace_configs, work_day, reports[0].working_hours, work_schedules)
+
+            users_reported = 0
+            for report in reports:
+                week_hours = weekly_hours.get(report.start, {})
+                tracked_ms = [week_hours.get(user['uid'], 0) for user in users]
+                # Members who joined after the week are not part of its report
+                report.add_users_batch(engine, tracked_ms, engine.joined_by(report.end_date))
+                report.sort_users()
+                report.print_header()
+                report.print_report()
+                users_reported = users_reported + len(report.users_to_output)
+
+                # No e-mails are sent for backfilled weeks, so they are stored as not e-mailed, and the weekly run still e-mails them
+                if week_store is not None:
+                    week_store.save_week(settings['workspace_id'], report.start, report.end, report.minimum_hours, report.users_to_output,
+                                         alerts_sent=False)
+        finally:
+            WorkspaceRunner.close_all(resources)
+
+        timer.count('members', len(users))
+        timer.count('weeks_computed', len(reports))
+        timer.count('users_reported', users_reported)
+        return WorkspaceRunner.get_result(workspace_configs, timer)
+
+    '''
+    Description: Prints the report of a week that was already computed from the state store. No e-mails are sent, as they were delivered
+    when the week was computed.
+    Return: The result of the workspace
+    '''
+    def report_stored_week(self, workspace_configs, report, week_store, timer):
+        workspace_id = workspace_configs['togglAPI']['workspace_id']
+        rows = week_store.get_week(workspace_id, report.start)
+
+        report.print_header()
+        print "Already computed - read from the state store. Pass --recompute to compute the week again\n"
+        report.print_stored_report(rows)
+
+        timer.count('stored_weeks', 1)
+        timer.count('users_reported', len(rows))
+        return WorkspaceRunner.get_result(workspace_configs, timer)
+
+    @staticmethod
+    def get_result(workspace_configs, timer, mail_failures=None, error=None):
+        return {
+            'name': workspace_configs.get('name', str(workspace_configs['togglAPI']['workspace_id'])),
+            'workspace_id': workspace_configs['togglAPI']['workspace_id'],
+            'mail_failures': mail_failures or [],
+            'error': error,
+            'output': None,
+            'timings': timer.export(),
+            'run_report': timer.get_report()
+        }
+
+    '''
+    Description: Combines the run report of the whole run with the results of every workspace
+    Return: The combined run report
+    '''
+    @staticmethod
+    def get_combined_report(timer, results):
+        combined_report = timer.get_report()
+        combined_report['workspaces'] = [
+            dict((key, result[key]) for key in ('name', 'workspace_id', 'mail_failures', 'error', 'run_report'))
+            for result in results
+        ]
+        return combined_report
+
+
+'''
+Description: Runs a workspace in a process of the pool. What the workspace prints is captured, and returned with its result,
+so the parent process can print the output of every workspace in order instead of interleaved.
+'''
+def run_pooled_workspace(index):
+    output = StringIO.StringIO()
+    sys.stdout = output
+    try:
+        result = pooled_runner.run_workspace_safely(index)
+    finally:
+        sys.stdout = sys.__stdout__
+
+    result['output'] = output.getvalue()
+    return result
@@ -0,0 +1,271 @@
+import os
+import sys
+import time
+import logging
+import datetime
+import traceback
+
+from libs.invoke_workdays.workday import WorkDay
+from libs.invoke_workdays.holiday_calendar import HolidayCalendar
+from libs.invoke_report.run_timer import RunTimer
+from libs.invoke_report.workspace_runner import WorkspaceRunner
+
+# The scheduler sleeps for at most this many seconds at a time, so a changed configuration file is picked up while it waits
+DEFAULT_CHECK_INTERVAL = 300
+# Runs that were due at most this many seconds ago are still run, such as when the process was restarted or deployed just after a run was due.
+# The hourly schedule gate of check.py also ran anywhere within the configured hour. Only used when the last run is kept in a marker file
+DEFAULT_CATCH_UP = 3600
+LAST_RUN_FORMAT = '%Y-%m-%d %H:%M'
+PERIODS = ['last_week', 'this_week']
+
+'''
+Description: A report that is run on some weekdays, at an hour and minute. The report covers last week (Monday to Sunday), or this week
+until the run (a preview). Previews are not e-mailed unless send is True, and are never stored in the state store, as the week is not over
+Usage: Created from the schedules list of the configurations
+    schedules = Schedule.from_configs(configs)
+    next_run = min(schedule.next_run(now) for schedule in schedules)
+'''
+class Schedule:
+
+    '''
+    Parameters: schedule_configs (a dict - name, weekdays (a list, or a single weekday. 0 = Monday), hour, minute, period and send)
+    Raises: ValueError if a field is invalid
+    '''
+    def __init__(self, schedule_configs):
+        weekdays = schedule_configs.get('weekdays', range(7))
+        if not isinstance(weekdays, list):
+            weekdays = [weekdays]
+
+        try:
+            self.weekdays = sorted(set(int(weekday) for weekday in weekdays))
+            self.hour = int(schedule_configs.get('hour', 0))
+            self.minute = int(schedule_configs.get('minute', 0))
+        except (TypeError, ValueError):
+            raise ValueError("The weekdays, hour and minute of a schedule must be numbers: " + str(schedule_configs))
+
+        self.period = schedule_configs.get('period', 'last_week')
+        self.name = str(schedule_configs.get('name', self.period))
+        self.send = schedule_configs.get('send', self.period == 'last_week')
+
+        if not self.weekdays or not all(0 <= weekday <= 6 for weekday in self.weekdays):
+            raise ValueError("Schedule " + self.name + ": weekdays must be from 0 (Monday) to 6 (Sunday)")
+        if not 0 <= self.hour <= 23 or not 0 <= self.minute <= 59:
+            raise ValueError("Schedule " + self.name + ": hour must be from 0 to 23, and minute from 0 to 59")
+        if self.period not in PERIODS:
+            raise ValueError("Schedule " + self.name + ": period must be one of " + ", ".join(PERIODS))
+
+    '''
+    Description: Creates the schedules of the configurations. Without a schedules list, last week is reported at the weekday and hour of
+    date_restrict, as check.py does when it is run every hour
+    Return: A list of Schedules
+    '''
+    @staticmethod
+    def from_configs(configs):
+        if configs.get('schedules'):
+            return [Schedule(schedule_configs) for schedule_configs in configs['schedules']]
+
+        return [Schedule({
+            'name': 'weekly',
+            'weekdays': [configs['date_restrict']['weekday']],
+            'hour': configs['date_restrict']['hour']
+        })]
+
+    '''
+    Return: The first datetime the schedule is due at, after the datetime after
+    '''
+    def next_run(self, after):
+        day = datetime.datetime(after.year, after.month, after.day, self.hour, self.minute)
+        for days in range(8):
+            run_time = day + datetime.timedelta(days=days)
+            if run_time.weekday() in self.weekdays and run_time > after:
+                return run_time
+
+    '''
+    Return: A tuple of the start_date and end_date [datetime] reported on by a run at run_time. Last week keeps the time of day of the run,
+    as get_day_previous_week does for check.py
+    '''
+    def get_period(self, run_time):
+        monday = run_time - datetime.timedelta(days=run_time.weekday())
+        if self.period == 'this_week':
+            return monday, run_time
+        return monday - datetime.timedelta(weeks=1), monday - datetime.timedelta(days=1)
+
+'''
+Description: Runs the reports on their schedules in one long-running process, in place of starting check.py every hour only for most runs
+to stop at the schedule gate. The configurations, holidays, work day calendars and e-mail templates are loaded once. Between runs, the
+scheduler sleeps until the next schedule is due. The configuration file is only read again when its modification time changes, and the
+holidays only parsed again when their source changes. The time of every run is kept in the scheduler last_run_path marker file, if it is
+configured. When the scheduler starts, runs that were due within the last catch_up seconds and after the last run in the marker are run
+straight away. Without a marker to read, such as when it is not configured or the disk was wiped, a run that already happened can not be told
+apart from a missed run, so nothing is caught up
+Usage: Run by scheduler.py
+    scheduler = Scheduler(Loadup(sys.argv), TogglClientApi)
+    scheduler.run_forever()
+'''
+class Scheduler:
+
+    '''
+    Parameters: loadup [Loadup] (loads the configurations), api_factory (creates the Toggl api, usually TogglClientApi)
+        views_path (the folder containing the e-mail templates), holiday_calendar [HolidayCalendar] (defaults to HolidayCalendar.from_environment())
+        clock (returns the current datetime), sleep (sleeps for some seconds), check_interval (the most seconds slept at a time)
+        catch_up (optional - runs that were missed by at most this many seconds are still run. Defaults to the scheduler catch_up of the
+        configurations, or DEFAULT_CATCH_UP)
+    '''
+    def __init__(self, loadup, api_factory, views_path='views', holiday_calendar=None, clock=datetime.datetime.now, sleep=time.sleep,
+                 check_interval=DEFAULT_CHECK_INTERVAL, catch_up=None):
+        self.loadup = loadup
+        self.api_factory = api_factory
+        self.views_path = views_path
+        self.holiday_calendar = holiday_calendar or HolidayCalendar.from_environment()
+        self.clock = clock
+        self.sleep = sleep
+        self.check_interval = check_interval
+        self.catch_up = catch_up
+        # The time of the last run, so runs are never repeated by the catch up
+        self.last_run = None
+
+        loadup.initialize_configs()
+        self.configs = loadup.get_config()
+        self.schedules = Schedule.from_configs(self.configs)
+        self.holidays = self.holiday_calendar.load()
+        self.runner = self.create_runner()
+
+    '''
+    Return: The seconds runs are caught up for
+    '''
+    def get_catch_up(self):
+        if self.catch_up is not None:
+            return self.catch_up
+        return (self.configs.get('scheduler') or {}).get('catch_up', DEFAULT_CATCH_UP)
+
+    '''
+    Return: The time of the last run [datetime], read from the last_run_path marker. None if there is no marker, or it can not be read
+    '''
+    def read_last_run(self):
+        if not self.configs.get('scheduler'):
+            return None
+        try:
+            with open(self.configs['scheduler']['last_run_path']) as marker_file:
+                return datetime.datetime.strptime(marker_file.read().strip(), LAST_RUN_FORMAT)
+        except (IOError, ValueError):
+            return None
+
+    '''
+    Description: Keeps the time of the run in the last_run_path marker, if it is configured. The marker is written to a temporary file
+    first, so a marker is never left half written
+    '''
+    def write_last_run(self, run_time):
+        if not self.configs.get('scheduler'):
+            return
+        path = self.configs['scheduler']['last_run_path']
+        temporary_path = path + '.tmp'
+        try:
+            with open(temporary_path, 'w') as marker_file:
+                marker_file.write(run_time.strftime(LAST_RUN_FORMAT) + '\n')
+            os.rename(temporary_path, path)
+        except (IOError, OSError), exc:
+            logging.error("Could not write the last run to " + path + ":\n" + str(exc))
+
+    def create_runner(self):
+        return WorkspaceRunner(self.configs, self.holidays, self.api_factory, None, None, self.views_path, now=WorkDay.get_now())
+
+    '''
+    Description: Loads the configurations again if their file changed (Loadup.reload), and the holidays if their source changed. The runner
+    is only created again when either changed. If the changed configurations are invalid, the error is logged and the previous
+    configurations are kept
+    Return: True if the configurations or holidays changed
+    '''
+    def reload(self):
+        changed = False
+        try:
+            if self.loadup.reload():
+                configs = self.loadup.get_config()
+                schedules = Schedule.from_configs(configs)
+                logging.info("Reloaded the configurations from " + self.loadup.config_path)
+                self.configs = configs
+                self.schedules = schedules
+                changed = True
+        except Exception, exc:
+            # Invalid fields, or YAML that can not be parsed
+            logging.error("Could not reload the configurations from " + str(self.loadup.config_path) + ", keeping the previous ones:\n" + str(exc))
+
+        holidays = self.holiday_calendar.load()
+        if holidays != self.holidays:
+            self.holidays = holidays
+            changed = True
+
+        if changed:
+            self.runner = self.create_runner()
+        return changed
+
+    '''
+    Return: A tuple of the next datetime a schedule is due at after the datetime after, and the schedules due at that time
+    '''
+    def get_next_run(self, after):
+        run_times = [(schedule.next_run(after), schedule) for schedule in self.schedules]
+        due = min(run_time for run_time, schedule in run_times)
+        return due, [schedule for run_time, schedule in run_times if run_time == due]
+
+    '''
+    Description: Sleeps until the next schedule is due, runs it, and repeats. Runs that were due within the last catch_up seconds, such as
+    before a restart, and after the last known run, are run straight away. A run that was missed by more than catch_up (or
+    check_interval, if longer), such as while the machine was suspended, is skipped
+    Parameters: max_runs (optional - stop after this many runs. Runs forever by default)
+    Return: A list of the (schedule name, run time) of every run
+    '''
+    def run_forever(self, max_runs=None):
+        runs = []
+        catch_up = self.get_catch_up()
+        after = self.clock()
+        # Only runs after the last known run are caught up. Without one, runs that were due before the start may already have run
+        last_run = self.last_run or self.read_last_run()
+        if last_run is not None:
+            after = max(after - datetime.timedelta(seconds=catch_up), last_run)
+        while max_runs is None or len(runs) < max_runs:
+            due, schedules = self.get_next_run(after)
+            wait = (due - self.clock()).total_seconds()
+            if wait > 0:
+                self.sleep(min(wait, self.check_interval))
+                self.reload()
+                continue
+            if wait < -max(catch_up, self.check_interval):
+                logging.warn("Skipped the run due at " + str(due) + ", which was missed")
+                after = due
+                continue
+
+            # A run of the configurations as they are now, as the file may have changed since the last check
+            if self.reload():
+                continue
+            for schedule in schedules:
+                self.run(schedule, due)
+                runs.append((schedule.name, due))
+            after = due
+            self.last_run = due
+            self.write_last_run(due)
+        return runs
+
+    '''
+    Description: Runs a schedule over every workspace, and prints its output and stage times
+    Return: The results of every workspace
+    '''
+    def run(self, schedule, run_time):
+        start_date, end_date = schedule.get_period(run_time)
+        overrides = {}
+        if not schedule.send:
+            overrides['sendmail'] = {'to_send': False}
+        if schedule.period != 'last_week':
+            overrides['state'] = None
+
+        print "\n\nSchedule " + schedule.name + " - " + run_time.strftime('%Y-%m-%d %H:%M')
+        timer = RunTimer()
+        try:
+            results = self.runner.for_period(start_date, end_date, overrides, WorkDay.get_now()).run_all(timer)
+        except Exception:
+            print "Schedule " + schedule.name + " failed:\n" + traceback.format_exc()
+            return []
+
+        for result in results:
+            if result['output']:
+                sys.stdout.write(result['output'])
+        timer.print_stages()
+        return results
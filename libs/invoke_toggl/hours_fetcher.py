@@ -0,0 +1,197 @@
+import logging
+import datetime
+from multiprocessing.pool import ThreadPool
+
+from libs.invoke_toggl.json_stream import iter_response_array
+
+DEFAULT_CONCURRENCY = 8
+# The Toggl reports API only accepts date ranges of up to a year
+MAX_REPORT_DAYS = 365
+DEFAULT_PER_PAGE = 50
+
+'''
+Description: Fetches the hours tracked by workspace members from the Toggl API
+Usage: Used after the workspace members have been loaded, to gather the time tracked by every member for the reporting period
+before any of the User computations are done.
+'''
+class HoursFetcher:
+
+    '''
+    Parameters: api [TogglClientApi], settings (the togglAPI settings - user_agent and workspace_id are used)
+        concurrency (the maximum amount of Toggl requests that may be in flight at the same time)
+        bulk (True to fetch the hours of the whole workspace with a single summary report request)
+    '''
+    def __init__(self, api, settings, concurrency=DEFAULT_CONCURRENCY, bulk=True):
+        self.api = api
+        self.settings = settings
+        self.concurrency = max(1, int(concurrency))
+        self.bulk = bulk
+
+    '''
+    Description: Fetches the time tracked by each user over the date range. In bulk mode, a single workspace-wide report is
+    requested. If the bulk request fails, or bulk mode is disabled, the hours are fetched one user at a time instead.
+    Parameters: users (the workspace members, as returned by get_workspace_members)
+        start_date [YYYY-MM-DD], end_date [YYYY-MM-DD] (the date range of the report)
+    Return: A list containing the milliseconds tracked by each user, in the same order as users
+    Usage: The results can be zipped with users, so the report output keeps the order of the workspace members
+    '''
+    def fetch_users_hours(self, users, start_date, end_date):
+        users_hours = [None] * len(users)
+        for index, time_tracked in self.iter_users_hours(users, start_date, end_date):
+            users_hours[index] = time_tracked
+
+        return users_hours
+
+    '''
+    Description: Fetches the time tracked by each user over the date range, yielding the hours of each user as soon as they arrive.
+    When the hours are fetched one user at a time, they are fetched by a bounded pool of worker threads, and arrive in any order.
+    Return: A generator of (index of the user in users, milliseconds tracked) tuples
+    Usage: Useful to start working on the users whose hours have arrived, while the hours of other users are still being fetched
+    '''
+    def iter_users_hours(self, users, start_date, end_date):
+        if self.bulk is True:
+            try:
+                workspace_hours = self.fetch_workspace_hours(start_date, end_date)
+            except Exception, exc:
+                logging.warn("Bulk hours fetch failed, fetching hours per user; %s" % str(exc))
+            else:
+                for index, user in enumerate(users):
+                    yield index, workspace_hours.get(user['uid'], 0)
+                return
+
+        def fetch(indexed_user):
+            index, user = indexed_user
+            return index, self.fetch_user_hours(user, start_date, end_date)
+
+        pool_size = min(self.concurrency, len(users))
+        if pool_size <= 1:
+            for indexed_user in enumerate(users):
+                yield fetch(indexed_user)
+            return
+
+        pool = ThreadPool(pool_size)
+        try:
+            for result in pool.imap_unordered(fetch, enumerate(users)):
+                yield result
+        finally:
+            pool.close()
+            pool.join()
+
+    '''
+    Description: Fetches the time tracked by a single user over the date range
+    Return: The milliseconds tracked by the user
+    '''
+    def fetch_user_hours(self, user, start_date, end_date):
+        return self.api.get_user_hours_range(
+                self.settings['user_agent'],
+                self.settings['workspace_id'],
+                user['uid'],
+                start_date,
+                end_date
+        )
+
+    '''
+    Description: Fetches a summary report of the whole workspace, grouped by user, for the date range
+    Parameters: start_date [YYYY-MM-DD], end_date [YYYY-MM-DD] (the date range of the report)
+    Return: A dict of {uid: milliseconds tracked}. Users that tracked no time are not included.
+    '''
+    def fetch_workspace_hours(self, start_date, end_date):
+        params = {
+            'user_agent': self.settings['user_agent'],
+            'workspace_id': self.settings['workspace_id'],
+            'since': start_date,
+            'until': end_date,
+            'grouping': 'users',
+            'subgrouping': 'projects'
+        }
+        response = self.api.query_report('/summary', params)
+        response.raise_for_status()
+        return HoursFetcher.split_summary_by_user(response.json())
+
+    '''
+    Description: Splits a summary report, grouped by users, into the milliseconds tracked by each user
+    Parameters: summary (the decoded json of a summary report)
+        Example summary:
+            {
+                "total_grand": 36000000,
+                "data": [
+                    {"id": 123, "title": {"user": "Unit Test"}, "time": 36000000, "items": [...]}
+                ]
+            }
+    Return: A dict of {uid: milliseconds tracked}
+    '''
+    @staticmethod
+    def split_summary_by_user(summary):
+        users_hours = {}
+        for group in summary.get('data') or []:
+            uid = group['id']
+            users_hours[uid] = users_hours.get(uid, 0) + (group.get('time') or 0)
+
+        return users_hours
+
+    '''
+    Description: Fetches every time entry of the workspace over a date range, and adds up the time tracked by each user in each week.
+    The date range is fetched with detailed reports, a year and a page at a time, instead of once per week per user. Time entries are
+    added up as they are parsed, so memory only grows with the amount of users and weeks, not with the amount of time entries.
+    Parameters: start_date [YYYY-MM-DD], end_date [YYYY-MM-DD] (the date range of the report)
+    Return: A dict of {Monday of the week [YYYY-MM-DD]: {uid: milliseconds tracked}}. Weeks in which no time was tracked are not included.
+    Usage: Used to backfill the reports of many weeks in one run
+    '''
+    def fetch_weekly_hours(self, start_date, end_date):
+        weekly_hours = {}
+        for time_entry in self.iter_time_entries(start_date, end_date):
+            day = datetime.datetime.strptime(time_entry['start'][:10], '%Y-%m-%d')
+            week_start = (day - datetime.timedelta(days=day.weekday())).strftime('%Y-%m-%d')
+            week_hours = weekly_hours.setdefault(week_start, {})
+            week_hours[time_entry['uid']] = week_hours.get(time_entry['uid'], 0) + (time_entry.get('dur') or 0)
+
+        return weekly_hours
+
+    '''
+    Description: Streams the time entries of the workspace over a date range, with detailed reports. Pages are requested one at a time,
+    and each page is parsed incrementally, so only a single time entry needs to be decoded at a time. Each page is closed once it is read,
+    which returns its connection to the pool.
+    Parameters: start_date [YYYY-MM-DD], end_date [YYYY-MM-DD]
+    Return: A generator of time entries, each containing at least the uid, start and dur (the milliseconds tracked)
+    '''
+    def iter_time_entries(self, start_date, end_date):
+        for since, until in HoursFetcher.split_date_range(start_date, end_date, MAX_REPORT_DAYS):
+            page = 1
+            while True:
+                params = {
+                    'user_agent': self.settings['user_agent'],
+                    'workspace_id': self.settings['workspace_id'],
+                    'since': since,
+                    'until': until,
+                    'page': page
+                }
+                response = self.api.query_report('/details', params)
+                details = {}
+                page_entries = 0
+                try:
+                    response.raise_for_status()
+                    for time_entry in iter_response_array(response, 'data', details):
+                        page_entries = page_entries + 1
+                        yield time_entry
+                finally:
+                    if hasattr(response, 'close'):
+                        response.close()
+
+                if page_entries == 0 or page * details.get('per_page', DEFAULT_PER_PAGE) >= details.get('total_count', 0):
+                    break
+                page = page + 1
+
+    '''
+    Description: Splits a date range into consecutive date ranges of at most max_days days
+    Return: A list of (since [YYYY-MM-DD], until [YYYY-MM-DD]) tuples
+    '''
+    @staticmethod
+    def split_date_range(start_date, end_date, max_days):
+        start = datetime.datetime.strptime(start_date, '%Y-%m-%d')
+        end = datetime.datetime.strptime(end_date, '%Y-%m-%d')
+        date_ranges = []
+        while start <= end:
+            until = min(end, start + datetime.timedelta(days=max_days - 1))
+            date_ranges.append((start.strftime('%Y-%m-%d'), until.strftime('%Y-%m-%d')))
+            start = until + datetime.timedelta(days=1)
+        return date_ranges
@@ -0,0 +1,131 @@
+'''Contains functions to parse large JSON responses incrementally, without loading the whole response into memory'''
+
+import json
+
+CHUNK_SIZE = 64 * 1024
+# The reports whose pages are parsed incrementally. They are requested with stream=True, and never decoded as a whole by the cache
+STREAMED_REPORTS = ['/details']
+WHITESPACE = ' \t\n\r'
+
+'''
+Description: Reads JSON values one at a time from an iterable of text chunks. Only the chunk being read, and the value being
+decoded, are held in memory.
+Usage: Used by iter_json_array, to walk through the top level object of a response
+'''
+class JSONChunkReader:
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.exhausted = False
+
+    '''
+    Description: Reads the next chunk, dropping everything before the current position from the buffer
+    Return: False if there are no chunks left
+    '''
+    def fill(self):
+        try:
+            chunk = next(self.chunks)
+        except StopIteration:
+            self.exhausted = True
+            return False
+
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    '''
+    Return: The next character that is not whitespace, without reading past it
+    '''
+    def peek(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position = self.position + 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.fill():
+                raise ValueError("Unexpected end of JSON")
+
+    def expect(self, character):
+        if self.peek() != character:
+            raise ValueError("Expected " + character + " but found " + self.buffer[self.position:self.position + 20])
+        self.position = self.position + 1
+
+    '''
+    Description: Decodes the next value. More chunks are read until the value is complete. A value ending at the end of the buffer,
+    such as a number, may continue in the next chunk, so it is only decoded once the next chunk is read.
+    Return: The decoded value
+    '''
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+            except ValueError:
+                if not self.fill():
+                    raise
+                continue
+
+            if end == len(self.buffer) and not self.exhausted and self.fill():
+                continue
+            self.position = end
+            return value
+
+
+'''
+Description: Parses a JSON object incrementally, yielding the items of one of its arrays as soon as each item is complete
+Parameters: chunks (an iterable of the text of the JSON object, in pieces of any size), key (the name of the array)
+    header (optional - a dict, which every other member of the object is added to as it is parsed)
+Return: A generator of the items of the array
+Usage: The members of header that come after the array, are only added once every item has been yielded
+    for time_entry in iter_json_array(response.iter_content(CHUNK_SIZE), 'data', header):
+'''
+def iter_json_array(chunks, key, header=None):
+    reader = JSONChunkReader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+
+    while True:
+        name = reader.decode()
+        reader.expect(':')
+        if name == key and reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.expect(']')
+            else:
+                while True:
+                    yield reader.decode()
+                    if reader.peek() != ',':
+                        break
+                    reader.expect(',')
+                reader.expect(']')
+        else:
+            value = reader.decode()
+            if header is not None:
+                header[name] = value
+
+        if reader.peek() != ',':
+            break
+        reader.expect(',')
+    reader.expect('}')
+
+'''
+Description: Yields the items of an array in a response. Responses that can be read in chunks, such as requests responses, are parsed
+incrementally. Other responses, such as cached responses, are decoded as a whole.
+Parameters: response, key (the name of the array), header (optional - a dict, which every other member of the response is added to)
+Return: A generator of the items of the array
+'''
+def iter_response_array(response, key, header=None):
+    if hasattr(response, 'iter_content'):
+        for item in iter_json_array(response.iter_content(CHUNK_SIZE), key, header):
+            yield item
+        return
+
+    response_data = response.json()
+    if header is not None:
+        header.update((name, value) for name, value in response_data.items() if name != key)
+    for item in response_data.get(key) or []:
+        yield item
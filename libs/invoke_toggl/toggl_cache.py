@@ -0,0 +1,208 @@
+import json
+import time
+import sqlite3
+import datetime
+import threading
+
+from libs.invoke_toggl.json_stream import STREAMED_REPORTS
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_OPEN_TTL = 60 * 60
+DEFAULT_CLOSED_TTL = 60 * 60 * 24 * 30
+DEFAULT_CLOSED_AFTER_DAYS = 7
+# Returned by CachedTogglClient.lookup for keys that are not cached, as None (no time tracked) is a value that is cached
+MISSING = object()
+
+'''
+Description: A size-bounded, persistent key-value store for Toggl responses, backed by SQLite. Every entry has its own expiry time.
+When the store grows past max_entries, the least recently used entries are evicted.
+Usage: Used by CachedTogglClient, so that re-runs and backfills only hit the network for data that can still change
+'''
+class TogglCache:
+
+    '''
+    Parameters: path (the SQLite file to store the cache in. ':memory:' keeps the cache in memory)
+        max_entries (the maximum amount of entries kept in the cache)
+    '''
+    def __init__(self, path, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)")
+        self.connection.commit()
+
+    '''
+    Description: Looks up an entry
+    Parameters: key, default (optional - returned if there is no entry. None by default)
+    Return: The value stored under key, or default if there is no entry, or the entry has expired
+    '''
+    def get(self, key, default=None):
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute("SELECT value, expires_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return default
+            if row[1] <= now:
+                self.connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.connection.commit()
+                return default
+            self.connection.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self.connection.commit()
+
+        return json.loads(row[0])
+
+    '''
+    Description: Stores an entry, then evicts expired entries and the least recently used entries past max_entries
+    Parameters: key, value (must be json serializable), ttl (the seconds the entry stays valid for)
+    '''
+    def set(self, key, value, ttl):
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + ttl, now)
+            )
+            self.connection.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            self.connection.execute(
+                "DELETE FROM entries WHERE key IN "
+                "(SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            self.connection.commit()
+
+    '''
+    Description: Removes an entry, or every entry if no key is given
+    '''
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.connection.execute("DELETE FROM entries")
+            else:
+                self.connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self.connection.commit()
+
+    '''
+    Return: The amount of entries in the cache
+    '''
+    def size(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def close(self):
+        self.connection.close()
+
+
+'''
+Description: Stands in for a requests response, for responses that were loaded from the cache
+'''
+class CachedResponse:
+
+    status_code = 200
+
+    def __init__(self, json_data):
+        self.json_data = json_data
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self.json_data
+
+
+'''
+Description: Wraps a TogglClientApi, caching its responses in a TogglCache. Entries are keyed by endpoint, uid and date range.
+Date ranges that closed more than closed_after_days ago are kept for closed_ttl seconds, everything else is kept for open_ttl seconds.
+Usage: Used in place of the TogglClientApi. Calls that are not cached are passed through to the TogglClientApi.
+'''
+class CachedTogglClient:
+
+    '''
+    Parameters: api [TogglClientApi], cache [TogglCache]
+        cache_configs (the cache configurations - open_ttl, closed_ttl and closed_after_days are used)
+        refresh (True to ignore the entries in the cache. Fresh responses are still stored.)
+    '''
+    def __init__(self, api, cache, cache_configs=None, refresh=False):
+        cache_configs = cache_configs or {}
+        self.api = api
+        self.cache = cache
+        self.refresh = refresh
+        self.open_ttl = cache_configs.get('open_ttl', DEFAULT_OPEN_TTL)
+        self.closed_ttl = cache_configs.get('closed_ttl', DEFAULT_CLOSED_TTL)
+        self.closed_after_days = cache_configs.get('closed_after_days', DEFAULT_CLOSED_AFTER_DAYS)
+
+    def __getattr__(self, name):
+        return getattr(self.api, name)
+
+    '''
+    Return: The workspace members response. Members can always change, so it is only kept for open_ttl seconds.
+    '''
+    def get_workspace_members(self, workspace_id):
+        key = "workspace_users/" + str(workspace_id)
+        members = self.lookup(key)
+        if members is MISSING:
+            response = self.api.get_workspace_members(workspace_id)
+            if response.status_code != 200:
+                return response
+            members = response.json()
+            self.cache.set(key, members, self.open_ttl)
+
+        return CachedResponse(members)
+
+    '''
+    Return: The milliseconds tracked by the user over the date range. 0 if Toggl reports no time, so users who tracked nothing are cached too
+    '''
+    def get_user_hours_range(self, user_agent, workspace_id, user_id, start_date, end_date):
+        key = "user_hours/" + str(workspace_id) + "/" + str(user_id) + "/" + start_date + "/" + end_date
+        time_tracked = self.lookup(key)
+        if time_tracked is MISSING:
+            time_tracked = self.api.get_user_hours_range(user_agent, workspace_id, user_id, start_date, end_date) or 0
+            self.cache.set(key, time_tracked, self.ttl_for_range(end_date))
+
+        return time_tracked
+
+    '''
+    Return: The report response. Reports are kept according to the until date of the report. The pages of STREAMED_REPORTS are not cached,
+    as caching them would decode every page as a whole
+    '''
+    def query_report(self, url, params={}, method='GET'):
+        if method != 'GET' or url in STREAMED_REPORTS:
+            return self.api.query_report(url, params, method)
+
+        key = "report" + url + "?" + "&".join(str(name) + "=" + str(params[name]) for name in sorted(params))
+        report = self.lookup(key)
+        if report is MISSING:
+            response = self.api.query_report(url, params, method)
+            if response.status_code != 200:
+                return response
+            report = response.json()
+            self.cache.set(key, report, self.ttl_for_range(params.get('until')))
+
+        return CachedResponse(report)
+
+    '''
+    Return: The cached value for key, or MISSING if it is not cached, or the cache is being refreshed
+    '''
+    def lookup(self, key):
+        if self.refresh is True:
+            return MISSING
+        return self.cache.get(key, MISSING)
+
+    '''
+    Description: Decides how long data for a date range may be cached
+    Parameters: end_date [YYYY-MM-DD] (the last day of the date range)
+    Return: closed_ttl if the range closed more than closed_after_days ago, open_ttl otherwise
+    '''
+    def ttl_for_range(self, end_date, today=None):
+        if end_date is None:
+            return self.open_ttl
+
+        today = today or datetime.date.today()
+        end_day = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
+        if (today - end_day).days > self.closed_after_days:
+            return self.closed_ttl
+
+        return self.open_ttl
@@ -0,0 +1,175 @@
+import time
+import random
+import logging
+import threading
+import email.utils
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from libs.invoke_report.run_timer import NULL_TIMER
+from libs.invoke_toggl.json_stream import STREAMED_REPORTS
+
+DEFAULT_POOL_SIZE = 8
+DEFAULT_MAX_RETRIES = 4
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 30
+# Toggl allows about one request per second for each API token
+DEFAULT_RATE_LIMIT = 1
+DEFAULT_BURST = 3
+DEFAULT_TIMEOUT = 30
+RETRY_STATUSES = [429, 500, 502, 503, 504]
+
+'''
+Description: A thread safe token bucket. Tokens are added at rate tokens per second, up to burst tokens, and every request takes one.
+Usage: Shared by every thread making requests with the same API token, so the requests together stay under the rate limit
+    bucket = TokenBucket(1, 3)
+    bucket.acquire()
+'''
+class TokenBucket:
+
+    '''
+    Parameters: rate (the tokens added per second. 0 for no limit), burst (the most tokens that can be saved up)
+        clock, sleep (optional - replace time.time and time.sleep)
+    '''
+    def __init__(self, rate, burst=1, clock=time.time, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.tokens = float(self.burst)
+        self.updated = clock()
+
+    '''
+    Description: Takes a token, waiting until one is added if there are none left. Tokens are reserved while the lock is held, so
+    waiting threads are served in the order they arrived, and only sleep outside of the lock.
+    Return: The seconds waited
+    '''
+    def acquire(self):
+        if not self.rate:
+            return 0
+
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens = self.tokens - 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+
+        if wait > 0:
+            self.sleep(wait)
+        return wait
+
+
+'''
+Description: Sends the GET requests of a TogglClientApi over a pooled requests Session. Connections are kept alive between requests,
+requests that fail with a connection error, a timeout, a 429 or a 5xx response are retried with jittered exponential backoff, honoring
+the Retry-After header, and every request first takes a token from a TokenBucket.
+Usage: Created once per workspace, as Toggl rate limits each API token, and attached to its TogglClientApi
+    transport = TogglTransport(configs['togglAPI'])
+    transport.attach(api)
+'''
+class TogglTransport:
+
+    '''
+    Parameters: api_configs (the togglAPI configurations - pool_size, max_retries, backoff_base, backoff_max, rate_limit, burst and
+        timeout are used), timer [RunTimer] (optional - counts the retries and the seconds spent waiting for the rate limit)
+        sleep (optional - replaces time.sleep)
+    '''
+    def __init__(self, api_configs=None, timer=None, sleep=time.sleep):
+        api_configs = api_configs or {}
+        self.timer = timer or NULL_TIMER
+        self.sleep = sleep
+        self.max_retries = int(api_configs.get('max_retries', DEFAULT_MAX_RETRIES))
+        self.backoff_base = float(api_configs.get('backoff_base', DEFAULT_BACKOFF_BASE))
+        self.backoff_max = float(api_configs.get('backoff_max', DEFAULT_BACKOFF_MAX))
+        self.timeout = api_configs.get('timeout', DEFAULT_TIMEOUT)
+        self.retries = 0
+        self.retries_lock = threading.Lock()
+        self.bucket = TokenBucket(api_configs.get('rate_limit', DEFAULT_RATE_LIMIT), int(api_configs.get('burst', DEFAULT_BURST)), sleep=sleep)
+
+        # One connection pool per host, holding up to pool_size connections - enough for every fetching thread
+        pool_size = int(api_configs.get('pool_size', api_configs.get('concurrency', DEFAULT_POOL_SIZE)))
+        self.session = requests.Session()
+        self.session.headers['Connection'] = 'keep-alive'
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    '''
+    Description: Sends every GET request of the client through this transport. TogglClientApi sends its requests with its
+    _do_get_query(url, headers, auth, params) method, which is replaced on the client.
+    Return: True if the transport was attached, False if the client does not send its requests through _do_get_query
+    '''
+    def attach(self, api):
+        if not hasattr(api, '_do_get_query'):
+            return False
+        api._do_get_query = self.get
+        return True
+
+    '''
+    Description: Sends a GET request, retrying it while it fails with a connection error, a timeout, or a status in RETRY_STATUSES.
+    The pages of STREAMED_REPORTS are requested with stream=True, so their body is only read as it is parsed. The reader closes them
+    Return: The response. The last response is returned once max_retries retries have failed.
+    '''
+    def get(self, url, headers=None, auth=None, params=None):
+        stream = url.endswith(tuple(STREAMED_REPORTS))
+        attempt = 0
+        while True:
+            waited = self.bucket.acquire()
+            if waited:
+                self.timer.record('toggl_rate_limit_wait', waited)
+
+            try:
+                response = self.session.get(url, headers=headers, auth=auth, params=params, timeout=self.timeout, stream=stream)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout), exc:
+                if attempt >= self.max_retries:
+                    raise
+                logging.warn("Toggl request failed, retrying; %s" % str(exc))
+                response = None
+            else:
+                if response.status_code not in RETRY_STATUSES or attempt >= self.max_retries:
+                    return response
+                response.close()
+
+            with self.retries_lock:
+                self.retries = self.retries + 1
+            self.sleep(self.retry_delay(attempt, response))
+            attempt = attempt + 1
+
+    '''
+    Description: The seconds to wait before retrying. The Retry-After header of the response is honored when it is set. Otherwise
+    the delay is picked at random between 0 and an exponential backoff (full jitter), so clients that failed together do not retry together.
+    Parameters: attempt (0 for the first retry), response (the failed response, or None if the request raised)
+    '''
+    def retry_delay(self, attempt, response=None):
+        retry_after = TogglTransport.parse_retry_after(response.headers.get('Retry-After')) if response is not None else None
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    '''
+    Parameters: value (a Retry-After header - either seconds, or an HTTP date)
+    Return: The seconds to wait, or None if the header is not set or can not be parsed
+    '''
+    @staticmethod
+    def parse_retry_after(value, now=None):
+        if not value:
+            return None
+        try:
+            return max(0, float(value))
+        except ValueError:
+            pass
+
+        date = email.utils.parsedate_tz(value)
+        if date is None:
+            return None
+        return max(0, email.utils.mktime_tz(date) - (now or time.time()))
+
+    '''
+    Description: Closes the pooled connections, and counts the retries into the timer
+    '''
+    def close(self):
+        self.timer.count('toggl_retries', self.retries)
+        self.session.close()
@@ -0,0 +1,125 @@
+import datetime
+import numpy
+
+from libs.invoke_users.exclusions import ExclusionIndex
+from libs.invoke_users.invoke_users import TOGGL_REPORT_URL
+from libs.invoke_workdays.work_schedules import WorkSchedules
+
+'''
+Description: Computes the hours report of every member of a workspace at once, with NumPy arrays, instead of one User at a time.
+The results are the same as those of the User class - hours, percent_worked, missing_hours, the new hire hours reduction, the
+mark shown in the report, and whether the user should be contacted.
+Usage: Created once per workspace from its members, as the members only need to be parsed once. compute can then be called for any
+amount of weeks.
+    engine = ComplianceEngine(members, configs, work_day, 7.5)
+    results = engine.compute(tracked_ms, start_date, end_date, minimum_hours)
+Members who share a work schedule are grouped once, so the minimum hours and new hire reductions are computed once per schedule
+rather than once per member.
+'''
+class ComplianceEngine:
+
+    '''
+    Parameters: members (the workspace members, as returned by get_workspace_members), configs (the configurations - admin and exclude are used)
+        work_day [WorkDay], working_hours (the amount of hours expected in a full work day)
+        work_schedules [WorkSchedules] (optional - the work schedules of the members. Created from the configurations by default)
+    '''
+    def __init__(self, members, configs, work_day, working_hours, work_schedules=None):
+        self.members = members
+        self.work_day = work_day
+        self.working_hours = working_hours
+        self.work_schedules = work_schedules or WorkSchedules(configs, work_day, working_hours)
+
+        self.uids = numpy.array([member['uid'] for member in members])
+        self.joined_dates = [datetime.datetime.strptime(member['at'], '%Y-%m-%dT%H:%M:%S+00:00') for member in members]
+        self.joined = numpy.array(self.joined_dates, dtype='datetime64[s]')
+        self.joined_day = numpy.array([joined_date.day for joined_date in self.joined_dates])
+        self.skipped = numpy.array(ExclusionIndex(configs).get_excluded(members), dtype=bool)
+        # The fields of each member's User, and the start and end of their Toggl report url - the same every week, so only read once
+        self.user_fields = [(member['uid'], member.get('wid'), member.get('name') or member['email'], member['email'], member['inactive'], joined_date)
+                            for member, joined_date in zip(members, self.joined_dates)]
+        self.toggl_urls = [(TOGGL_REPORT_URL + str(member.get('wid')) + "/from/", "/users/" + str(member['uid']) + "/billable/both") for member in members]
+
+        # The distinct work schedules of the members, and the index of each member's schedule. The default schedule is always first
+        self.schedules = [self.work_schedules.default]
+        schedule_ids = {self.work_schedules.default.key: 0}
+        member_schedule_ids = []
+        for member in members:
+            schedule = self.work_schedules.get_schedule(member)
+            if schedule.key not in schedule_ids:
+                schedule_ids[schedule.key] = len(self.schedules)
+                self.schedules.append(schedule)
+            member_schedule_ids.append(schedule_ids[schedule.key])
+        self.schedule_ids = numpy.array(member_schedule_ids, dtype=int)
+
+    '''
+    Description: Computes the report of every member for a reporting period
+    Parameters: tracked_ms (the milliseconds tracked by each member, in the order of members)
+        start_date [datetime], end_date [datetime] (the reporting period), minimum_hours (the minimum hours of the default work schedule)
+        included (optional - an array which is False for members that are not part of the report, such as those who joined after it)
+    Return: A dict of arrays, in the order of members - hours, minimum_hours, percent_worked, missing_hours, hours_reduction, new_flag,
+        contact, reported (False for inactive members, admins and excluded members) and mark_notice
+    '''
+    def compute(self, tracked_ms, start_date, end_date, minimum_hours, included=None):
+        hours = numpy.asarray(tracked_ms, dtype=numpy.float64) / float(1000) / 60 / 60
+        schedule_minimum_hours = [minimum_hours] + [self.work_schedules.get_minimum_hours(schedule, start_date, end_date)
+                                                    for schedule in self.schedules[1:]]
+        minimum_hours = numpy.array(schedule_minimum_hours, dtype=numpy.float64)[self.schedule_ids]
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            percent_worked = numpy.where(minimum_hours == 0, 100.0, hours / minimum_hours * 100)
+
+        new_flag = (self.joined > numpy.datetime64(start_date, 's')) & (self.joined_day > start_date.day)
+        hours_reduction = self.compute_hours_reduction(new_flag, start_date, end_date)
+
+        not_enough_hours = percent_worked < 100
+        new_not_enough_hours = not_enough_hours & new_flag
+        remaining_hours = minimum_hours - hours_reduction
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            new_percent_worked = numpy.where(remaining_hours == 0, 100.0, hours / remaining_hours * 100)
+        percent_worked = numpy.where(new_not_enough_hours, new_percent_worked, percent_worked)
+
+        missing_hours = numpy.where(not_enough_hours, minimum_hours - hours - hours_reduction, 0)
+        contact = not_enough_hours & ~(missing_hours <= 0)
+        reported = ~self.skipped
+        if included is not None:
+            reported = reported & included
+
+        mark_notice = numpy.full(len(self.members), '', dtype=object)
+        mark_notice[new_not_enough_hours] = '[NEW] '
+        mark_notice[contact] = '*'
+
+        return {
+            'hours': hours,
+            'minimum_hours': minimum_hours,
+            'percent_worked': percent_worked,
+            'missing_hours': missing_hours,
+            'hours_reduction': hours_reduction,
+            'new_flag': new_flag,
+            'contact': contact & reported,
+            'reported': reported,
+            'mark_notice': mark_notice
+        }
+
+    '''
+    Description: Computes the hours new members did not need to work, from the start of the reporting period until they joined.
+    The reduction only depends on the work schedule and the day the member joined, so it is computed once per distinct schedule and join date.
+    Return: An array of the hours reduction of every member. 0 for members who are not new.
+    '''
+    def compute_hours_reduction(self, new_flag, start_date, end_date):
+        hours_reduction = numpy.zeros(len(self.members))
+        if not new_flag.any():
+            return hours_reduction
+
+        effective_end = numpy.minimum(self.joined, numpy.datetime64(end_date, 's'))
+        for schedule_id in numpy.unique(self.schedule_ids[new_flag]).tolist():
+            schedule_new = new_flag & (self.schedule_ids == schedule_id)
+            for effective_end_date in numpy.unique(effective_end[schedule_new]):
+                reduction = self.work_schedules.get_minimum_hours(self.schedules[schedule_id], start_date, effective_end_date.astype(datetime.datetime))
+                hours_reduction[schedule_new & (effective_end == effective_end_date)] = reduction
+
+        return hours_reduction
+
+    '''
+    Return: An array which is True for the members who joined on or before the end_date [datetime]
+    '''
+    def joined_by(self, end_date):
+        return self.joined.astype('datetime64[D]') <= numpy.datetime64(end_date.date())
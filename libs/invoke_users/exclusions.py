@@ -0,0 +1,68 @@
+'''
+Description: Decides which members of a workspace are left out of the report - inactive members, the admin e-mails, and the rules of the
+exclude configurations: e-mails, e-mail domains, Toggl user ids, Toggl group ids and Toggl workspace roles. Every rule is kept in a set,
+built once per report, so checking a member is a few set lookups, however long the lists are.
+Usage: Created by WeeklyReport and ComplianceEngine from the configurations
+    exclusions = ExclusionIndex(configs)
+    if exclusions.is_excluded(member):
+        ...
+'''
+
+# The Toggl workspace roles that can be excluded. A member is an admin if their admin field is True, and a user otherwise
+ROLES = ['admin', 'user']
+
+
+class ExclusionIndex:
+
+    '''
+    Parameters: configs (the configurations - admin, and the optional exclude dict of emails, domains, uids, groups and roles)
+    Raises: ValueError if a uid or group is not a number, or a role is unknown
+    '''
+    def __init__(self, configs):
+        exclude = configs.get('exclude') or {}
+        self.admins = set(email.lower() for email in configs.get('admin') or [])
+        self.emails = set(email.lower() for email in exclude.get('emails') or [])
+        self.domains = set(domain.lower().lstrip('@') for domain in exclude.get('domains') or [])
+        try:
+            self.uids = set(int(uid) for uid in exclude.get('uids') or [])
+            self.groups = set(int(group) for group in exclude.get('groups') or [])
+        except (TypeError, ValueError):
+            raise ValueError("exclude - uids and groups must be lists of Toggl ids")
+
+        self.roles = set(exclude.get('roles') or [])
+        if not self.roles.issubset(ROLES):
+            raise ValueError("exclude - roles must be a list of " + ", ".join(ROLES))
+
+    '''
+    Return: Why the member is excluded - 'inactive', 'admin', 'email', 'domain', 'uid', 'group' or 'role'. None if the member is reported
+    '''
+    def get_reason(self, member):
+        if member['inactive'] == True:
+            return 'inactive'
+
+        email = (member.get('email') or '').lower()
+        if email in self.admins:
+            return 'admin'
+        if email in self.emails:
+            return 'email'
+        if self.domains and email.rsplit('@', 1)[-1] in self.domains:
+            return 'domain'
+        if member['uid'] in self.uids:
+            return 'uid'
+        if self.groups and not self.groups.isdisjoint(member.get('group_ids') or []):
+            return 'group'
+        if self.roles and ('admin' if member.get('admin') is True else 'user') in self.roles:
+            return 'role'
+        return None
+
+    '''
+    Return: True if the member should be left out of the report
+    '''
+    def is_excluded(self, member):
+        return self.get_reason(member) is not None
+
+    '''
+    Return: A list which is True for every member that should be left out of the report, in the order of members
+    '''
+    def get_excluded(self, members):
+        return [self.get_reason(member) is not None for member in members]
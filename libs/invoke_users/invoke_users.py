@@ -1,24 +1,62 @@
 from datetime import datetime
+
+TOGGL_REPORT_URL = "https://www.toggl.com/app/#reports/summary/"
 '''
 Description: A User object contains the information for a user which will be used to send emails
 Usage: When iterating through the information of all users, these User objects are generated in order to abstract
-the user-related logic and data that is pertinent to e-mailing.
+the user-related logic and data that is pertinent to e-mailing. Only the fields of the member that are used are kept, in slots,
+so a User is small, and the member dict returned by Toggl is never changed.
 '''
-class User:
+class User(object):
+
+    __slots__ = ('uid', 'wid', 'name', 'email', 'inactive', 'joined_date', 'toggl_url', 'hours', 'min_hours', 'percent_worked',
+                 'missing_hours', 'hours_reduction', 'mark_notice', 'new_flag')
 
     '''
     Description: Initializes the default values for the user
-    Parameters: user, min_hours (minimum hours required to work for the week), hours (hours that the user tracked)
-    '''
-    def __init__(self, user, min_hours, hours):
-        self.user = user
+    Parameters: user (the member, as returned by get_workspace_members), min_hours (minimum hours required to work for the week),
+        hours (hours that the user tracked), joined_date [datetime] (optional - the date the member joined, if it was already parsed)
+    '''
+    def __init__(self, user, min_hours, hours, joined_date=None):
+        self.uid = user['uid']
+        self.wid = user.get('wid')
+        self.name = user.get('name')
+        self.email = user['email']
+        self.inactive = user['inactive']
+        self.joined_date = joined_date or datetime.strptime(user['at'], '%Y-%m-%dT%H:%M:%S+00:00')
+        self.toggl_url = None
         self.missing_hours = 0
+        self.hours_reduction = 0
         self.mark_notice = ''
+        self.new_flag = False
         self.hours = hours
-        self.percent_worked = self.hours / min_hours * 100
-        self.joined_date = datetime.strptime(self.user['at'], '%Y-%m-%dT%H:%M:%S+00:00')
+        try:
+            self.percent_worked = self.hours / min_hours * 100
+        except ZeroDivisionError:
+            # A work schedule with no hours in the reporting period, such as a week of leave
+            self.percent_worked = 100
         self.min_hours = min_hours
 
+    '''
+    Description: Creates a prepared User from values that are already computed, such as a row of the results of a ComplianceEngine,
+    without parsing the member or computing the values again
+    Parameters: fields (a tuple of the uid, wid, name - the email if the member has no name -, email, inactive and joined_date [datetime])
+        toggl_url, and the computed hours, min_hours, percent_worked, missing_hours, hours_reduction, new_flag and mark_notice
+    '''
+    @staticmethod
+    def from_values(fields, toggl_url, hours, min_hours, percent_worked, missing_hours, hours_reduction, new_flag, mark_notice):
+        user = User.__new__(User)
+        user.uid, user.wid, user.name, user.email, user.inactive, user.joined_date = fields
+        user.toggl_url = toggl_url
+        user.hours = hours
+        user.min_hours = min_hours
+        user.percent_worked = percent_worked
+        user.missing_hours = missing_hours
+        user.hours_reduction = hours_reduction
+        user.new_flag = new_flag
+        user.mark_notice = mark_notice
+        return user
+
     '''
     Description: If the user has not reported enough hours, they are added to the mailing list
     Parameters: minimum_hours_for_week, users_to_contact (reference to a list of users who are on the mailing list)
@@ -27,6 +65,7 @@ class User:
     who are missing hours. The hours they would need to meet the minimum threshold is also stored.
     '''
     def setup_missing_hours(self, minimum_hours_for_week, users_to_contact, hours_reduction):
+        self.hours_reduction = hours_reduction
         if self.is_not_enough_hours():
             if self.new_flag is True:
                 try:
@@ -38,13 +77,14 @@ class User:
 
             if not self.missing_hours <= 0:
                 self.mark_notice = '*'
-                users_to_contact.append((self.user, self.hours, self.percent_worked))
+                users_to_contact.append(self)
 
     '''
     Description: Checks to see if the user is inactive, or an admin. If so, they should be excluded from the e-mail reports.
     Return: True if the user is an admin or is inactive. False otherwise.
     Usage: When iterating through all users, this method can be used to ignore the current user. If the user is inactive or
-    an admin, there would be no reason to add them to the mailing list.
+    an admin, there would be no reason to add them to the mailing list. Reports check members with an ExclusionIndex instead,
+    which also applies the exclude rules, and does not scan the admin list for every user.
     '''
     def skip_check(self, configs):
         if self.is_inactive() or self.is_admin(configs):
@@ -93,7 +133,7 @@ class User:
     Return: True if the user is inactive, False Otherwise
     '''
     def is_inactive(self):
-        if self.user['inactive'] == True:
+        if self.inactive == True:
             return True
         else:
             return False
@@ -103,7 +143,7 @@ class User:
     '''
     def is_admin(self, configs):
         admins = configs['admin']
-        admin = next((item for item in admins if item == self.user['email']), None)
+        admin = next((item for item in admins if item == self.email), None)
 
         if admin is None:
             return False
@@ -115,17 +155,14 @@ class User:
     Parameter: start_date [YYYY-MM-DD], end_date [YYYY-MM-DD] (The date range that the report should cover)
     '''
     def set_toggl_url(self, start_date, end_date):
-        self.user['togglURL'] = "https://www.toggl.com/app/#reports/summary/" + str(self.user['wid']) + "/from/" + start_date + "/to/" + end_date + "/users/" + str(self.user['uid']) + "/billable/both"
+        self.toggl_url = TOGGL_REPORT_URL + str(self.wid) + "/from/" + start_date + "/to/" + end_date + "/users/" + str(self.uid) + "/billable/both"
 
     '''
     Description: If the user has no name, the name is set to the email
     '''
     def email_to_name(self):
-        try:
-            if not self.user['name']:
-                self.user['name'] = self.user['email']
-        except KeyError:
-            self.user['name'] = self.user['email']
+        if not self.name:
+            self.name = self.email
     '''
     Description: Checks if the user has not worked enough hours
     Return: True if the user has not worked enough hours last week
@@ -137,23 +174,23 @@ class User:
     Return: The users id
     '''
     def get_id(self):
-        return self.user['uid']
+        return self.uid
 
     '''
     Return: The users name
     '''
     def get_name(self):
-        return self.user['name']
+        return self.name
 
     '''
     Return: The url to the toggl report of the user
     '''
     def get_toggl_url(self):
-        return self.user['togglURL']
+        return self.toggl_url
 
     '''
     Return: The users email
     '''
     def get_email(self):
-        return self.user['email']
+        return self.email
 
@@ -0,0 +1,203 @@
+import os
+import time
+import errno
+import pickle
+import logging
+import datetime
+import tempfile
+import urllib2
+import yaml
+
+DEFAULT_SNAPSHOT_PATH = os.path.join(tempfile.gettempdir(), 'alma_holidays.pickle')
+# Remote holidays are used for this many seconds before they are revalidated
+DEFAULT_MAX_AGE = 3600
+DEFAULT_TIMEOUT = 10
+SNAPSHOT_VERSION = 1
+
+'''
+Description: Loads the holidays from HOLIDAY_CONFIG_PATH - a file or a url. The YAML is parsed and validated once, and the parsed holidays are
+written to a pickle snapshot. Later runs read the snapshot instead, as long as the source has not changed - a file is compared by its
+modification time and size, and a url is revalidated with its ETag and Last-Modified headers once the snapshot is older than max_age.
+Usage: Used by check.py, in place of parsing the holidays stream every run
+    holidays = HolidayCalendar.from_environment().load()
+'''
+class HolidayCalendar:
+
+    '''
+    Parameters: location (the path or url of the holidays YAML), snapshot_path (the file the parsed holidays are stored in. None to disable)
+        max_age (the seconds a snapshot of a url is used before it is revalidated), timeout (the seconds to wait for the url)
+    '''
+    def __init__(self, location, snapshot_path=DEFAULT_SNAPSHOT_PATH, max_age=DEFAULT_MAX_AGE, timeout=DEFAULT_TIMEOUT):
+        self.location = location
+        self.snapshot_path = snapshot_path
+        self.max_age = max_age
+        self.timeout = timeout
+
+    '''
+    Description: Creates the calendar from the environment variables - HOLIDAY_CONFIG_PATH, and the optional HOLIDAY_SNAPSHOT_PATH and HOLIDAY_MAX_AGE
+    '''
+    @staticmethod
+    def from_environment():
+        if 'HOLIDAY_CONFIG_PATH' not in os.environ:
+            print "Please configure HOLIDAY_CONFIG_PATH. System terminating."
+            quit()
+
+        return HolidayCalendar(
+            os.environ['HOLIDAY_CONFIG_PATH'],
+            os.environ.get('HOLIDAY_SNAPSHOT_PATH', DEFAULT_SNAPSHOT_PATH),
+            int(os.environ.get('HOLIDAY_MAX_AGE', DEFAULT_MAX_AGE))
+        )
+
+    def is_remote(self):
+        return self.location.split('://', 1)[0] in ('http', 'https', 'ftp', 'file')
+
+    '''
+    Return: The holidays, in the format WorkDay expects - {year: [{'date': date, 'percent_used': 0.5}]}
+    '''
+    def load(self):
+        if self.is_remote():
+            return self.load_url()
+        return self.load_file()
+
+    def load_file(self):
+        try:
+            stat = os.stat(self.location)
+        except OSError:
+            print "Please configure HOLIDAY_CONFIG_PATH. System terminating."
+            quit()
+
+        source = {'mtime': stat.st_mtime, 'size': stat.st_size}
+        snapshot = self.read_snapshot()
+        if snapshot is not None and snapshot['source'] == source:
+            return snapshot['holidays']
+
+        with open(self.location, 'r') as holidays_file:
+            holidays = HolidayCalendar.parse(holidays_file.read(), self.location)
+        self.write_snapshot(holidays, source)
+        return holidays
+
+    '''
+    Description: Loads the holidays from a url. A fresh snapshot is used as is. An older snapshot is revalidated with a conditional request,
+    and kept if the url answers 304 Not Modified, or can not be reached.
+    '''
+    def load_url(self):
+        snapshot = self.read_snapshot()
+        if snapshot is not None and time.time() - snapshot['validated_at'] < self.max_age:
+            return snapshot['holidays']
+
+        request = urllib2.Request(self.location)
+        if snapshot is not None:
+            if snapshot['source'].get('etag'):
+                request.add_header('If-None-Match', snapshot['source']['etag'])
+            if snapshot['source'].get('last_modified'):
+                request.add_header('If-Modified-Since', snapshot['source']['last_modified'])
+
+        try:
+            response = urllib2.urlopen(request, timeout=self.timeout)
+        except urllib2.HTTPError, exc:
+            if exc.code == 304 and snapshot is not None:
+                self.write_snapshot(snapshot['holidays'], snapshot['source'])
+                return snapshot['holidays']
+            return self.fall_back(snapshot, exc)
+        except (urllib2.URLError, IOError), exc:
+            return self.fall_back(snapshot, exc)
+
+        try:
+            content = response.read()
+            source = {'etag': response.info().getheader('ETag'), 'last_modified': response.info().getheader('Last-Modified')}
+        finally:
+            response.close()
+
+        holidays = HolidayCalendar.parse(content, self.location)
+        self.write_snapshot(holidays, source)
+        return holidays
+
+    def fall_back(self, snapshot, exc):
+        if snapshot is None:
+            raise exc
+        logging.warn("Could not revalidate the holidays at " + self.location + ", using the snapshot; %s" % str(exc))
+        return snapshot['holidays']
+
+    '''
+    Description: Parses and validates the holidays YAML
+    Return: The holidays
+    Raises: ValueError listing every invalid holiday
+    '''
+    @staticmethod
+    def parse(content, location=''):
+        holidays = yaml.safe_load(content) or {}
+        errors = HolidayCalendar.validate(holidays)
+        if errors:
+            raise ValueError("Invalid holidays in " + location + ":\n  " + "\n  ".join(errors))
+        return holidays
+
+    '''
+    Return: A list of the problems with the holidays. Empty if they are valid
+    '''
+    @staticmethod
+    def validate(holidays):
+        if not isinstance(holidays, dict):
+            return ["the holidays must be a mapping of years to lists of holidays"]
+
+        errors = []
+        for year, year_holidays in holidays.items():
+            if not isinstance(year, int):
+                errors.append(str(year) + ": the year must be a number")
+                continue
+            if not isinstance(year_holidays, list):
+                errors.append(str(year) + ": must be a list of holidays")
+                continue
+
+            for index, holiday in enumerate(year_holidays):
+                name = str(year) + " holiday " + str(index + 1)
+                if not isinstance(holiday, dict) or not isinstance(holiday.get('date'), datetime.date):
+                    errors.append(name + ": date must be a YYYY-MM-DD date")
+                    continue
+                if holiday['date'].year != year:
+                    errors.append(name + ": " + str(holiday['date']) + " is not in " + str(year))
+                percent_used = holiday.get('percent_used', 1)
+                if isinstance(percent_used, bool) or not isinstance(percent_used, (int, float)) or not 0 <= percent_used <= 1:
+                    errors.append(name + ": percent_used must be a number from 0 to 1")
+
+        return errors
+
+    '''
+    Return: The snapshot of this location - its holidays, source and validated_at - or None if there is no readable snapshot
+    '''
+    def read_snapshot(self):
+        if not self.snapshot_path:
+            return None
+        try:
+            with open(self.snapshot_path, 'rb') as snapshot_file:
+                # A snapshot written by another user of the temp folder is never unpickled
+                if os.fstat(snapshot_file.fileno()).st_uid != os.getuid():
+                    return None
+                snapshot = pickle.load(snapshot_file)
+        except (IOError, EOFError, pickle.UnpicklingError, ValueError, TypeError, AttributeError, ImportError):
+            return None
+
+        if not isinstance(snapshot, dict) or snapshot.get('version') != SNAPSHOT_VERSION or snapshot.get('location') != self.location:
+            return None
+        return snapshot
+
+    '''
+    Description: Writes the snapshot to a temporary file first, then renames it, so a run never reads a partly written snapshot.
+    The snapshot is only readable by its owner
+    '''
+    def write_snapshot(self, holidays, source):
+        if not self.snapshot_path:
+            return
+
+        snapshot = {'version': SNAPSHOT_VERSION, 'location': self.location, 'source': source, 'validated_at': time.time(), 'holidays': holidays}
+        temporary_path = self.snapshot_path + '.' + str(os.getpid())
+        try:
+            with os.fdopen(os.open(temporary_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0600), 'wb') as snapshot_file:
+                pickle.dump(snapshot, snapshot_file, pickle.HIGHEST_PROTOCOL)
+            os.rename(temporary_path, self.snapshot_path)
+        except (IOError, OSError), exc:
+            logging.warn("Could not write the holidays snapshot to " + self.snapshot_path + "; %s" % str(exc))
+            try:
+                os.remove(temporary_path)
+            except OSError, remove_exc:
+                if remove_exc.errno != errno.ENOENT:
+                    raise
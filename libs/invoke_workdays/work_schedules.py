@@ -0,0 +1,143 @@
+import datetime
+
+from libs.invoke_workdays.workday import WorkDay
+
+DEFAULT_HOURS_PER_DAY = 7.5
+
+'''
+Description: The hours a member is expected to work - the hours of a full work day, the work days, the FTE (the fraction of full time
+worked) and the days of leave. Schedules that are the same share a key, so their minimum hours are only computed once.
+Usage: Created by WorkSchedules from an entry of the work_schedules list of the configurations
+'''
+class WorkSchedule:
+
+    '''
+    Parameters: schedule_configs (name, hours_per_day, work_days, fte, and leave_days - a list of dates, or of {'date': date, 'percent_used': 0.5}
+        for part days), default_work_days (the work_days of the configurations), default_hours_per_day
+    Raises: ValueError if a field is invalid
+    '''
+    def __init__(self, schedule_configs, default_work_days, default_hours_per_day=DEFAULT_HOURS_PER_DAY):
+        self.name = str(schedule_configs.get('name', 'default'))
+        try:
+            self.hours_per_day = float(schedule_configs.get('hours_per_day', default_hours_per_day))
+            self.work_days = tuple(sorted(set(int(day) for day in schedule_configs.get('work_days', default_work_days))))
+            self.fte = float(schedule_configs.get('fte', 1))
+        except (TypeError, ValueError):
+            raise ValueError("Work schedule " + self.name + ": hours_per_day and fte must be numbers, and work_days a list of days")
+
+        if self.hours_per_day < 0 or not 0 <= self.fte <= 1 or not all(0 <= day <= 6 for day in self.work_days):
+            raise ValueError("Work schedule " + self.name + ": hours_per_day must be positive, fte from 0 to 1, and work_days from 0 (Sunday) to 6")
+
+        leave_days = {}
+        for leave_day in schedule_configs.get('leave_days') or []:
+            if not isinstance(leave_day, dict):
+                leave_day = {'date': leave_day}
+            leave_date = WorkSchedule.parse_date(leave_day.get('date'), self.name)
+            leave_days.setdefault(leave_date, float(leave_day.get('percent_used', 1)))
+        self.leave_days = tuple(sorted(leave_days.items()))
+
+        self.key = (self.hours_per_day, self.work_days, self.fte, self.leave_days)
+
+    @staticmethod
+    def parse_date(value, name):
+        if isinstance(value, datetime.datetime):
+            return value.date()
+        if isinstance(value, datetime.date):
+            return value
+        try:
+            return datetime.date(*[int(part) for part in str(value).split('-')])
+        except (TypeError, ValueError):
+            raise ValueError("Work schedule " + name + ": leave_days must be YYYY-MM-DD dates (got " + repr(value) + ")")
+
+'''
+Description: Assigns every member a work schedule, and computes the minimum hours of each distinct schedule once per reporting period.
+Members are matched by their Toggl user id, then by e-mail, then by Toggl group. Everyone else has the default schedule - the work days
+of the work_day calendar, at the hours of a full work day. Thousands of members usually share a handful of schedules, so the day by day
+work calendar is only consulted a handful of times, however many members there are.
+Usage: Created once per workspace, and shared by its reports and ComplianceEngine
+    work_schedules = WorkSchedules(configs, work_day, 7.5)
+    schedule = work_schedules.get_schedule(member)
+    minimum_hours = work_schedules.get_minimum_hours(schedule, start_date, end_date)
+'''
+class WorkSchedules:
+
+    '''
+    Parameters: configs (the configurations - the optional work_schedules list is used), work_day [WorkDay] (the calendar of the default schedule)
+        hours_per_day (the hours of a full work day of the default schedule)
+        get_work_day (optional - returns the WorkDay of other work days, such as WorkspaceRunner.get_work_day. Built from work_day otherwise)
+    Raises: ValueError if a work schedule is invalid
+    '''
+    def __init__(self, configs, work_day, hours_per_day=DEFAULT_HOURS_PER_DAY, get_work_day=None):
+        self.work_day = work_day
+        self.get_work_day = get_work_day
+        self.default = WorkSchedule({'name': 'default'}, work_day.work_days, hours_per_day)
+        self.work_days = {self.default.work_days: work_day}
+        self.minimum_hours = {}
+
+        self.by_uid = {}
+        self.by_email = {}
+        self.by_group = {}
+        schedules = {self.default.key: self.default}
+        for schedule_configs in configs.get('work_schedules') or []:
+            schedule = WorkSchedule(schedule_configs, work_day.work_days, hours_per_day)
+            try:
+                uids = [int(uid) for uid in schedule_configs.get('uids') or []]
+                groups = [int(group) for group in schedule_configs.get('groups') or []]
+            except (TypeError, ValueError):
+                raise ValueError("Work schedule " + schedule.name + ": uids and groups must be lists of Toggl ids")
+
+            # Schedules that are the same share one WorkSchedule, and a member listed by more than one schedule has the first one
+            schedule = schedules.setdefault(schedule.key, schedule)
+            for uid in uids:
+                self.by_uid.setdefault(uid, schedule)
+            for email in schedule_configs.get('emails') or []:
+                self.by_email.setdefault(email.lower(), schedule)
+            for group in groups:
+                self.by_group.setdefault(group, (len(self.by_group), schedule))
+
+    '''
+    Return: The WorkSchedule of the member
+    '''
+    def get_schedule(self, member):
+        schedule = self.by_uid.get(member['uid']) or self.by_email.get((member.get('email') or '').lower())
+        if schedule is not None:
+            return schedule
+
+        groups = [self.by_group[group] for group in member.get('group_ids') or [] if group in self.by_group]
+        if groups:
+            return min(groups, key=lambda group: group[0])[1]
+        return self.default
+
+    '''
+    Return: The minimum hours of the schedule from start_date to end_date [datetime] - the hours of its work days that are not holidays
+    or leave, times its FTE. Computed once per distinct schedule and period
+    '''
+    def get_minimum_hours(self, schedule, start_date, end_date):
+        cache_key = (schedule.key, start_date, end_date)
+        if cache_key not in self.minimum_hours:
+            work_day = self.get_calendar(schedule.work_days)
+            minimum_hours = work_day.calculate_total_work_hours(schedule.hours_per_day, start_date, end_date)
+            for leave_date, percent_used in schedule.leave_days:
+                if start_date.date() <= leave_date <= end_date.date():
+                    leave_day = datetime.datetime.combine(leave_date, start_date.time())
+                    minimum_hours = minimum_hours - work_day.calculate_total_work_hours(schedule.hours_per_day, leave_day, leave_day) * percent_used
+            self.minimum_hours[cache_key] = minimum_hours * schedule.fte
+
+        return self.minimum_hours[cache_key]
+
+    '''
+    Return: The hours a new member of the schedule did not need to work, from start_date until they joined (or end_date, if they joined later)
+    '''
+    def get_hours_reduction(self, schedule, start_date, end_date, joined_date):
+        return self.get_minimum_hours(schedule, start_date, min(joined_date, end_date))
+
+    '''
+    Return: The WorkDay of the work days. Schedules with the same work days share one calendar
+    '''
+    def get_calendar(self, work_days):
+        if work_days not in self.work_days:
+            if self.get_work_day is not None:
+                self.work_days[work_days] = self.get_work_day(list(work_days))
+            else:
+                self.work_days[work_days] = WorkDay(self.work_day.holidays, list(work_days), self.work_day.now)
+        return self.work_days[work_days]
@@ -1,6 +1,8 @@
 from pytz import timezone
 from datetime import datetime
+from datetime import date
 from datetime import timedelta
+from fractions import Fraction
 import os
 import urllib2
 
@@ -12,6 +14,10 @@ class WorkDay:
     now = None
     holidays = None
     work_days = None
+    holiday_index = None
+    calendar_start = None
+    work_day_totals = None
+    days_off_totals = None
 
     '''
     Parameters:
@@ -36,6 +42,12 @@ class WorkDay:
         self.__class__.now = datetime_now
         self.__class__.holidays = holidays
         self.__class__.work_days = work_days
+        # Kept on the instance as well, so calendars of different work days (see WorkSchedules) do not share them
+        self.now = datetime_now
+        self.holidays = holidays
+        self.work_days = work_days
+        self.holiday_index = WorkDay.build_holiday_index(holidays)
+        self.build_work_day_calendar(WorkDay.get_calendar_years(holidays, datetime_now))
 
     '''
     Description: Checks if today is a workday
@@ -43,20 +55,42 @@ class WorkDay:
     '''
     def is_today_workday(self):
         now = self.__class__.now
-        return WorkDay.is_workday(now, self.__class__.holidays, self.__class__.work_days)
+        return self.is_weekday(now, self.__class__.work_days) and (self.lookup_holiday(now) is False)
 
     '''
     Description: Calculates the minimum expected hours that employees should have worked, given the date range
     Parameters: working_hours (the amount of hours expected in a full work day)
         start_date [YYYY-MM-DD], end_date [YYYY-MM-DD] (The date range within which to calculate the hours)
     Return: A float representing the minimum expected hours that all employees should have worked
+    Usage: Ranges inside the work day calendar are answered from its running totals. Other ranges are summed day by day.
     '''
     def calculate_total_work_hours(self, working_hours, start_date, end_date):
+        total_days = int((end_date - start_date).days) + 1
+        if total_days <= 0:
+            return 0
+
+        first_day = (start_date.date() - self.calendar_start).days
+        last_day = first_day + total_days
+        if first_day < 0 or last_day >= len(self.work_day_totals):
+            return self.sum_work_hours(working_hours, start_date, end_date)
+
+        work_days = self.work_day_totals[last_day] - self.work_day_totals[first_day]
+        days_off = self.days_off_totals[last_day] - self.days_off_totals[first_day]
+
+        return float(Fraction(working_hours) * (work_days - days_off))
+
+    '''
+    Description: Calculates the minimum expected hours by walking through every day of the date range
+    Parameters: working_hours (the amount of hours expected in a full work day)
+        start_date [YYYY-MM-DD], end_date [YYYY-MM-DD] (The date range within which to calculate the hours)
+    Return: A float representing the minimum expected hours that all employees should have worked
+    '''
+    def sum_work_hours(self, working_hours, start_date, end_date):
         minimum_hours = 0
         for single_date in self.daterange(start_date, end_date):
 
             if self.is_weekday(single_date, self.work_days) is True:
-                holiday_utilization = self.holiday_utilization(single_date, self.holidays)
+                holiday_utilization = self.lookup_holiday(single_date)
                 if holiday_utilization is False:
                     minimum_hours = minimum_hours + working_hours
                 else:
@@ -65,6 +99,75 @@ class WorkDay:
 
         return minimum_hours
 
+    '''
+    Description: Builds the work day calendar - running totals of the work days, and of the holiday time off on work days,
+    for every day of the given years. The totals are kept as exact fractions, so that any range can be answered with two lookups.
+    Parameters: years (the years the calendar should cover)
+    '''
+    def build_work_day_calendar(self, years):
+        self.calendar_start = date(min(years), 1, 1)
+        calendar_days = (date(max(years), 12, 31) - self.calendar_start).days + 1
+
+        work_day_totals = [0]
+        days_off_totals = [Fraction(0)]
+        for n in range(calendar_days):
+            single_date = self.calendar_start + timedelta(n)
+            work_day_total = work_day_totals[-1]
+            days_off_total = days_off_totals[-1]
+
+            if (single_date.isoweekday() % 7) in self.work_days:
+                work_day_total = work_day_total + 1
+                holiday_utilization = self.holiday_index.get(single_date, False)
+                if holiday_utilization is not False:
+                    days_off_total = days_off_total + Fraction(holiday_utilization)
+
+            work_day_totals.append(work_day_total)
+            days_off_totals.append(days_off_total)
+
+        self.work_day_totals = work_day_totals
+        self.days_off_totals = days_off_totals
+
+    '''
+    Description: Finds the years that the work day calendar should cover - every year with holidays, as well as the current and previous year
+    Return: A list of years
+    '''
+    @staticmethod
+    def get_calendar_years(holidays, datetime_now):
+        years = [int(year) for year in (holidays or {}).keys()]
+        if datetime_now is not None:
+            years.extend([datetime_now.year - 1, datetime_now.year])
+        if not years:
+            years = [date.today().year]
+
+        return years
+
+    '''
+    Description: Checks if the given date is a holiday, using the holiday index built when the WorkDay was created
+    Parameters: datetime_tocheck (the date to check)
+    Return: If not a holiday: False. Otherwise, a float from 0 to 1, representing the percent of holiday utilization
+    Usage: Same result as holiday_utilization, without scanning the holidays of the year for every date
+    '''
+    def lookup_holiday(self, datetime_tocheck):
+        return self.holiday_index.get(datetime_tocheck.date(), False)
+
+    '''
+    Description: Builds an index of the holidays, keyed by date
+    Parameters: holidays (the holidays, grouped by year)
+    Return: A dict of {date: percent_used}. If a date is listed more than once, only the first listing is used.
+        Holidays listed under a year other than their own are ignored, as they are never found by holiday_utilization
+    '''
+    @staticmethod
+    def build_holiday_index(holidays):
+        holiday_index = {}
+        for year, holidays_this_year in (holidays or {}).items():
+            for holiday in holidays_this_year or []:
+                holiday_date = holiday["date"]
+                if holiday_date.year != int(year) or holiday_date in holiday_index:
+                    continue
+                holiday_index[holiday_date] = holiday.get("percent_used", 1)
+
+        return holiday_index
+
     def daterange(self, start_date, end_date):
         for n in range(int((end_date - start_date).days) + 1):
             yield start_date + timedelta(n)
@@ -0,0 +1,13 @@
+import sys
+import logging
+
+from toggle_client_api.api_client import TogglClientApi
+from libs.invoke_loadup.invoke_loadup import Loadup
+from libs.invoke_schedule.scheduler import Scheduler
+
+# Runs the reports on the schedules of the configurations, in one long-running process, instead of starting check.py every hour.
+# Usage: python scheduler.py [config path]. Without a schedules list, last week is reported at the date_restrict weekday and hour
+logging.basicConfig(level=logging.INFO)
+
+scheduler = Scheduler(Loadup(sys.argv), TogglClientApi)
+scheduler.run_forever()
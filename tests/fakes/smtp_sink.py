@@ -0,0 +1,111 @@
+'''
+Description: A local stand-in SMTP server, which accepts and counts every message without delivering it
+Usage: Used by the tests and benchmarks in place of a real mail provider. Every connection is handled in its own thread,
+and latency can be injected into every accepted message, to mimic a remote provider.
+    sink = SMTPSink(latency=0.02)
+    sink.start()
+    ... send mail to ('127.0.0.1', sink.port) ...
+    sink.stop()
+'''
+import time
+import threading
+import SocketServer
+
+
+class SMTPSinkHandler(SocketServer.StreamRequestHandler):
+
+    def handle(self):
+        self.server.sink.record_connection()
+        self.reply('220 localhost SMTP sink')
+
+        recipients = []
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+
+            if in_data:
+                if line.rstrip('\r\n') == '.':
+                    in_data = False
+                    time.sleep(self.server.sink.latency)
+                    self.server.sink.record_message(recipients)
+                    recipients = []
+                    self.reply('250 OK')
+                continue
+
+            command = line[:4].upper()
+            if command in ('HELO', 'EHLO'):
+                self.reply('250 localhost')
+            elif command == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip().strip('<>'))
+                self.reply('250 OK')
+            elif command == 'DATA':
+                in_data = True
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+            elif command in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                break
+            else:
+                self.reply('502 Command not implemented')
+
+    def reply(self, response):
+        self.wfile.write(response + '\r\n')
+        self.wfile.flush()
+
+
+class SMTPSinkServer(SocketServer.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class SMTPSink:
+
+    '''
+    Parameters: latency (the seconds each accepted message is delayed by), port (0 picks a free port)
+    '''
+    def __init__(self, latency=0, port=0):
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.server = SMTPSinkServer(('127.0.0.1', port), SMTPSinkHandler)
+        self.server.sink = self
+        self.port = self.server.server_address[1]
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def record_connection(self):
+        with self.lock:
+            self.connections = self.connections + 1
+
+    def record_message(self, recipients):
+        with self.lock:
+            self.messages.append(recipients)
+
+    '''
+    Return: The smtp configurations that connect to this sink
+    '''
+    def get_smtp_configs(self):
+        return {
+            'host': '127.0.0.1',
+            'port': self.port,
+            'username': '',
+            'password': '',
+            'ssl': False
+        }
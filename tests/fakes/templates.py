@@ -0,0 +1,17 @@
+'''
+Description: Template fixtures shared by the tests and benchmarks
+Usage: full_alert_source() is the alert template as it was before it was split into shared fragments - checked in as
+tests/fakes/hours_alert_original.html, so a change to the fragments that changes the e-mail is caught
+'''
+import os
+
+ORIGINAL_ALERT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hours_alert_original.html')
+
+
+'''
+Return: The source of the alert template as it was before it was split. It is rendered with the variables it was rendered with
+then - the user dict (firstname, hourflag and togglURL), hours_worked, hours_missing and minimum_hours_for_range
+'''
+def full_alert_source():
+    with open(ORIGINAL_ALERT_PATH) as source_file:
+        return source_file.read()
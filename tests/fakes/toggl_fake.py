@@ -0,0 +1,296 @@
+'''
+Description: A local stand-in Toggl server, serving a synthetic workspace, and a small Toggl client to call it with
+Usage: Used by the tests and benchmarks in place of a real Toggl account. The roster is generated from a seed, so every run sees the same
+members and hours. Latency, 429 responses and failures can be injected into every request, to mimic the real API under load.
+    toggl = FakeToggl(users=100, latency=0.01, throttle_every=10).start()
+    runner = WorkspaceRunner(configs, holidays, toggl.create_client, ...)
+    ... configs['togglAPI'] = toggl.get_toggl_configs() ...
+    toggl.stop()
+
+Served endpoints:
+    GET /api/v8/workspaces/<workspace_id>/workspace_users - the members of the workspace
+    GET /reports/api/v2/summary - the time tracked over since..until, grouped by user, or the total_grand of the user_ids
+    GET /reports/api/v2/details - the time entries over since..until, one per user per working day, in pages of per_page
+'''
+import json
+import time
+import random
+import datetime
+import threading
+import urlparse
+import SocketServer
+import BaseHTTPServer
+
+import requests
+
+DEFAULT_WORKSPACE_ID = 777
+DEFAULT_PER_PAGE = 50
+ADMIN_EVERY = 50
+INACTIVE_EVERY = 37
+NAMELESS_EVERY = 23
+MS_PER_HOUR = 60 * 60 * 1000
+
+
+def parse_day(value):
+    # datetime.strptime is not safe to call for the first time from the threads of the server
+    return datetime.date(*map(int, value[:10].split('-')))
+
+
+class FakeTogglHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    # HTTP/1.1, so clients can keep their connections alive between requests
+    protocol_version = 'HTTP/1.1'
+    # Responses are written in one piece, so kept-alive connections do not wait on delayed acknowledgements
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        toggl = self.server.toggl
+        url = urlparse.urlparse(self.path)
+        params = dict((name, values[-1]) for name, values in urlparse.parse_qs(url.query).items())
+
+        status, body, headers = toggl.respond(url.path, params)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeTogglServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+
+class FakeToggl:
+
+    '''
+    Parameters: users (the size of the roster), workspace_id, seed (the roster and hours are generated from it)
+        latency (the seconds every request is delayed by), throttle_every (every nth request is answered with a 429. 0 to never throttle)
+        retry_after (the Retry-After header of a 429, in seconds), failure_rate (the chance of a request being answered with a 500)
+        per_page (the time entries in each page of a detailed report), joined_before [date] (members joined before this day. Defaults to today)
+        port (0 picks a free port)
+    '''
+    def __init__(self, users=100, workspace_id=DEFAULT_WORKSPACE_ID, seed=1, latency=0, throttle_every=0, retry_after=0, failure_rate=0,
+                 per_page=DEFAULT_PER_PAGE, joined_before=None, port=0):
+        self.workspace_id = workspace_id
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.retry_after = retry_after
+        self.failure_rate = failure_rate
+        self.per_page = per_page
+        self.random = random.Random(seed)
+        self.members = self.generate_roster(users, joined_before or datetime.date.today())
+        self.admin_emails = [member['email'] for member in self.members if member['uid'] % ADMIN_EVERY == 0]
+        self.joined_days = dict((member['uid'], parse_day(member['at'])) for member in self.members)
+        self.day_entries = {}
+
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.throttled = 0
+        self.failed = 0
+        self.server = FakeTogglServer(('127.0.0.1', port), FakeTogglHandler)
+        self.server.toggl = self
+        self.port = self.server.server_address[1]
+        self.url = 'http://127.0.0.1:' + str(self.port)
+        self.thread = None
+
+    '''
+    Description: Generates the members of the workspace. Every ADMIN_EVERY-th member is an admin, every INACTIVE_EVERY-th is inactive,
+    and every NAMELESS_EVERY-th has no name. Each member tracks about the same hours every working day, from 0 to 9 hours.
+    '''
+    def generate_roster(self, users, joined_before):
+        members = []
+        self.daily_hours = {}
+        for n in range(1, users + 1):
+            uid = 100000 + n
+            joined = joined_before - datetime.timedelta(days=self.random.randint(1, 800))
+            members.append({
+                'id': n,
+                'uid': uid,
+                'wid': self.workspace_id,
+                'admin': uid % ADMIN_EVERY == 0,
+                'active': uid % INACTIVE_EVERY != 0,
+                'inactive': uid % INACTIVE_EVERY == 0,
+                'name': '' if n % NAMELESS_EVERY == 0 else 'Member ' + str(n),
+                'email': 'member' + str(n) + '@example.com',
+                'at': joined.strftime('%Y-%m-%d') + 'T09:00:00+00:00'
+            })
+            self.daily_hours[uid] = self.random.choice([0, 4, 6, 7, 7.5, 7.5, 8, 9])
+        return members
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    '''
+    Return: The togglAPI configurations of the workspace served by this server
+    '''
+    def get_toggl_configs(self):
+        return {'token': 'fake_token', 'user_agent': 'fake_toggl', 'workspace_id': self.workspace_id}
+
+    '''
+    Description: Creates a client of this server from the toggl settings - can be passed as the api_factory of a WorkspaceRunner
+    '''
+    def create_client(self, settings):
+        return TogglHttpClient(settings, self.url + '/api/v8', self.url + '/reports/api/v2')
+
+    '''
+    Return: The amount of requests served, in total or for one endpoint (such as 'summary')
+    '''
+    def get_request_count(self, endpoint=None):
+        with self.lock:
+            if endpoint is None:
+                return sum(self.requests.values())
+            return self.requests.get(endpoint, 0)
+
+    '''
+    Description: The milliseconds a member tracked on a day. Nothing is tracked on weekends, before the member joined, or by members
+    who do not track time.
+    '''
+    def get_day_ms(self, uid, day):
+        if day.weekday() >= 5 or day < self.joined_days[uid] or not self.daily_hours[uid]:
+            return 0
+        return int(self.daily_hours[uid] * MS_PER_HOUR) + ((uid * 31 + day.toordinal() * 17) % 7) * 60 * 1000
+
+    def get_range_ms(self, uid, since, until):
+        total = 0
+        day = since
+        while day <= until:
+            total = total + self.get_day_ms(uid, day)
+            day = day + datetime.timedelta(days=1)
+        return total
+
+    '''
+    Return: The (uid, milliseconds) tracked on the day by every member who tracked time, in the order of the roster
+    '''
+    def get_day_entries(self, day):
+        with self.lock:
+            entries = self.day_entries.get(day)
+        if entries is None:
+            entries = [(member['uid'], self.get_day_ms(member['uid'], day)) for member in self.members]
+            entries = [entry for entry in entries if entry[1] > 0]
+            with self.lock:
+                self.day_entries[day] = entries
+        return entries
+
+    '''
+    Description: Answers a request, after injecting the latency, 429s and failures
+    Return: A tuple of (status, body, headers)
+    '''
+    def respond(self, path, params):
+        endpoint = path.rstrip('/').split('/')[-1]
+        with self.lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            request_number = sum(self.requests.values())
+            throttle = self.throttle_every and request_number % self.throttle_every == 0
+            fail = not throttle and self.failure_rate and self.random.random() < self.failure_rate
+            if throttle:
+                self.throttled = self.throttled + 1
+            if fail:
+                self.failed = self.failed + 1
+
+        if self.latency:
+            time.sleep(self.latency)
+        if throttle:
+            return 429, json.dumps({'error': 'Too Many Requests'}), {'Retry-After': str(self.retry_after)}
+        if fail:
+            return 500, json.dumps({'error': 'Internal Server Error'}), {}
+
+        if path == '/api/v8/workspaces/' + str(self.workspace_id) + '/workspace_users':
+            return 200, json.dumps(self.members), {}
+        if path == '/reports/api/v2/summary':
+            return 200, json.dumps(self.get_summary(params)), {}
+        if path == '/reports/api/v2/details':
+            return 200, json.dumps(self.get_details(params)), {}
+        return 404, json.dumps({'error': 'Not Found'}), {}
+
+    def get_summary(self, params):
+        since, until = parse_day(params['since']), parse_day(params['until'])
+        if 'user_ids' in params:
+            uids = [int(uid) for uid in params['user_ids'].split(',')]
+        else:
+            uids = [member['uid'] for member in self.members]
+
+        data = []
+        for uid in uids:
+            if uid not in self.joined_days:
+                continue
+            time_tracked = self.get_range_ms(uid, since, until)
+            if time_tracked > 0:
+                data.append({'id': uid, 'title': {'user': 'Member ' + str(uid)}, 'time': time_tracked, 'items': []})
+
+        total_grand = sum(group['time'] for group in data)
+        return {'total_grand': total_grand or None, 'data': data}
+
+    def get_details(self, params):
+        since, until = parse_day(params['since']), parse_day(params['until'])
+        page = int(params.get('page', 1))
+        first = (page - 1) * self.per_page
+        last = first + self.per_page
+
+        data = []
+        total_count = 0
+        day = since
+        while day <= until:
+            entries = self.get_day_entries(day)
+            if total_count + len(entries) > first and total_count < last:
+                start = day.strftime('%Y-%m-%d') + 'T09:00:00+00:00'
+                for index in range(max(0, first - total_count), min(len(entries), last - total_count)):
+                    uid, time_tracked = entries[index]
+                    data.append({'id': total_count + index, 'uid': uid, 'start': start, 'dur': time_tracked})
+            total_count = total_count + len(entries)
+            day = day + datetime.timedelta(days=1)
+
+        return {'total_count': total_count, 'per_page': self.per_page, 'data': data}
+
+
+'''
+Description: A minimal Toggl client, with the same methods as the TogglClientApi of the toggle_client_api submodule, so the runs can
+be exercised without the submodule. Every GET request goes through _do_get_query, so a TogglTransport can be attached to it.
+'''
+class TogglHttpClient:
+
+    def __init__(self, settings, api_base_url, api_report_base_url):
+        self.api_token = settings['token']
+        self.api_base_url = api_base_url
+        self.api_report_base_url = api_report_base_url
+
+    def query(self, url, params={}, method='GET'):
+        return self._query(self.api_base_url, url, params, method)
+
+    def query_report(self, url, params={}, method='GET'):
+        return self._query(self.api_report_base_url, url, params, method)
+
+    def _query(self, base_url, url, params, method):
+        if method != 'GET':
+            return False
+        return self._do_get_query(base_url + url, headers={'content-type': 'application/json'}, auth=(self.api_token, 'api_token'), params=params)
+
+    @staticmethod
+    def _do_get_query(url, headers, auth, params):
+        return requests.get(url, headers=headers, auth=auth, params=params)
+
+    def get_workspace_members(self, workspace_id):
+        return self.query('/workspaces/' + str(workspace_id) + '/workspace_users')
+
+    '''
+    Return: The milliseconds tracked by the user over the date range
+    '''
+    def get_user_hours_range(self, user_agent, workspace_id, user_id, start_date, end_date):
+        params = {'user_agent': user_agent, 'workspace_id': workspace_id, 'since': start_date, 'until': end_date, 'user_ids': user_id}
+        response = self.query_report('/summary', params)
+        response.raise_for_status()
+        return response.json().get('total_grand') or 0
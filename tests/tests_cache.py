@@ -0,0 +1,113 @@
+import unittest
+import datetime
+
+from libs.invoke_toggl.toggl_cache import TogglCache, CachedTogglClient
+
+
+class FakeResponse:
+
+    status_code = 200
+
+    def __init__(self, json_data):
+        self.json_data = json_data
+
+    def json(self):
+        return self.json_data
+
+
+class FakeTogglApi:
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_workspace_members(self, workspace_id):
+        self.calls += 1
+        return FakeResponse([{'uid': 1}, {'uid': 2}])
+
+    # Toggl reports no time for users who tracked nothing
+    def get_user_hours_range(self, user_agent, workspace_id, user_id, start_date, end_date):
+        self.calls += 1
+        return user_id * 1000 or None
+
+    def query_report(self, url, params={}, method='GET'):
+        self.calls += 1
+        return FakeResponse({'data': []})
+
+
+class TogglCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = TogglCache(':memory:')
+        self.api = FakeTogglApi()
+
+    def tearDown(self):
+        self.cache.close()
+
+    '''
+    Scenario 14.0
+    (get_user_hours_range) If the hours of a user have already been fetched for a date range, they should be loaded from the cache instead of Toggl,
+    including users who tracked no time. Detailed report pages, which are streamed, should not be cached
+    '''
+    def test_cached_user_hours(self):
+        client = CachedTogglClient(self.api, self.cache)
+
+        first = client.get_user_hours_range('a', 1, 5, '2014-01-06', '2014-01-12')
+        second = client.get_user_hours_range('a', 1, 5, '2014-01-06', '2014-01-12')
+        members = client.get_workspace_members(1).json()
+        members = client.get_workspace_members(1).json()
+
+        self.assertEqual(5000, first)
+        self.assertEqual(first, second)
+        self.assertEqual([{'uid': 1}, {'uid': 2}], members)
+        self.assertEqual(2, self.api.calls)
+
+        details = client.query_report('/details', {'since': '2014-01-06', 'until': '2014-01-12', 'page': 1})
+        self.assertTrue(isinstance(details, FakeResponse))
+        self.assertEqual(3, self.api.calls)
+
+        self.assertEqual(0, client.get_user_hours_range('a', 1, 0, '2014-01-06', '2014-01-12'))
+        self.assertEqual(0, client.get_user_hours_range('a', 1, 0, '2014-01-06', '2014-01-12'))
+        self.assertEqual(4, self.api.calls)
+
+    '''
+    Scenario 14.1
+    (get_user_hours_range) If the cache is being refreshed, or the cached entry has expired, the hours should be fetched from Toggl again
+    '''
+    def test_refresh_and_expired_user_hours(self):
+        CachedTogglClient(self.api, self.cache).get_user_hours_range('a', 1, 5, '2014-01-06', '2014-01-12')
+        CachedTogglClient(self.api, self.cache, refresh=True).get_user_hours_range('a', 1, 5, '2014-01-06', '2014-01-12')
+        self.assertEqual(2, self.api.calls)
+
+        client = CachedTogglClient(self.api, self.cache, {'open_ttl': -1, 'closed_ttl': -1})
+        client.get_user_hours_range('a', 1, 6, '2014-01-06', '2014-01-12')
+        client.get_user_hours_range('a', 1, 6, '2014-01-06', '2014-01-12')
+        self.assertEqual(4, self.api.calls)
+
+    '''
+    Scenario 14.2
+    (set) If the cache grows past its maximum amount of entries, the least recently used entries should be evicted
+    '''
+    def test_cache_eviction(self):
+        cache = TogglCache(':memory:', 3)
+        cache.set('a', 1, 60)
+        cache.set('b', 2, 60)
+        cache.set('c', 3, 60)
+        cache.get('a')
+        cache.set('d', 4, 60)
+
+        self.assertEqual(3, cache.size())
+        self.assertEqual(1, cache.get('a'))
+        self.assertEqual(None, cache.get('b'))
+        cache.close()
+
+    '''
+    Scenario 14.3
+    (ttl_for_range) Date ranges that closed more than closed_after_days ago should be cached for closed_ttl, all other date ranges for open_ttl
+    '''
+    def test_ttl_for_range(self):
+        client = CachedTogglClient(self.api, self.cache, {'open_ttl': 10, 'closed_ttl': 100, 'closed_after_days': 7})
+        today = datetime.date(2014, 1, 20)
+
+        self.assertEqual(100, client.ttl_for_range('2014-01-12', today))
+        self.assertEqual(10, client.ttl_for_range('2014-01-13', today))
+        self.assertEqual(10, client.ttl_for_range('2014-01-19', today))
@@ -0,0 +1,94 @@
+import unittest
+import random
+import datetime
+
+from libs.invoke_workdays.workday import WorkDay
+from libs.invoke_report.weekly_report import WeeklyReport
+from libs.invoke_users.compliance import ComplianceEngine
+
+
+class ComplianceEngineTests(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(5)
+        self.configs = {
+            'admin': ['admin@invokelabs.com'],
+            'togglAPI': {'workspace_id': 456, 'user_agent': 'a'}
+        }
+        self.start_date = datetime.datetime(2014, 1, 6, 9)
+        self.end_date = datetime.datetime(2014, 1, 12, 9)
+        self.workday = WorkDay({2014: [{'date': datetime.date(2014, 1, 8), 'percent_used': 0.5}]}, [1, 2, 3, 4, 5], datetime.datetime(2014, 1, 13))
+
+        joined_dates = [
+            datetime.datetime(2013, 6, 1), datetime.datetime(2014, 1, 6, 10), datetime.datetime(2014, 1, 8),
+            datetime.datetime(2014, 1, 9, 15), datetime.datetime(2014, 1, 12, 10), datetime.datetime(2014, 1, 20),
+            datetime.datetime(2013, 12, 28)
+        ]
+        self.members = []
+        self.tracked_ms = []
+        for uid in range(1, 201):
+            self.members.append({
+                'uid': uid,
+                'wid': 456,
+                'name': '' if uid % 11 == 0 else 'User ' + str(uid),
+                'email': 'admin@invokelabs.com' if uid % 17 == 0 else 'user' + str(uid) + '@invokelabs.com',
+                'inactive': uid % 13 == 0,
+                'at': random.choice(joined_dates).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+            })
+            self.tracked_ms.append(int(random.choice([0, 3, 10, 20, 33.75, 36, 40, 45]) * 60 * 60 * 1000) + random.randint(0, 999))
+
+    def get_report(self):
+        return WeeklyReport(self.configs, None, self.workday, self.start_date, self.end_date)
+
+    def get_results(self, report):
+        return [
+            (user.get_id(), user.get_name(), user.get_toggl_url(), user.hours, user.percent_worked, user.missing_hours,
+             user.hours_reduction, user.new_flag, user.mark_notice)
+            for user in report.users_to_output
+        ]
+
+    '''
+    Scenario 23.0
+    (ComplianceEngine) The users computed at once must be the same as the users computed one by one - the same hours, percent worked,
+    missing hours, new hire reductions, marks, order and users to contact. Inactive members and admins must be skipped, and new hires
+    with no hours left to work must be at 100%
+    '''
+    def test_batch_matches_users(self):
+        expected_report = self.get_report()
+        for member, time_tracked in zip(self.members, self.tracked_ms):
+            expected_report.add_user(member, time_tracked)
+        expected_report.sort_users()
+
+        report = self.get_report()
+        report.add_users_batch(ComplianceEngine(self.members, self.configs, self.workday, report.working_hours), self.tracked_ms)
+        report.sort_users()
+
+        self.assertEqual(self.get_results(expected_report), self.get_results(report))
+        self.assertEqual([user.get_id() for user in expected_report.users_to_contact], [user.get_id() for user in report.users_to_contact])
+        self.assertTrue(any(user.new_flag and user.hours_reduction > 0 for user in report.users_to_output))
+        self.assertTrue(any(user.mark_notice == '[NEW] ' for user in report.users_to_output))
+        self.assertEqual(len(self.members) - 26, len(report.users_to_output))
+
+    '''
+    Scenario 23.1
+    (ComplianceEngine) Members who are not included, such as members who joined after the reporting period, must not be reported or
+    contacted, and the same engine must compute any amount of weeks
+    '''
+    def test_included_members(self):
+        engine = ComplianceEngine(self.members, self.configs, self.workday, 7.5)
+        included = engine.joined_by(self.end_date)
+
+        report = self.get_report()
+        report.add_users_batch(engine, self.tracked_ms, included)
+
+        expected_report = self.get_report()
+        for member, time_tracked in zip(self.members, self.tracked_ms):
+            if member['at'][:10] <= expected_report.end:
+                expected_report.add_user(member, time_tracked)
+
+        self.assertEqual(self.get_results(expected_report), self.get_results(report))
+        self.assertFalse(any(user.joined_date > datetime.datetime(2014, 1, 13) for user in report.users_to_output + report.users_to_contact))
+
+        next_week = WeeklyReport(self.configs, None, self.workday, datetime.datetime(2014, 1, 13, 9), datetime.datetime(2014, 1, 19, 9))
+        next_week.add_users_batch(engine, self.tracked_ms, engine.joined_by(next_week.end_date))
+        self.assertEqual(len(report.users_to_output), len(next_week.users_to_output))
@@ -0,0 +1,78 @@
+import unittest
+import datetime
+
+from libs.invoke_workdays.workday import WorkDay
+from libs.invoke_report.weekly_report import WeeklyReport
+from libs.invoke_users.compliance import ComplianceEngine
+from libs.invoke_users.exclusions import ExclusionIndex
+
+
+class ExclusionIndexTests(unittest.TestCase):
+
+    def setUp(self):
+        self.configs = {
+            'admin': ['Admin@invokelabs.com'],
+            'exclude': {
+                'emails': ['contractor@invokelabs.com'],
+                'domains': ['@agency.com'],
+                'uids': ['7'],
+                'groups': [30],
+                'roles': ['admin']
+            },
+            'togglAPI': {'workspace_id': 456, 'user_agent': 'a'}
+        }
+        self.members = [self.build_member(uid) for uid in range(1, 11)]
+        self.members[0]['email'] = 'admin@InvokeLabs.com'
+        self.members[1]['inactive'] = True
+        self.members[2]['email'] = 'contractor@invokelabs.com'
+        self.members[3]['email'] = 'someone@Agency.com'
+        self.members[5]['group_ids'] = [10, 30]
+        self.members[7]['admin'] = True
+        self.members[8]['email'] = 'someone@agency.com.au'
+
+    def build_member(self, uid):
+        return {
+            'uid': uid,
+            'wid': 456,
+            'name': 'User ' + str(uid),
+            'email': 'user' + str(uid) + '@invokelabs.com',
+            'inactive': False,
+            'admin': False,
+            'group_ids': [10],
+            'at': '2013-06-01T09:00:00+00:00'
+        }
+
+    '''
+    Scenario 28.0
+    (get_reason) Inactive members, admins, and members matching an exclude rule - e-mail, domain, uid, group or role - should be excluded.
+    E-mails and domains should match regardless of case
+    '''
+    def test_rules(self):
+        exclusions = ExclusionIndex(self.configs)
+
+        reasons = [exclusions.get_reason(member) for member in self.members]
+        self.assertEqual(['admin', 'inactive', 'email', 'domain', None, 'group', 'uid', 'role', None, None], reasons)
+        self.assertEqual([reason is not None for reason in reasons], exclusions.get_excluded(self.members))
+
+        self.assertEqual([False, True] + [False] * 8, ExclusionIndex({'admin': []}).get_excluded(self.members))
+        self.assertRaises(ValueError, ExclusionIndex, {'admin': [], 'exclude': {'roles': ['owner']}})
+        self.assertRaises(ValueError, ExclusionIndex, {'admin': [], 'exclude': {'uids': ['someone']}})
+
+    '''
+    Scenario 28.1
+    (WeeklyReport, ComplianceEngine) Users added one by one and computed at once should leave out the same members
+    '''
+    def test_reports_exclude_members(self):
+        start_date = datetime.datetime(2014, 1, 6, 9)
+        end_date = datetime.datetime(2014, 1, 12, 9)
+        work_day = WorkDay({2014: []}, [1, 2, 3, 4, 5], datetime.datetime(2014, 1, 13))
+        tracked_ms = [uid * 4 * 60 * 60 * 1000 for uid in range(1, 11)]
+
+        report = WeeklyReport(self.configs, None, work_day, start_date, end_date)
+        for member, time_tracked in zip(self.members, tracked_ms):
+            report.add_user(member, time_tracked)
+        batch_report = WeeklyReport(self.configs, None, work_day, start_date, end_date)
+        batch_report.add_users_batch(ComplianceEngine(self.members, self.configs, work_day, 7.5), tracked_ms)
+
+        self.assertEqual([5, 9, 10], [user.get_id() for user in report.users_to_output])
+        self.assertEqual([5, 9, 10], [user.get_id() for user in batch_report.users_to_output])
@@ -0,0 +1,151 @@
+import unittest
+import time
+import threading
+
+from libs.invoke_toggl.hours_fetcher import HoursFetcher
+
+
+class FakeTogglApi:
+
+    def __init__(self, delays):
+        self.delays = delays
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def get_user_hours_range(self, user_agent, workspace_id, user_id, start_date, end_date):
+        time.sleep(self.delays.get(user_id, 0))
+        with self.lock:
+            self.calls.append(user_id)
+        return user_id * 1000
+
+
+class FakeResponse:
+
+    def __init__(self, json_data, status_code=200):
+        self.json_data = json_data
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception("HTTP Error " + str(self.status_code))
+
+    def json(self):
+        return self.json_data
+
+
+class FakeBulkTogglApi(FakeTogglApi):
+
+    def __init__(self, summary, status_code=200):
+        FakeTogglApi.__init__(self, {})
+        self.summary = summary
+        self.status_code = status_code
+        self.report_calls = 0
+
+    def query_report(self, url, params={}, method='GET'):
+        self.report_calls += 1
+        return FakeResponse(self.summary, self.status_code)
+
+
+class FakeDetailsTogglApi:
+
+    def __init__(self, time_entries, per_page):
+        self.time_entries = time_entries
+        self.per_page = per_page
+        self.requests = []
+
+    def query_report(self, url, params={}, method='GET'):
+        self.requests.append((url, params['since'], params['until'], params['page']))
+        in_range = [entry for entry in self.time_entries if params['since'] <= entry['start'][:10] <= params['until']]
+        page = in_range[(params['page'] - 1) * self.per_page:params['page'] * self.per_page]
+        return FakeResponse({'total_count': len(in_range), 'per_page': self.per_page, 'data': page})
+
+
+class HoursFetcherTests(unittest.TestCase):
+
+    def setUp(self):
+        self.settings = {
+            'user_agent': 'a',
+            'workspace_id': 1
+        }
+        self.users = [{'uid': uid} for uid in range(1, 9)]
+
+    '''
+    Scenario 12.0
+    (fetch_users_hours) When hours are fetched concurrently, the hours returned must be in the same order as the users passed in, regardless of the order the requests complete in
+    '''
+    def test_fetch_users_hours_keeps_order(self):
+        delays = {1: 0.05, 2: 0.04, 3: 0.03}
+        api = FakeTogglApi(delays)
+
+        hours_fetcher = HoursFetcher(api, self.settings, 4, False)
+        hours = hours_fetcher.fetch_users_hours(self.users, '2014-01-06', '2014-01-12')
+
+        self.assertEqual([user['uid'] * 1000 for user in self.users], hours)
+
+    '''
+    Scenario 12.1
+    (fetch_users_hours) When the concurrency is 1, every user must still have their hours fetched
+    '''
+    def test_fetch_users_hours_no_concurrency(self):
+        api = FakeTogglApi({})
+
+        hours_fetcher = HoursFetcher(api, self.settings, 1, False)
+        hours = hours_fetcher.fetch_users_hours(self.users, '2014-01-06', '2014-01-12')
+
+        self.assertEqual(len(self.users), len(hours))
+        self.assertEqual([user['uid'] for user in self.users], api.calls)
+
+    '''
+    Scenario 12.2
+    (split_summary_by_user) A workspace summary report must be split into the milliseconds tracked by each user. Users without tracked time are left out
+    '''
+    def test_split_summary_by_user(self):
+        summary = {
+            'total_grand': 9000,
+            'data': [
+                {'id': 1, 'title': {'user': 'a'}, 'time': 5000},
+                {'id': 3, 'title': {'user': 'c'}, 'time': 4000}
+            ]
+        }
+
+        users_hours = HoursFetcher.split_summary_by_user(summary)
+
+        self.assertEqual({1: 5000, 3: 4000}, users_hours)
+
+    '''
+    Scenario 12.3
+    (fetch_users_hours) If the bulk workspace report fails, the hours must be fetched one user at a time, and users missing from the report must have 0 hours
+    '''
+    def test_fetch_users_hours_bulk_fallback(self):
+        summary = {'data': [{'id': 2, 'time': 7000}]}
+
+        api = FakeBulkTogglApi(summary)
+        hours = HoursFetcher(api, self.settings, 4).fetch_users_hours(self.users, '2014-01-06', '2014-01-12')
+        self.assertEqual(1, api.report_calls)
+        self.assertEqual([], api.calls)
+        self.assertEqual([0, 7000, 0, 0, 0, 0, 0, 0], hours)
+
+        api = FakeBulkTogglApi(summary, 429)
+        hours = HoursFetcher(api, self.settings, 4).fetch_users_hours(self.users, '2014-01-06', '2014-01-12')
+        self.assertEqual([user['uid'] * 1000 for user in self.users], hours)
+
+    '''
+    Scenario 12.4
+    (fetch_weekly_hours) Time entries over a range longer than a year should be fetched a year and a page at a time, and added up per user per week
+    '''
+    def test_fetch_weekly_hours(self):
+        time_entries = []
+        for day in ['2013-12-30', '2013-12-31', '2014-01-05', '2014-01-06', '2014-12-29', '2015-01-01', '2015-01-04']:
+            for uid in (1, 2):
+                time_entries.append({'uid': uid, 'start': day + 'T09:00:00+01:00', 'dur': uid * 1000})
+        api = FakeDetailsTogglApi(time_entries, 3)
+
+        weekly_hours = HoursFetcher(api, self.settings).fetch_weekly_hours('2013-12-30', '2015-01-04')
+
+        self.assertEqual({
+            '2013-12-30': {1: 3000, 2: 6000},
+            '2014-01-06': {1: 1000, 2: 2000},
+            '2014-12-29': {1: 3000, 2: 6000}
+        }, weekly_hours)
+        self.assertEqual([('2013-12-30', '2014-12-29'), ('2014-12-30', '2015-01-04')], sorted(set(request[1:3] for request in api.requests)))
+        self.assertEqual(6, len(api.requests))
@@ -740,3 +740,81 @@ class HolidayTests(unittest.TestCase):
         dummy_user.setup_missing_hours(self.hours_per_week, users_to_contact, 0)
 
         self.assertEqual(1.0, dummy_user.missing_hours)
+
+    '''
+    Scenario 13.0
+    (build_holiday_index) If duplicate holidays occur on the same date, only the first holiday should be used in the holiday index
+    '''
+    def test_holiday_index_duplicate_holiday(self):
+        holidays = {
+                    2014:
+                        [
+                            {
+                                'date': datetime.date(2014, 12, 31),
+                                'percent_used': 0.4
+                            },
+                            {
+                                'date': datetime.date(2014, 12, 31)
+                            }
+                        ]
+                    }
+
+        workday = WorkDay(holidays, self.workdays, datetime.datetime(2015, 1, 5))
+
+        self.assertEqual(0.4, workday.lookup_holiday(datetime.datetime(2014, 12, 31)))
+        self.assertEqual(WorkDay.holiday_utilization(datetime.datetime(2014, 12, 31), holidays), workday.lookup_holiday(datetime.datetime(2014, 12, 31)))
+
+    '''
+    Scenario 13.1
+    (build_holiday_index) If a holiday is listed under a year other than its own, it should not be treated as a holiday
+    '''
+    def test_holiday_index_wrong_year(self):
+        holidays = {
+                    2014:
+                        [
+                            {
+                                'date': datetime.date(2015, 1, 2)
+                            }
+                        ]
+                    }
+
+        workday = WorkDay(holidays, self.workdays, datetime.datetime(2015, 1, 5))
+
+        self.assertEqual(False, workday.lookup_holiday(datetime.datetime(2015, 1, 2)))
+        self.assertEqual(WorkDay.holiday_utilization(datetime.datetime(2015, 1, 2), holidays), workday.lookup_holiday(datetime.datetime(2015, 1, 2)))
+
+    '''
+    Scenario 13.2
+    (calculate_total_work_hours) The required hours computed from the work day calendar must be the same as the required hours computed day by day, both inside and outside of the calendar years
+    '''
+    def test_work_day_calendar_matches_daily_sum(self):
+        holidays = {
+                    2014:
+                        [
+                            {
+                                'date': datetime.date(2014, 12, 24),
+                                'percent_used': 0.5
+                            },
+                            {
+                                'date': datetime.date(2014, 12, 25)
+                            }
+                        ],
+                    2015:
+                        [
+                            {
+                                'date': datetime.date(2015, 1, 1)
+                            }
+                        ]
+                    }
+
+        workday = WorkDay(holidays, self.workdays, datetime.datetime(2015, 1, 5))
+        date_ranges = [
+            (datetime.datetime(2014, 12, 22, 9), datetime.datetime(2015, 1, 4, 8)),
+            (datetime.datetime(2014, 1, 1), datetime.datetime(2015, 12, 31)),
+            (datetime.datetime(2010, 3, 1), datetime.datetime(2010, 3, 31)),
+            (datetime.datetime(2015, 12, 28), datetime.datetime(2016, 1, 8))
+        ]
+
+        for start_date, end_date in date_ranges:
+            self.assertEqual(workday.sum_work_hours(self.hours_per_workday, start_date, end_date),
+                             workday.calculate_total_work_hours(self.hours_per_workday, start_date, end_date))
@@ -0,0 +1,139 @@
+import unittest
+import os
+import shutil
+import datetime
+import tempfile
+import threading
+import BaseHTTPServer
+
+from libs.invoke_workdays.holiday_calendar import HolidayCalendar
+
+HOLIDAYS_YML = """
+2014:
+    -
+        date: 2014-05-05
+    -
+        date: 2014-05-09
+        percent_used: .5
+"""
+
+
+class HolidaysHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        self.server.requests.append(self.headers.getheader('If-None-Match'))
+        if self.headers.getheader('If-None-Match') == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header('ETag', self.server.etag)
+        self.send_header('Content-Length', str(len(self.server.content)))
+        self.end_headers()
+        self.wfile.write(self.server.content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HolidayCalendarTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.holidays_path = os.path.join(self.directory, 'holidays.yml')
+        self.snapshot_path = os.path.join(self.directory, 'holidays.pickle')
+        with open(self.holidays_path, 'w') as holidays_file:
+            holidays_file.write(HOLIDAYS_YML)
+        self.parsed = 0
+        self.parse = HolidayCalendar.__dict__['parse']
+
+    def tearDown(self):
+        HolidayCalendar.parse = self.parse
+        shutil.rmtree(self.directory)
+
+    def count_parses(self):
+        def parse(content, location=''):
+            self.parsed = self.parsed + 1
+            return self.parse.__func__(content, location)
+        HolidayCalendar.parse = staticmethod(parse)
+
+    '''
+    Scenario 26.0
+    (load) A holidays file should only be parsed when it changed - otherwise the holidays are read from the snapshot. The snapshot should
+    only be readable by its owner, and a snapshot owned by another user should never be read
+    '''
+    def test_file_snapshot(self):
+        self.count_parses()
+        expected = {2014: [{'date': datetime.date(2014, 5, 5)}, {'date': datetime.date(2014, 5, 9), 'percent_used': 0.5}]}
+
+        self.assertEqual(expected, HolidayCalendar(self.holidays_path, self.snapshot_path).load())
+        self.assertEqual(expected, HolidayCalendar(self.holidays_path, self.snapshot_path).load())
+        self.assertEqual(1, self.parsed)
+        self.assertEqual(0600, os.stat(self.snapshot_path).st_mode & 0777)
+
+        getuid = os.getuid
+        os.getuid = lambda: getuid() + 1
+        try:
+            self.assertEqual(expected, HolidayCalendar(self.holidays_path, self.snapshot_path).load())
+        finally:
+            os.getuid = getuid
+        self.assertEqual(2, self.parsed)
+
+        with open(self.holidays_path, 'a') as holidays_file:
+            holidays_file.write("    -\n        date: 2014-12-25\n")
+        holidays = HolidayCalendar(self.holidays_path, self.snapshot_path).load()
+        self.assertEqual(3, self.parsed)
+        self.assertEqual(datetime.date(2014, 12, 25), holidays[2014][2]['date'])
+
+    '''
+    Scenario 26.1
+    (validate) Every invalid holiday should be reported at once, and no snapshot should be written
+    '''
+    def test_validation(self):
+        with open(self.holidays_path, 'w') as holidays_file:
+            holidays_file.write("2014:\n    -\n        date: 2015-01-01\n    -\n        date: tomorrow\n    -\n        date: 2014-03-03\n        percent_used: 2\n")
+
+        try:
+            HolidayCalendar(self.holidays_path, self.snapshot_path).load()
+            self.fail("The holidays should be invalid")
+        except ValueError, exc:
+            self.assertIn("2014 holiday 1: 2015-01-01 is not in 2014", str(exc))
+            self.assertIn("2014 holiday 2: date must be a YYYY-MM-DD date", str(exc))
+            self.assertIn("2014 holiday 3: percent_used must be a number from 0 to 1", str(exc))
+        self.assertFalse(os.path.exists(self.snapshot_path))
+
+    '''
+    Scenario 26.2
+    (load_url) Holidays from a url should be revalidated with their ETag once the snapshot is older than max_age, re-parsed only when they
+    changed, and read from the snapshot when the url can not be reached
+    '''
+    def test_url_revalidation(self):
+        server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), HolidaysHandler)
+        server.requests = []
+        server.etag = '"v1"'
+        server.content = HOLIDAYS_YML
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        url = 'http://127.0.0.1:' + str(server.server_address[1]) + '/holidays.yml'
+        self.count_parses()
+
+        try:
+            holidays = HolidayCalendar(url, self.snapshot_path, max_age=3600).load()
+            self.assertEqual(holidays, HolidayCalendar(url, self.snapshot_path, max_age=3600).load())
+            self.assertEqual([None], server.requests)
+
+            self.assertEqual(holidays, HolidayCalendar(url, self.snapshot_path, max_age=0).load())
+            self.assertEqual([None, '"v1"'], server.requests)
+            self.assertEqual(1, self.parsed)
+
+            server.etag = '"v2"'
+            server.content = HOLIDAYS_YML + "    -\n        date: 2014-12-25\n"
+            self.assertEqual(3, len(HolidayCalendar(url, self.snapshot_path, max_age=0).load()[2014]))
+            self.assertEqual(2, self.parsed)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(3, len(HolidayCalendar(url, self.snapshot_path, max_age=0, timeout=1).load()[2014]))
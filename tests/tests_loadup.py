@@ -1,8 +1,13 @@
 import unittest
 import os
+import shutil
+import datetime
+import tempfile
 import yaml
 
 from libs.invoke_loadup.invoke_loadup import Loadup
+from libs.invoke_loadup.config_schema import ConfigSchema
+from libs.invoke_loadup.config_cache import ConfigCache
 from pprint import pprint
 
 class LoadupTests(unittest.TestCase):
@@ -74,6 +79,29 @@ class LoadupTests(unittest.TestCase):
 
         self.assertEqual(False, configs_yml_stream)
 
+    '''
+    Scenario 9.4
+    (load_configs) If flags are passed in alongside a valid config path, the configurations should still be loaded from the path, and the flags should be readable
+    '''
+    def test_load_configs_flags_and_valid_flag(self):
+
+        os.environ['CONFIG_PATH'] = ""
+
+        argsv = []
+        argsv.append("name")
+        argsv.append("--refresh")
+        argsv.append("tests/test_config.yml")
+        argsv.append("--from=2014-01-06")
+
+        loadup = Loadup(argsv)
+        configs_yml_stream = loadup.load_configs(argsv)
+        result = yaml.load(configs_yml_stream)
+
+        self.assertEqual('a', result['smtp']['host'])
+        self.assertEqual(True, loadup.get_flag('refresh'))
+        self.assertEqual('2014-01-06', loadup.get_flag('from'))
+        self.assertEqual(False, loadup.get_flag('to'))
+
     '''
     Scenario 10.0
     (create_config) If load_configs returns False, it should return configurations from environment variables
@@ -226,3 +254,143 @@ class LoadupTests(unittest.TestCase):
             system_exit = True
 
         self.assertTrue(system_exit)
+
+    def write_configs(self, directory, **changes):
+        with open('tests/test_config.yml') as config_file:
+            configs = yaml.safe_load(config_file)
+        for section, values in changes.items():
+            configs[section] = dict(configs[section], **values) if isinstance(values, dict) else values
+        config_path = os.path.join(directory, 'configs.yml')
+        with open(config_path, 'w') as config_file:
+            yaml.safe_dump(configs, config_file)
+        return config_path
+
+    '''
+    Scenario 11.2
+    (initialize_configs) Every invalid or missing field, including those of workspaces, should be reported at once, and the script terminated
+    '''
+    def test_every_invalid_field_is_reported(self):
+        directory = tempfile.mkdtemp()
+        try:
+            config_path = self.write_configs(directory, smtp={'port': 'b'}, date_restrict={'weekday': 9}, staff={'from_email': None},
+                                             workspaces=[{'togglAPI': {'workspace_id': 'x'}}])
+            with open(config_path) as config_file:
+                configs = yaml.safe_load(config_file)
+
+            try:
+                ConfigSchema.coerce(configs)
+                self.fail("The configurations should be invalid")
+            except ValueError, exc:
+                self.assertIn("smtp - port: must be a whole number (got 'b')", str(exc))
+                self.assertIn("date_restrict - weekday: must be from 0 to 6 (got 9)", str(exc))
+                self.assertIn("staff - from_email: is required", str(exc))
+                self.assertIn("workspaces 1: togglAPI - workspace_id: must be a whole number (got 'x')", str(exc))
+
+            os.environ['CONFIG_SNAPSHOT_PATH'] = ''
+            self.assertRaises(SystemExit, Loadup(['name', config_path]).initialize_configs)
+        finally:
+            shutil.rmtree(directory)
+
+    '''
+    Scenario 11.3
+    (initialize_configs) Environment variables should be coerced to their types, so the flags are booleans and the date restriction applies
+    '''
+    def test_environment_values_are_coerced(self):
+        os.environ['CONFIG_PATH'] = ""
+        for name in ['SMTP_HOST', 'SMTP_USERNAME', 'SMTP_PASSWORD', 'TOGGL_TOKEN', 'TOGGL_USER_AGENT', 'STAFF_EMAIL_ROLE_STAFF_RESOURCE',
+                     'STAFF_EMAIL_ROLE_GROUP_LEADS', 'STAFF_FROM_EMAIL']:
+            os.environ[name] = 'b'
+        os.environ['SMTP_PORT'] = '1234'
+        os.environ['DATE_RESTRICT_FLAG'] = 'True'
+        os.environ['DATE_RESTRICT_WEEKDAY'] = str((datetime.datetime.now().weekday() + 1) % 7)
+        os.environ['DATE_RESTRICT_HOUR'] = '20'
+        os.environ['SENDMAIL_FLAG'] = 'False'
+        os.environ['TOGGL_WORKSPACE_ID'] = '12345'
+        os.environ['TOGGL_BULK_FETCH'] = 'False'
+        os.environ['ADMIN_EMAIL'] = '["b"]'
+
+        loadup = Loadup(['name'])
+        loadup.initialize_configs()
+        configs = loadup.get_config()
+
+        self.assertEqual(1234, configs['smtp']['port'])
+        self.assertEqual(12345, configs['togglAPI']['workspace_id'])
+        self.assertTrue(configs['date_restrict']['to_restrict'] is True)
+        self.assertTrue(configs['sendmail']['to_send'] is False)
+        self.assertTrue(configs['togglAPI']['bulk_fetch'] is False)
+        self.assertRaises(SystemExit, loadup.date_restriction, configs)
+
+    '''
+    Scenario 11.4
+    (ConfigCache) The configuration file should only be parsed again once it changed - a file that was touched but not changed should be
+    matched by its hash. Without CONFIG_SNAPSHOT_PATH, nothing should be cached
+    '''
+    def test_config_cache(self):
+        directory = tempfile.mkdtemp()
+        yaml_load = yaml.load
+        parsed = []
+
+        # yaml.safe_load, used to write the configurations, calls yaml.load with a Loader. Only loads without one are counted
+        def counting_load(stream, *arguments, **keywords):
+            if not arguments and not keywords:
+                parsed.append(stream)
+            return yaml_load(stream, *arguments, **keywords)
+
+        yaml.load = counting_load
+        try:
+            config_path = self.write_configs(directory)
+            config_cache = ConfigCache(os.path.join(directory, 'configs.pickle'))
+            configs = config_cache.load(open(config_path))
+            self.assertEqual(configs, config_cache.load(open(config_path)))
+            self.assertEqual(1, len(parsed))
+
+            os.utime(config_path, (1, 1))
+            self.assertEqual(configs, config_cache.load(open(config_path)))
+            self.assertEqual(1, len(parsed))
+
+            self.write_configs(directory, smtp={'host': 'c'})
+            os.utime(config_path, (2, 2))
+            self.assertEqual('c', config_cache.load(open(config_path))['smtp']['host'])
+            self.assertEqual(2, len(parsed))
+
+            # The snapshot holds the credentials, so without CONFIG_SNAPSHOT_PATH nothing is cached
+            snapshot_path = os.environ.pop('CONFIG_SNAPSHOT_PATH', None)
+            try:
+                config_cache = Loadup(['name', config_path]).config_cache
+            finally:
+                if snapshot_path is not None:
+                    os.environ['CONFIG_SNAPSHOT_PATH'] = snapshot_path
+            self.assertEqual(None, config_cache.snapshot_path)
+            config_cache.load(open(config_path))
+            config_cache.load(open(config_path))
+            self.assertEqual(4, len(parsed))
+            self.assertEqual(['configs.pickle', 'configs.yml'], sorted(os.listdir(directory)))
+        finally:
+            yaml.load = yaml_load
+            shutil.rmtree(directory)
+
+    '''
+    Scenario 11.5
+    (reload) The configurations should only be loaded again once their file changed. Invalid changes should raise, and keep the previous configurations
+    '''
+    def test_reload(self):
+        directory = tempfile.mkdtemp()
+        os.environ['CONFIG_SNAPSHOT_PATH'] = os.path.join(directory, 'configs.pickle')
+        try:
+            config_path = self.write_configs(directory)
+            loadup = Loadup(['name', config_path])
+            loadup.initialize_configs()
+            self.assertFalse(loadup.reload())
+
+            self.write_configs(directory, smtp={'port': 'b'})
+            os.utime(config_path, (1, 1))
+            self.assertRaises(ValueError, loadup.reload)
+            self.assertEqual(1, loadup.get_config()['smtp']['port'])
+
+            self.write_configs(directory, smtp={'port': '25'})
+            os.utime(config_path, (2, 2))
+            self.assertTrue(loadup.reload())
+            self.assertEqual(25, loadup.get_config()['smtp']['port'])
+            self.assertFalse(loadup.reload())
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,158 @@
+import unittest
+import time
+import datetime
+import jinja2
+import smtplib
+from email.mime.text import MIMEText
+
+from libs.hours_alerts import MailQueue, MailPool, HoursAlert, connect_smtp
+from tests.fakes.smtp_sink import SMTPSink
+from tests.fakes.templates import full_alert_source
+from libs.invoke_users.invoke_users import User
+
+
+class FakeSMTP:
+
+    def __init__(self, drop_after=None, refused=None):
+        self.sent = []
+        self.drop_after = drop_after
+        self.refused = refused or {}
+
+    def sendmail(self, from_email, recipients, msg_string):
+        if self.drop_after is not None and len(self.sent) >= self.drop_after:
+            raise smtplib.SMTPServerDisconnected("Connection unexpectedly closed")
+        if 'error@a.com' in recipients:
+            raise smtplib.SMTPDataError(554, "Message rejected")
+        self.sent.append(recipients)
+        return dict((recipient, self.refused[recipient]) for recipient in recipients if recipient in self.refused)
+
+    def noop(self):
+        return (250, 'OK')
+
+    def quit(self):
+        return None
+
+
+class MailQueueTests(unittest.TestCase):
+
+    def setUp(self):
+        self.connections = []
+        self.msg = MIMEText('body', 'html')
+
+    def connect(self, **kwargs):
+        email_conn = FakeSMTP(**kwargs)
+        self.connections.append(email_conn)
+        return email_conn
+
+    '''
+    Scenario 15.0
+    (enqueue) Queued e-mails should only be sent once a batch is full, or the queue is flushed, and should all be sent over the same connection
+    '''
+    def test_batches_over_one_connection(self):
+        mail_queue = MailQueue(self.connect, 2)
+
+        mail_queue.enqueue('from@a.com', ['1@a.com'], self.msg)
+        self.assertEqual([], self.connections)
+
+        mail_queue.enqueue('from@a.com', ['2@a.com'], self.msg)
+        mail_queue.enqueue('from@a.com', ['3@a.com'], self.msg)
+        mail_queue.close()
+
+        self.assertEqual(1, len(self.connections))
+        self.assertEqual([['1@a.com'], ['2@a.com'], ['3@a.com']], self.connections[0].sent)
+        self.assertEqual([], mail_queue.get_failures())
+
+    '''
+    Scenario 15.1
+    (flush) If the connection drops while sending, it should be re-opened and the e-mail retried, and every recipient should be reported as sent
+    '''
+    def test_reconnect_on_dropped_connection(self):
+        mail_queue = MailQueue(lambda: self.connect(drop_after=1 if not self.connections else None), 10)
+
+        mail_queue.enqueue('from@a.com', ['1@a.com', 'cc@a.com'], self.msg)
+        mail_queue.enqueue('from@a.com', ['2@a.com', 'cc@a.com'], self.msg)
+        mail_queue.close()
+
+        self.assertEqual(2, len(self.connections))
+        self.assertEqual([['2@a.com', 'cc@a.com']], self.connections[1].sent)
+        self.assertEqual(4, len([result for result in mail_queue.results if result[1] is True]))
+
+    '''
+    Scenario 15.2
+    (flush) If a recipient is refused, or an e-mail can not be sent, the failure should be reported for those recipients without stopping the other e-mails
+    '''
+    def test_per_recipient_failures(self):
+        mail_queue = MailQueue(lambda: self.connect(refused={'refused@a.com': (550, 'No such user')}), 10)
+
+        mail_queue.enqueue('from@a.com', ['refused@a.com', 'cc@a.com'], self.msg)
+        mail_queue.enqueue('from@a.com', ['error@a.com'], self.msg)
+        mail_queue.enqueue('from@a.com', ['3@a.com'], self.msg)
+        mail_queue.close()
+
+        failures = [recipient for recipient, error in mail_queue.get_failures()]
+        self.assertEqual(['refused@a.com', 'error@a.com'], failures)
+        self.assertEqual(['3@a.com'], self.connections[0].sent[-1])
+
+    '''
+    Scenario 15.3
+    (MailPool) When e-mails are sent over a pool of connections, every e-mail should be delivered, over as many connections as the pool size
+    '''
+    def test_pool_delivers_over_every_connection(self):
+        sink = SMTPSink(0.01).start()
+        try:
+            smtp_configs = sink.get_smtp_configs()
+            mail_pool = MailPool(lambda: connect_smtp(smtp_configs), 3)
+            for n in range(30):
+                mail_pool.enqueue('from@localhost', ['user' + str(n) + '@localhost'], self.msg)
+            mail_pool.close()
+        finally:
+            sink.stop()
+
+        self.assertEqual(30, len(sink.messages))
+        self.assertEqual(3, sink.connections)
+        self.assertEqual(30, len(mail_pool.results))
+        self.assertEqual([], mail_pool.get_failures())
+
+    '''
+    Scenario 15.4
+    (MailPool) E-mails should not be sent over a connection faster than the rate limit
+    '''
+    def test_pool_rate_limit(self):
+        mail_pool = MailPool(self.connect, 1, 20)
+
+        start = time.time()
+        for n in range(5):
+            mail_pool.enqueue('from@a.com', [str(n) + '@a.com'], self.msg)
+        mail_pool.close()
+
+        self.assertGreaterEqual(time.time() - start, 0.2)
+        self.assertEqual(5, len(self.connections[0].sent))
+
+
+class HoursAlertTests(unittest.TestCase):
+
+    '''
+    Scenario 16.0
+    (render_hours_not_met) The missing hours e-mail rendered from the shared fragments must be the same as the e-mail rendered from the template
+as it was before it was split (tests/fakes/hours_alert_original.html)
+    '''
+    def test_fragment_render_matches_full_render(self):
+        configs = {'staff': {'email_role_staff_resource': 'a', 'email_role_group_leads': 'b', 'from_email': 'c'}}
+        hours_alert = HoursAlert('views', None, configs)
+        full_template = jinja2.Environment(loader=jinja2.DictLoader({'full': full_alert_source()})).get_template('full')
+        start_date = datetime.datetime(2014, 1, 6)
+        end_date = datetime.datetime(2014, 1, 12)
+
+        for hours_worked in [0, 20.5, 37]:
+            user = User({'uid': 1, 'wid': 2, 'name': 'Unit Test', 'email': 'unit.test@invokelabs.com', 'inactive': False,
+                         'at': '2013-06-01T09:00:00+00:00'}, 37.5, hours_worked)
+            user.set_toggl_url('2014-01-06', '2014-01-12')
+            body = hours_alert.render_hours_not_met(start_date, end_date, user, hours_worked, 37.5)
+            full_body = full_template.render({
+                "user": {"firstname": "Unit", "togglURL": user.get_toggl_url(), "hourflag": 37.5 - hours_worked > 1},
+                "hours_worked": str.format("{:15.2f}", hours_worked),
+                "hours_missing": str.format("{:15.2f}", (37.5 - hours_worked)),
+                "minimum_hours_for_range": 37.5
+            })
+
+            self.assertEqual(full_body, body)
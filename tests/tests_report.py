@@ -0,0 +1,92 @@
+import unittest
+import time
+import random
+import datetime
+
+from libs.invoke_workdays.workday import WorkDay
+from libs.invoke_toggl.hours_fetcher import HoursFetcher
+from libs.invoke_report.weekly_report import WeeklyReport
+
+
+class FakeTogglApi:
+
+    def __init__(self, members, hours):
+        self.members = members
+        self.hours = hours
+
+    def get_user_hours_range(self, user_agent, workspace_id, user_id, start_date, end_date):
+        time.sleep(random.random() * 0.01)
+        return self.hours[user_id]
+
+
+class FakeHoursAlert:
+
+    def __init__(self):
+        self.alerts = []
+        self.summaries = []
+
+    def send_hours_summary(self, start_date, end_date, users_list, minimum_hours_for_range, do_send=True):
+        self.summaries.append([(user.get_id(), user.hours, user.percent_worked, user.missing_hours) for user in users_list])
+
+    def send_hours_not_met(self, start_date, end_date, user, hours_worked, minimum_hours_for_range, do_send=True):
+        self.alerts.append((user.get_id(), hours_worked, minimum_hours_for_range))
+
+
+class WeeklyReportTests(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(3)
+        self.configs = {
+            'admin': ['admin@invokelabs.com'],
+            'togglAPI': {'workspace_id': 456, 'user_agent': 'a'}
+        }
+        self.start_date = datetime.datetime(2014, 1, 6, 9)
+        self.end_date = datetime.datetime(2014, 1, 12, 9)
+        self.workday = WorkDay({2014: [{'date': datetime.date(2014, 1, 8), 'percent_used': 0.5}]}, [1, 2, 3, 4, 5], datetime.datetime(2014, 1, 13))
+
+        self.members = []
+        hours = {}
+        for uid in range(1, 41):
+            joined = datetime.datetime(2014, 1, 9) if uid % 10 == 0 else datetime.datetime(2013, 6, 1)
+            self.members.append({
+                'uid': uid,
+                'wid': 456,
+                'name': 'User ' + str(uid),
+                'email': 'admin@invokelabs.com' if uid == 7 else 'user' + str(uid) + '@invokelabs.com',
+                'inactive': uid == 13,
+                'at': joined.strftime('%Y-%m-%dT%H:%M:%S+00:00')
+            })
+            hours[uid] = random.choice([0, 10, 20, 33.75, 36, 40]) * 60 * 60 * 1000
+        self.api = FakeTogglApi(self.members, hours)
+
+    def build_report(self):
+        return WeeklyReport(self.configs, self.api, self.workday, self.start_date, self.end_date)
+
+    def report_rows(self, report):
+        return [(user.get_id(), user.hours, user.percent_worked, user.missing_hours, user.mark_notice) for user in report.users_to_output]
+
+    '''
+    Scenario 17.0
+    (run_pipelined) When users are e-mailed while the hours of other users are still being fetched, the report, the summary and the e-mails must be the same as when every user is fetched first
+    '''
+    def test_pipelined_report_matches_sequential_report(self):
+        hours_fetcher = HoursFetcher(self.api, self.configs['togglAPI'], 8, False)
+
+        sequential = self.build_report()
+        sequential_alert = FakeHoursAlert()
+        for member, time_tracked in zip(self.members, hours_fetcher.fetch_users_hours(self.members, sequential.start, sequential.end)):
+            sequential.add_user(member, time_tracked)
+        sequential.sort_users()
+        sequential.send_hours_summary(sequential_alert)
+        sequential.send_hours_not_met(sequential_alert)
+
+        pipelined = self.build_report()
+        pipelined_alert = FakeHoursAlert()
+        pipelined.run_pipelined(self.members, hours_fetcher, pipelined_alert)
+        pipelined.send_hours_summary(pipelined_alert)
+
+        self.assertEqual(38, len(sequential.users_to_output))
+        self.assertEqual(self.report_rows(sequential), self.report_rows(pipelined))
+        self.assertEqual(sequential_alert.summaries, pipelined_alert.summaries)
+        self.assertEqual(sorted(sequential_alert.alerts), sorted(pipelined_alert.alerts))
+        self.assertEqual([user.get_id() for user in sequential.users_to_contact], [user.get_id() for user in pipelined.users_to_contact])
@@ -0,0 +1,174 @@
+import unittest
+import os
+import shutil
+import datetime
+import tempfile
+import yaml
+
+from libs.invoke_loadup.invoke_loadup import Loadup
+from libs.invoke_workdays.holiday_calendar import HolidayCalendar
+from libs.invoke_schedule.scheduler import Schedule, Scheduler
+from tests.fakes.toggl_fake import FakeToggl
+from tests.fakes.smtp_sink import SMTPSink
+
+
+class CountingLoadup(Loadup):
+
+    def __init__(self, command_args):
+        Loadup.__init__(self, command_args)
+        self.loads = 0
+
+    def create_config(self, arguments):
+        self.loads = self.loads + 1
+        return Loadup.create_config(self, arguments)
+
+
+class SchedulerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.config_path = os.path.join(self.directory, 'configs.yml')
+        self.holidays_path = os.path.join(self.directory, 'holidays.yml')
+        with open(self.holidays_path, 'w') as holidays_file:
+            holidays_file.write("2014:\n    -\n        date: 2014-01-01\n")
+
+        self.toggl = FakeToggl(12, joined_before=datetime.date(2013, 6, 1)).start()
+        self.sink = SMTPSink().start()
+        self.configs = {
+            'work_days': [1, 2, 3, 4, 5],
+            'admin': self.toggl.admin_emails,
+            'sendmail': {'to_send': True},
+            'smtp': self.sink.get_smtp_configs(),
+            'togglAPI': dict(self.toggl.get_toggl_configs(), rate_limit=0),
+            'date_restrict': {'to_restrict': False, 'weekday': 0, 'hour': 0},
+            'staff': {
+                'email_role_staff_resource': 'staff@invokelabs.com',
+                'email_role_group_leads': 'leads@invokelabs.com',
+                'from_email': 'alma@invokelabs.com'
+            },
+            'schedules': [
+                {'name': 'weekly', 'weekdays': [0], 'hour': 9},
+                {'name': 'preview', 'weekdays': [0, 1, 2, 3, 4], 'hour': 17, 'period': 'this_week'}
+            ]
+        }
+        self.write_configs()
+        self.now = datetime.datetime(2014, 1, 13, 8, 0)
+        self.sleeps = []
+
+    def tearDown(self):
+        self.toggl.stop()
+        self.sink.stop()
+        shutil.rmtree(self.directory)
+
+    def write_configs(self):
+        with open(self.config_path, 'w') as config_file:
+            yaml.safe_dump(self.configs, config_file)
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now = self.now + datetime.timedelta(seconds=seconds)
+
+    def build_scheduler(self):
+        loadup = CountingLoadup(['scheduler.py', self.config_path])
+        holiday_calendar = HolidayCalendar(self.holidays_path, snapshot_path=None)
+        return Scheduler(loadup, self.toggl.create_client, holiday_calendar=holiday_calendar, clock=lambda: self.now, sleep=self.sleep)
+
+    '''
+    Scenario 27.0
+    (Schedule) A schedule should be due on its next weekday at its hour, and report on last week, or on this week until the run.
+    Without schedules, last week should be reported at the date_restrict weekday and hour, which are strings in environment configurations
+    '''
+    def test_next_run_and_period(self):
+        weekly = Schedule({'weekdays': [0], 'hour': 9})
+        self.assertEqual(datetime.datetime(2014, 1, 13, 9), weekly.next_run(datetime.datetime(2014, 1, 13, 8)))
+        self.assertEqual(datetime.datetime(2014, 1, 20, 9), weekly.next_run(datetime.datetime(2014, 1, 13, 9)))
+        self.assertEqual((datetime.datetime(2014, 1, 6, 9), datetime.datetime(2014, 1, 12, 9)), weekly.get_period(datetime.datetime(2014, 1, 13, 9)))
+        self.assertTrue(weekly.send)
+
+        preview = Schedule({'weekdays': [0, 1, 2, 3, 4], 'hour': 17, 'minute': 30, 'period': 'this_week'})
+        self.assertEqual(datetime.datetime(2014, 1, 20, 17, 30), preview.next_run(datetime.datetime(2014, 1, 17, 18)))
+        self.assertEqual((datetime.datetime(2014, 1, 13, 17, 30), datetime.datetime(2014, 1, 15, 17, 30)),
+                         preview.get_period(datetime.datetime(2014, 1, 15, 17, 30)))
+        self.assertFalse(preview.send)
+
+        schedules = Schedule.from_configs({'date_restrict': {'to_restrict': 'True', 'weekday': '3', 'hour': '20'}})
+        self.assertEqual(([3], 20), (schedules[0].weekdays, schedules[0].hour))
+        self.assertRaises(ValueError, Schedule, {'weekdays': [7]})
+        self.assertRaises(ValueError, Schedule, {'hour': 'noon'})
+        self.assertRaises(ValueError, Schedule, {'period': 'next_week'})
+
+    '''
+    Scenario 27.1
+    (run_forever) The scheduler should sleep until each schedule is due, and run it with the configurations loaded once.
+    Previews should not send e-mails
+    '''
+    def test_runs_schedules(self):
+        scheduler = self.build_scheduler()
+
+        self.assertEqual([('weekly', datetime.datetime(2014, 1, 13, 9))], scheduler.run_forever(1))
+        weekly_messages = len(self.sink.messages)
+        self.assertTrue(weekly_messages > 0)
+
+        runs = scheduler.run_forever(2)
+        self.assertEqual([('preview', datetime.datetime(2014, 1, 13, 17)), ('preview', datetime.datetime(2014, 1, 14, 17))], runs)
+        self.assertEqual(weekly_messages, len(self.sink.messages))
+        self.assertEqual(1, scheduler.loadup.loads)
+        self.assertTrue(max(self.sleeps) <= scheduler.check_interval)
+
+    '''
+    Scenario 27.2
+    (reload) The configurations should only be loaded again once their file changed, and invalid configurations should not replace them
+    '''
+    def test_reloads_changed_configs(self):
+        scheduler = self.build_scheduler()
+        self.assertFalse(scheduler.reload())
+
+        self.configs['schedules'] = [{'name': 'weekly', 'weekdays': [0], 'hour': 25}]
+        self.write_configs()
+        os.utime(self.config_path, (1, 1))
+        self.assertFalse(scheduler.reload())
+        self.assertEqual(2, scheduler.loadup.loads)
+
+        self.configs['schedules'] = [{'name': 'weekly', 'weekdays': [0], 'hour': 10}]
+        self.write_configs()
+        os.utime(self.config_path, (2, 2))
+        self.assertEqual([('weekly', datetime.datetime(2014, 1, 13, 10))], scheduler.run_forever(1))
+        self.assertEqual(3, scheduler.loadup.loads)
+
+    '''
+    Scenario 27.3
+    (run_forever) A run that was due within catch_up before the scheduler started, and after the last run kept in the last_run_path marker,
+    should run straight away. A run that already happened before a restart, and older runs, should be skipped. Without a marker to read,
+    nothing should be caught up, as a run that already happened can not be told apart from a missed run
+    '''
+    def test_catches_up_after_restart(self):
+        self.now = datetime.datetime(2014, 1, 13, 9, 30)
+        self.assertEqual([('preview', datetime.datetime(2014, 1, 13, 17))], self.build_scheduler().run_forever(1))
+        self.assertEqual(0, len(self.sink.messages))
+
+        marker_path = os.path.join(self.directory, 'last_run')
+        self.configs['scheduler'] = {'last_run_path': marker_path}
+        self.write_configs()
+        self.now = datetime.datetime(2014, 1, 13, 9, 30)
+        self.assertEqual([('preview', datetime.datetime(2014, 1, 13, 17))], self.build_scheduler().run_forever(1))
+        self.assertEqual(0, len(self.sink.messages))
+
+        with open(marker_path, 'w') as marker_file:
+            marker_file.write('2014-01-10 17:00\n')
+        self.now = datetime.datetime(2014, 1, 13, 9, 30)
+        self.sleeps = []
+        self.assertEqual([('weekly', datetime.datetime(2014, 1, 13, 9))], self.build_scheduler().run_forever(1))
+        weekly_messages = len(self.sink.messages)
+        self.assertTrue(weekly_messages > 0)
+        self.assertEqual([], self.sleeps)
+        with open(marker_path) as marker_file:
+            self.assertEqual('2014-01-13 09:00', marker_file.read().strip())
+
+        self.now = datetime.datetime(2014, 1, 13, 9, 40)
+        self.assertEqual([('preview', datetime.datetime(2014, 1, 13, 17))], self.build_scheduler().run_forever(1))
+        self.assertEqual(weekly_messages, len(self.sink.messages))
+
+        with open(marker_path, 'w') as marker_file:
+            marker_file.write('2014-01-10 17:00\n')
+        self.now = datetime.datetime(2014, 1, 13, 10, 30)
+        self.assertEqual([('preview', datetime.datetime(2014, 1, 13, 17))], self.build_scheduler().run_forever(1))
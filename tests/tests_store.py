@@ -0,0 +1,97 @@
+import unittest
+import os
+import sqlite3
+import datetime
+import tempfile
+
+from libs.invoke_users.invoke_users import User
+from libs.invoke_workdays.workday import WorkDay
+from libs.invoke_report.week_store import WeekStore
+
+
+class WeekStoreTests(unittest.TestCase):
+
+    def setUp(self):
+        self.week_store = WeekStore(':memory:')
+        self.start_date = datetime.datetime(2014, 1, 6)
+        self.end_date = datetime.datetime(2014, 1, 12)
+        self.workday = WorkDay({2014: []}, [1, 2, 3, 4, 5], datetime.datetime(2014, 1, 13))
+
+    def tearDown(self):
+        self.week_store.close()
+
+    def build_user(self, uid, hours, joined='2013-06-01T09:00:00+00:00'):
+        user = User({'uid': uid, 'wid': 1, 'name': 'User ' + str(uid), 'email': str(uid) + '@a.com', 'inactive': False, 'at': joined}, 37.5, hours)
+        user.prepare_user('2014-01-06', '2014-01-12')
+        hours_reduction = 0
+        user.new_flag = user.is_new(self.start_date)
+        if user.new_flag:
+            hours_reduction = user.hour_reduction(self.workday, 7.5, self.start_date, self.end_date)
+        user.setup_missing_hours(37.5, [], hours_reduction)
+        return user
+
+    '''
+    Scenario 20.0
+    (save_week) A stored week should keep the hours, percent_worked, missing_hours and new hire hours reduction the users were computed with
+    '''
+    def test_save_and_read_week(self):
+        users = [self.build_user(1, 40), self.build_user(2, 20), self.build_user(3, 10, '2014-01-08T09:00:00+00:00')]
+        self.assertFalse(self.week_store.has_week(1, '2014-01-06'))
+
+        self.week_store.save_week(1, '2014-01-06', '2014-01-12', 37.5, users)
+
+        self.assertTrue(self.week_store.has_week(1, '2014-01-06'))
+        self.assertFalse(self.week_store.has_week(2, '2014-01-06'))
+        self.assertEqual(37.5, self.week_store.get_minimum_hours(1, '2014-01-06'))
+        rows = self.week_store.get_week(1, '2014-01-06')
+        self.assertEqual([2, 3, 1], [row['uid'] for row in rows])
+        self.assertEqual((20, 17.5, 0, 1), (rows[0]['hours'], rows[0]['missing_hours'], rows[0]['hours_reduction'], rows[0]['contacted']))
+        self.assertEqual((22.5, 1, users[2].percent_worked), (rows[1]['hours_reduction'], rows[1]['new_flag'], rows[1]['percent_worked']))
+        self.assertEqual(0, rows[2]['contacted'])
+
+    '''
+    Scenario 20.1
+    (invalidate) An invalidated week should no longer be stored, and saving a week again should replace its users
+    '''
+    def test_invalidate_and_replace_week(self):
+        self.week_store.save_week(1, '2014-01-06', '2014-01-12', 37.5, [self.build_user(1, 40), self.build_user(2, 20)])
+        self.week_store.save_week(1, '2014-01-13', '2014-01-19', 37.5, [self.build_user(1, 30)])
+
+        self.week_store.save_week(1, '2014-01-06', '2014-01-12', 37.5, [self.build_user(1, 35)])
+        self.assertEqual([(1, 35)], [(row['uid'], row['hours']) for row in self.week_store.get_week(1, '2014-01-06')])
+        self.assertEqual([35, 30], [row['hours'] for row in self.week_store.get_user_weeks(1, '2014-01-01', '2014-01-31', 1)])
+
+        self.week_store.invalidate(1, '2014-01-06')
+        self.assertEqual(['2014-01-13'], self.week_store.get_weeks(1))
+        self.week_store.invalidate(1)
+        self.assertEqual([], self.week_store.get_user_weeks(1, '2014-01-01', '2014-01-31'))
+
+    '''
+    Scenario 20.2
+    (has_week) A week should only count as e-mailed if it was saved with alerts_sent. Stores created before alerts_sent was recorded
+    should keep their weeks, counted as not e-mailed
+    '''
+    def test_alerts_sent(self):
+        self.week_store.save_week(1, '2014-01-06', '2014-01-12', 37.5, [self.build_user(1, 40)])
+        self.assertTrue(self.week_store.has_week(1, '2014-01-06'))
+        self.assertFalse(self.week_store.has_week(1, '2014-01-06', alerts_sent=True))
+
+        self.week_store.save_week(1, '2014-01-06', '2014-01-12', 37.5, [self.build_user(1, 40)], alerts_sent=True)
+        self.assertTrue(self.week_store.has_week(1, '2014-01-06', alerts_sent=True))
+        self.week_store.save_week(1, '2014-01-06', '2014-01-12', 37.5, [self.build_user(1, 40)])
+        self.assertFalse(self.week_store.has_week(1, '2014-01-06', alerts_sent=True))
+
+        state_path = os.path.join(tempfile.mkdtemp(), 'state.sqlite')
+        connection = sqlite3.connect(state_path)
+        connection.execute(
+            "CREATE TABLE weeks (workspace_id TEXT NOT NULL, week_start TEXT NOT NULL, week_end TEXT NOT NULL, minimum_hours REAL NOT NULL, "
+            "computed_at REAL NOT NULL, PRIMARY KEY (workspace_id, week_start))"
+        )
+        connection.execute("INSERT INTO weeks VALUES ('1', '2014-01-06', '2014-01-12', 37.5, 0)")
+        connection.commit()
+        connection.close()
+
+        week_store = WeekStore(state_path)
+        self.assertTrue(week_store.has_week(1, '2014-01-06'))
+        self.assertFalse(week_store.has_week(1, '2014-01-06', alerts_sent=True))
+        week_store.close()
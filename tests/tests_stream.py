@@ -0,0 +1,105 @@
+import unittest
+import json
+
+from libs.invoke_toggl.json_stream import iter_json_array, iter_response_array
+from libs.invoke_toggl.hours_fetcher import HoursFetcher
+from libs.invoke_toggl.toggl_cache import CachedResponse
+
+
+def split_chunks(text, size):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+class StreamedResponse:
+
+    def __init__(self, json_data, chunk_size):
+        self.text = json.dumps(json_data)
+        self.chunk_size = chunk_size
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def raise_for_status(self):
+        return None
+
+    def iter_content(self, chunk_size=1, decode_unicode=False):
+        return split_chunks(self.text, self.chunk_size)
+
+
+class FakeStreamingTogglApi:
+
+    def __init__(self, time_entries, per_page):
+        self.time_entries = time_entries
+        self.per_page = per_page
+        self.responses = []
+
+    def query_report(self, url, params={}, method='GET'):
+        page = self.time_entries[(params['page'] - 1) * self.per_page:params['page'] * self.per_page]
+        self.responses.append(StreamedResponse({'total_grand': 1, 'data': page, 'total_count': len(self.time_entries), 'per_page': self.per_page}, 7))
+        return self.responses[-1]
+
+
+class JSONStreamTests(unittest.TestCase):
+
+    def setUp(self):
+        self.report = {
+            'total_grand': 123456789,
+            'total_currencies': [{'currency': None, 'amount': None}],
+            'data': [
+                {'id': n, 'uid': n % 3, 'dur': n * 1000, 'start': '2014-01-06T09:00:00+01:00', 'description': u'Caf\xe9 "data": [1, 2]',
+                    'tags': ['a', 'b'], 'billable': n % 2 == 0, 'client': None}
+                for n in range(40)
+            ],
+            'total_count': 40,
+            'per_page': 50
+        }
+
+    '''
+    Scenario 21.0
+    (iter_json_array) The items of the array and the other members of the object must be the same as decoding the whole object, for any chunk size
+    '''
+    def test_matches_json_loads(self):
+        text = json.dumps(self.report)
+        for size in [1, 2, 3, 7, 64, len(text)]:
+            header = {}
+            items = list(iter_json_array(split_chunks(text, size), 'data', header))
+            self.assertEqual(self.report['data'], items)
+            self.assertEqual(dict((name, value) for name, value in self.report.items() if name != 'data'), header)
+
+        self.assertEqual([], list(iter_json_array(split_chunks('{"data": [], "per_page": 50}', 4), 'data')))
+        self.assertEqual([], list(iter_json_array(split_chunks('{}', 1), 'data')))
+        self.assertRaises(ValueError, list, iter_json_array(split_chunks('{"data": [{"uid": 1}, {"uid"', 4), 'data'))
+
+    '''
+    Scenario 21.1
+    (iter_json_array) Items should be yielded as soon as they are parsed, before the rest of the response is read
+    '''
+    def test_items_are_streamed(self):
+        chunks_read = []
+
+        def chunks():
+            for chunk in split_chunks(json.dumps(self.report), 16):
+                chunks_read.append(chunk)
+                yield chunk
+
+        items = iter_json_array(chunks(), 'data')
+        self.assertEqual(0, next(items)['id'])
+        self.assertTrue(len(chunks_read) < 30)
+        self.assertEqual(39, len(list(items)))
+
+    '''
+    Scenario 21.2
+    (iter_time_entries) Streamed pages of time entries should be requested until every time entry has been read, and closed once they are read.
+    Decoded responses must give the same entries
+    '''
+    def test_iter_time_entries(self):
+        api = FakeStreamingTogglApi(self.report['data'], 15)
+        time_entries = list(HoursFetcher(api, {'user_agent': 'a', 'workspace_id': 1}).iter_time_entries('2014-01-06', '2014-01-12'))
+        self.assertEqual(self.report['data'], time_entries)
+        self.assertEqual([True, True, True], [response.closed for response in api.responses])
+
+        header = {}
+        self.assertEqual(self.report['data'], list(iter_response_array(CachedResponse(self.report), 'data', header)))
+        self.assertEqual(40, header['total_count'])
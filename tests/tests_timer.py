@@ -0,0 +1,97 @@
+import unittest
+import json
+import os
+import tempfile
+from email.mime.text import MIMEText
+
+from libs.invoke_report.run_timer import RunTimer, TimedClient
+from libs.hours_alerts import MailQueue
+
+
+class FakeClient:
+
+    def __init__(self):
+        self.calls = 0
+
+    def get_user_hours_range(self, user_agent, workspace_id, user_id, start_date, end_date):
+        self.calls = self.calls + 1
+        return 3600000
+
+    def other(self):
+        return 'other'
+
+
+class FakeSMTP:
+
+    def sendmail(self, from_email, recipients, msg_string):
+        return {}
+
+    def noop(self):
+        return (250, 'OK')
+
+    def quit(self):
+        return None
+
+
+class RunTimerTests(unittest.TestCase):
+
+    '''
+    Scenario 18.0
+    (stage) A stage that is entered more than once should accumulate its time and calls, and stages should be reported in the order they were first entered
+    '''
+    def test_stages_accumulate(self):
+        timer = RunTimer()
+        with timer.stage('holidays'):
+            pass
+        with timer.stage('rendering'):
+            pass
+        timer.add_stage_time('rendering', 0.5)
+
+        stages = timer.get_report()['stages']
+        self.assertEqual(['holidays', 'rendering'], [stage['name'] for stage in stages])
+        self.assertEqual(2, stages[1]['calls'])
+        self.assertTrue(stages[1]['seconds'] >= 0.5)
+
+    '''
+    Scenario 18.1
+    (summarize) Latency samples should be summarized in milliseconds, with percentiles and a histogram that counts every sample once
+    '''
+    def test_summarize(self):
+        summary = RunTimer.summarize([0.001 * n for n in range(1, 101)] + [20])
+
+        self.assertEqual(101, summary['count'])
+        self.assertAlmostEqual(1, summary['min_ms'])
+        self.assertAlmostEqual(20000, summary['max_ms'])
+        self.assertAlmostEqual(51, summary['p50_ms'])
+        self.assertAlmostEqual(91, summary['p90_ms'])
+        self.assertEqual(101, sum(summary['histogram'].values()))
+        self.assertEqual(1, summary['histogram']['inf'])
+        self.assertEqual(50, summary['histogram']['50'] + summary['histogram']['20'] + summary['histogram']['10'] +
+            summary['histogram']['5'] + summary['histogram']['2'] + summary['histogram']['1'])
+
+    '''
+    Scenario 18.2
+    (TimedClient, MailQueue) Every Toggl request and every e-mail sent should be recorded, and saved in the JSON run report
+    '''
+    def test_run_report(self):
+        timer = RunTimer()
+        client = TimedClient(FakeClient(), timer, ['get_user_hours_range'])
+        for uid in range(3):
+            client.get_user_hours_range('agent', 1, uid, '2014-05-05', '2014-05-11')
+        self.assertEqual('other', client.other())
+
+        mail_queue = MailQueue(FakeSMTP, 10, timer=timer)
+        mail_queue.enqueue('from@a.com', ['1@a.com'], MIMEText('body', 'html'))
+        mail_queue.enqueue('from@a.com', ['2@a.com'], MIMEText('body', 'html'))
+        mail_queue.close()
+        timer.count('members', 3)
+
+        report_path = os.path.join(tempfile.mkdtemp(), 'run_report.json')
+        timer.write_report(report_path)
+        report = json.load(open(report_path))
+
+        self.assertEqual(3, report['latencies']['toggl.get_user_hours_range']['count'])
+        self.assertEqual(3, report['latencies']['toggl']['count'])
+        self.assertEqual(2, report['latencies']['smtp_send']['count'])
+        self.assertEqual(['sending'], [stage['name'] for stage in report['stages']])
+        self.assertEqual(3, report['counts']['members'])
@@ -0,0 +1,66 @@
+import unittest
+import datetime
+
+from tests.fakes.toggl_fake import FakeToggl
+from libs.invoke_toggl.hours_fetcher import HoursFetcher
+from libs.invoke_toggl.transport import TogglTransport
+
+
+class FakeTogglTests(unittest.TestCase):
+
+    def setUp(self):
+        self.toggl = None
+
+    def tearDown(self):
+        if self.toggl is not None:
+            self.toggl.stop()
+
+    def create_fetcher(self, bulk, api_configs=None):
+        settings = self.toggl.get_toggl_configs()
+        api = self.toggl.create_client(settings)
+        transport = TogglTransport(api_configs or {'rate_limit': 0, 'backoff_base': 0.001}, sleep=lambda seconds: None)
+        self.assertTrue(transport.attach(api))
+        return api, HoursFetcher(api, settings, 4, bulk), transport
+
+    def get_expected_hours(self, members, since, until):
+        return [self.toggl.get_range_ms(member['uid'], since, until) for member in members]
+
+    '''
+    Scenario 25.0
+    (FakeToggl) The hours fetched with one summary report, one request per user, and detailed reports must all be the hours
+    the server generated for its roster
+    '''
+    def test_fetch_modes_match_roster(self):
+        self.toggl = FakeToggl(60, per_page=25, joined_before=datetime.date(2014, 1, 10)).start()
+        api, hours_fetcher, transport = self.create_fetcher(True)
+        members = api.get_workspace_members(self.toggl.workspace_id).json()
+        expected = self.get_expected_hours(members, datetime.date(2014, 1, 6), datetime.date(2014, 1, 12))
+
+        self.assertEqual(60, len(members))
+        self.assertTrue(any(member['email'] in self.toggl.admin_emails for member in members))
+        self.assertTrue(any(member['inactive'] for member in members))
+        self.assertEqual(expected, hours_fetcher.fetch_users_hours(members, '2014-01-06', '2014-01-12'))
+        self.assertEqual(1, self.toggl.get_request_count('summary'))
+
+        api, hours_fetcher, transport = self.create_fetcher(False)
+        self.assertEqual(expected, hours_fetcher.fetch_users_hours(members, '2014-01-06', '2014-01-12'))
+        self.assertEqual(61, self.toggl.get_request_count('summary'))
+
+        week_hours = hours_fetcher.fetch_weekly_hours('2014-01-06', '2014-01-12')['2014-01-06']
+        self.assertEqual(expected, [week_hours.get(member['uid'], 0) for member in members])
+        self.assertTrue(self.toggl.get_request_count('details') > 1)
+
+    '''
+    Scenario 25.1
+    (FakeToggl) Injected 429s and failures should be answered, and retried by the transport until the hours are the same as without them
+    '''
+    def test_injected_errors_are_retried(self):
+        self.toggl = FakeToggl(30, throttle_every=3, failure_rate=0.2, joined_before=datetime.date(2014, 1, 10)).start()
+        api, hours_fetcher, transport = self.create_fetcher(False, {'rate_limit': 0, 'max_retries': 10, 'backoff_base': 0.001})
+        members = api.get_workspace_members(self.toggl.workspace_id).json()
+
+        hours = hours_fetcher.fetch_users_hours(members, '2014-01-06', '2014-01-12')
+
+        self.assertEqual(self.get_expected_hours(members, datetime.date(2014, 1, 6), datetime.date(2014, 1, 12)), hours)
+        self.assertTrue(self.toggl.throttled > 0 and self.toggl.failed > 0)
+        self.assertEqual(self.toggl.throttled + self.toggl.failed, transport.retries)
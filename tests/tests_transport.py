@@ -0,0 +1,131 @@
+import unittest
+import requests
+
+from libs.invoke_toggl.transport import TogglTransport, TokenBucket
+
+
+class FakeClock:
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now = self.now + seconds
+
+
+class FakeResponse:
+
+    def __init__(self, status_code, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakeSession:
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = []
+        self.streamed = []
+
+    def get(self, url, headers=None, auth=None, params=None, timeout=None, stream=False):
+        self.requests.append((url, params))
+        self.streamed.append(stream)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def close(self):
+        pass
+
+
+class FakeTogglClientApi:
+
+    def query_report(self, url, params={}):
+        return self._do_get_query('https://toggl.com/reports/api/v2' + url, {'content-type': 'application/json'}, ('token', 'api_token'), params)
+
+    @staticmethod
+    def _do_get_query(url, headers, auth, params):
+        raise AssertionError("Requests should be sent through the transport")
+
+
+class TogglTransportTests(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def create_transport(self, outcomes, api_configs=None):
+        transport = TogglTransport(api_configs or {'rate_limit': 0, 'max_retries': 3}, sleep=self.clock.sleep)
+        transport.session = FakeSession(outcomes)
+        return transport
+
+    '''
+    Scenario 24.0
+    (TokenBucket) Requests should be sent at once up to the burst, and no faster than the rate afterwards
+    '''
+    def test_token_bucket(self):
+        bucket = TokenBucket(2, 3, clock=self.clock.time, sleep=self.clock.sleep)
+        waits = [bucket.acquire() for n in range(7)]
+
+        self.assertEqual([0, 0, 0, 0.5, 0.5, 0.5, 0.5], waits)
+        self.assertEqual(1002.0, self.clock.now)
+
+        self.clock.now = self.clock.now + 10
+        self.assertEqual([0, 0, 0, 0.5], [bucket.acquire() for n in range(4)])
+
+    '''
+    Scenario 24.1
+    (get) A 429 should be retried after its Retry-After header, 5xx responses and connection errors should be retried with a jittered
+    backoff, and the last response should be returned once every retry has failed
+    '''
+    def test_retries(self):
+        ok = FakeResponse(200)
+        limited = FakeResponse(429, {'Retry-After': '7'})
+        transport = self.create_transport([limited, FakeResponse(503), requests.exceptions.ConnectionError('reset'), ok])
+
+        self.assertIs(ok, transport.get('https://toggl.com/reports/api/v2/summary', params={'page': 1}))
+        self.assertEqual(4, len(transport.session.requests))
+        self.assertTrue(limited.closed)
+        self.assertEqual(7, self.clock.slept[0])
+        self.assertTrue(0 <= self.clock.slept[1] <= 1.0 and 0 <= self.clock.slept[2] <= 2.0)
+        self.assertEqual(3, transport.retries)
+        self.assertEqual([False] * 4, transport.session.streamed)
+
+        failing = FakeResponse(502)
+        transport = self.create_transport([FakeResponse(502)] * 3 + [failing])
+        self.assertIs(failing, transport.get('https://toggl.com/reports/api/v2/summary'))
+
+        transport = self.create_transport([requests.exceptions.Timeout('slow')] * 4)
+        self.assertRaises(requests.exceptions.Timeout, transport.get, 'https://toggl.com/reports/api/v2/summary')
+
+        self.assertEqual(None, TogglTransport.parse_retry_after(None))
+        self.assertEqual(30, TogglTransport.parse_retry_after('Wed, 21 Oct 2015 07:28:30 GMT', now=1445412480))
+
+    '''
+    Scenario 24.2
+    (attach) Every request of the client should be sent through the pooled transport, which keeps its connections alive. Detailed report
+    pages should be streamed
+    '''
+    def test_attach(self):
+        ok = FakeResponse(200)
+        transport = self.create_transport([ok])
+        api = FakeTogglClientApi()
+
+        self.assertTrue(transport.attach(api))
+        self.assertIs(ok, api.query_report('/details', {'page': 2}))
+        self.assertEqual([('https://toggl.com/reports/api/v2/details', {'page': 2})], transport.session.requests)
+        self.assertEqual([True], transport.session.streamed)
+        self.assertFalse(transport.attach(object()))
+
+        pooled = TogglTransport({'pool_size': 12})
+        self.assertEqual('keep-alive', pooled.session.headers['Connection'])
+        self.assertEqual(12, pooled.session.get_adapter('https://toggl.com')._pool_maxsize)
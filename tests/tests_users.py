@@ -0,0 +1,28 @@
+import unittest
+
+from libs.invoke_users.invoke_users import User
+
+
+class UserTests(unittest.TestCase):
+
+    '''
+    Scenario 22.0
+    (User) A User should only keep the fields it uses, in slots, and must not change the member it was created from
+    '''
+    def test_user_is_slotted_and_does_not_change_member(self):
+        member = {'uid': 123, 'wid': 456, 'name': '', 'email': 'unit.test@invokelabs.com', 'inactive': False,
+                  'at': '2013-06-01T09:00:00+00:00', 'avatar_file_name': 'randomurl.txt', 'admin': True}
+        original_member = dict(member)
+
+        user = User(member, 37.5, 30)
+        user.prepare_user('2014-01-06', '2014-01-12')
+        users_to_contact = []
+        user.setup_missing_hours(37.5, users_to_contact, 0)
+
+        self.assertEqual(original_member, member)
+        self.assertFalse(hasattr(user, '__dict__'))
+        self.assertRaises(AttributeError, setattr, user, 'avatar_file_name', 'randomurl.txt')
+        self.assertEqual('unit.test@invokelabs.com', user.get_name())
+        self.assertEqual('https://www.toggl.com/app/#reports/summary/456/from/2014-01-06/to/2014-01-12/users/123/billable/both', user.get_toggl_url())
+        self.assertEqual([user], users_to_contact)
+        self.assertEqual((7.5, '*'), (user.missing_hours, user.mark_notice))
@@ -0,0 +1,134 @@
+import unittest
+import random
+import datetime
+
+from libs.invoke_workdays.workday import WorkDay
+from libs.invoke_workdays.work_schedules import WorkSchedules
+from libs.invoke_report.weekly_report import WeeklyReport
+from libs.invoke_users.compliance import ComplianceEngine
+
+HOLIDAYS = {2014: [{'date': datetime.date(2014, 1, 8), 'percent_used': 0.5}]}
+
+
+class CountingWorkDay(WorkDay):
+
+    calculations = 0
+
+    def calculate_total_work_hours(self, working_hours, start_date, end_date):
+        CountingWorkDay.calculations = CountingWorkDay.calculations + 1
+        return WorkDay.calculate_total_work_hours(self, working_hours, start_date, end_date)
+
+
+class WorkSchedulesTests(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(7)
+        CountingWorkDay.calculations = 0
+        self.start_date = datetime.datetime(2014, 1, 6, 9)
+        self.end_date = datetime.datetime(2014, 1, 12, 9)
+        self.now = datetime.datetime(2014, 1, 13)
+        self.workday = CountingWorkDay(HOLIDAYS, [1, 2, 3, 4, 5], self.now)
+        self.configs = {
+            'admin': ['admin@invokelabs.com'],
+            'togglAPI': {'workspace_id': 456, 'user_agent': 'a'},
+            'work_schedules': [
+                {'name': 'part_time', 'fte': 0.8, 'groups': [20], 'emails': ['Part.Time@invokelabs.com']},
+                {'name': 'short_days', 'hours_per_day': 6, 'work_days': [1, 2, 3], 'uids': [3, 4], 'groups': [30]},
+                {'name': 'leave', 'leave_days': ['2014-01-09', {'date': '2014-01-10', 'percent_used': 0.5}], 'uids': [5]},
+                {'name': 'away', 'leave_days': ['2014-01-06', '2014-01-07', '2014-01-08', '2014-01-09', '2014-01-10'], 'uids': [6]},
+                {'name': 'four_fifths', 'fte': 0.8, 'uids': [4, 7]}
+            ]
+        }
+
+    def get_work_day(self, work_days):
+        return CountingWorkDay(HOLIDAYS, work_days, self.now)
+
+    def build_members(self, count):
+        joined_dates = [
+            datetime.datetime(2013, 6, 1), datetime.datetime(2014, 1, 6, 10), datetime.datetime(2014, 1, 8),
+            datetime.datetime(2014, 1, 9, 15), datetime.datetime(2014, 1, 20)
+        ]
+        members = []
+        for uid in range(1, count + 1):
+            members.append({
+                'uid': uid,
+                'wid': 456,
+                'name': 'User ' + str(uid),
+                'email': 'admin@invokelabs.com' if uid % 17 == 0 else 'user' + str(uid) + '@invokelabs.com',
+                'inactive': uid % 13 == 0,
+                'group_ids': random.choice([[], [10], [20], [30], [30, 20]]),
+                'at': random.choice(joined_dates).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+            })
+        return members
+
+    '''
+    Scenario 29.0
+    (get_minimum_hours) The minimum hours of a schedule should be the hours of its work days that are not holidays or leave, times its FTE.
+    Without work schedules, every member should have the minimum hours of the work_days at 7.5 hours a day, as before
+    '''
+    def test_minimum_hours(self):
+        work_schedules = WorkSchedules(self.configs, self.workday, 7.5)
+        minimum_hours = dict((schedule.name, work_schedules.get_minimum_hours(schedule, self.start_date, self.end_date))
+                             for schedule in [work_schedules.default] + work_schedules.by_uid.values())
+        self.assertEqual({'default': 33.75, 'part_time': 27.0, 'short_days': 15.0, 'leave': 22.5, 'away': 0.0}, minimum_hours)
+
+        report = WeeklyReport({'admin': []}, None, self.workday, self.start_date, self.end_date)
+        self.assertEqual(self.workday.calculate_total_work_hours(7.5, self.start_date, self.end_date), report.minimum_hours)
+        user = report.add_user({'uid': 4, 'name': 'User 4', 'email': 'user4@invokelabs.com', 'inactive': False, 'at': '2013-06-01T09:00:00+00:00'}, 0)
+        self.assertEqual(33.75, user.min_hours)
+
+        for invalid in [{'fte': 1.5}, {'work_days': [7]}, {'hours_per_day': 'eight'}, {'leave_days': ['soon']}, {'uids': ['someone']}]:
+            self.assertRaises(ValueError, WorkSchedules, {'work_schedules': [invalid]}, self.workday)
+
+    '''
+    Scenario 29.1
+    (get_schedule) Members should be matched by uid, then e-mail, then the first matching group, and have the default schedule otherwise.
+    Schedules that are the same should be shared, and the minimum hours of each schedule computed once, however many members have it
+    '''
+    def test_members_share_schedules(self):
+        work_schedules = WorkSchedules(self.configs, self.workday, 7.5, self.get_work_day)
+        member = {'uid': 4, 'email': 'part.time@InvokeLabs.com', 'group_ids': [20]}
+        self.assertEqual('short_days', work_schedules.get_schedule(member).name)
+        self.assertEqual('part_time', work_schedules.get_schedule(dict(member, uid=1)).name)
+        self.assertEqual('part_time', work_schedules.get_schedule({'uid': 1, 'email': None, 'group_ids': [30, 20]}).name)
+        self.assertEqual('default', work_schedules.get_schedule({'uid': 1, 'email': 'user1@invokelabs.com'}).name)
+        self.assertTrue(work_schedules.get_schedule({'uid': 7}) is work_schedules.get_schedule({'uid': 1, 'group_ids': [20]}))
+
+        members = self.build_members(3000)
+        engine = ComplianceEngine(members, self.configs, self.workday, 7.5, work_schedules)
+        self.assertEqual(5, len(engine.schedules))
+        CountingWorkDay.calculations = 0
+        engine.compute([0] * len(members), self.start_date, self.end_date, 33.75)
+        calculations = CountingWorkDay.calculations
+        self.assertTrue(calculations < 40)
+        engine.compute([0] * len(members), self.start_date, self.end_date, 33.75)
+        self.assertEqual(calculations, CountingWorkDay.calculations)
+
+    '''
+    Scenario 29.2
+    (WeeklyReport, ComplianceEngine) With work schedules, the users computed at once must be the same as the users computed one by one -
+    the same minimum hours, percent worked, missing hours, new hire reductions, marks and users to contact. Members with no hours to work
+    must be at 100%, and part-time members only contacted when they are missing hours of their own schedule
+    '''
+    def test_batch_matches_users(self):
+        members = self.build_members(300)
+        tracked_ms = [int(random.choice([0, 3, 10, 14, 20, 27, 33.75, 40]) * 60 * 60 * 1000) for member in members]
+        work_schedules = WorkSchedules(self.configs, self.workday, 7.5, self.get_work_day)
+
+        report = WeeklyReport(self.configs, None, self.workday, self.start_date, self.end_date, work_schedules=work_schedules)
+        for member, time_tracked in zip(members, tracked_ms):
+            report.add_user(member, time_tracked)
+        batch_report = WeeklyReport(self.configs, None, self.workday, self.start_date, self.end_date, work_schedules=work_schedules)
+        batch_report.add_users_batch(ComplianceEngine(members, self.configs, self.workday, 7.5, work_schedules), tracked_ms)
+
+        results = [[(user.get_id(), user.min_hours, user.percent_worked, user.missing_hours, user.hours_reduction, user.new_flag, user.mark_notice)
+                    for user in computed.users_to_output] for computed in (report, batch_report)]
+        self.assertEqual(results[0], results[1])
+        self.assertEqual([user.get_id() for user in report.users_to_contact], [user.get_id() for user in batch_report.users_to_contact])
+
+        users = dict((user.get_id(), user) for user in report.users_to_output)
+        self.assertEqual((0.0, 100), (users[6].min_hours, users[6].percent_worked))
+        self.assertTrue(set([27.0, 33.75]).issubset(user.min_hours for user in users.values() if user.hours == 27 and not user.new_flag))
+        contacted = [user for user in report.users_to_contact if user.hours == 27 and not user.new_flag]
+        self.assertTrue(contacted)
+        self.assertTrue(all(user.min_hours == 33.75 for user in contacted))
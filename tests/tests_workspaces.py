@@ -0,0 +1,298 @@
+import unittest
+import os
+import datetime
+import tempfile
+import socket
+
+from libs.invoke_report.run_timer import RunTimer
+from libs.invoke_report.workspace_runner import WorkspaceRunner
+from libs.invoke_report.week_store import WeekStore
+from libs.date_functions import get_weeks_in_range
+from tests.fakes.smtp_sink import SMTPSink
+
+
+class FakeResponse:
+
+    def __init__(self, json_data):
+        self.json_data = json_data
+
+    def raise_for_status(self):
+        return None
+
+    def json(self):
+        return self.json_data
+
+
+class FakeTogglApi:
+
+    requests = 0
+
+    def __init__(self, settings):
+        self.workspace_id = settings['workspace_id']
+
+    def get_workspace_members(self, workspace_id):
+        FakeTogglApi.requests = FakeTogglApi.requests + 1
+        return FakeResponse(self.get_members())
+
+    def get_user_hours_range(self, user_agent, workspace_id, user_id, start_date, end_date):
+        FakeTogglApi.requests = FakeTogglApi.requests + 1
+        return self.get_time_tracked(user_id, start_date)
+
+    def query_report(self, url, params={}, method='GET'):
+        FakeTogglApi.requests = FakeTogglApi.requests + 1
+        time_entries = []
+        week_start = datetime.datetime.strptime(params['since'], '%Y-%m-%d')
+        while week_start.strftime('%Y-%m-%d') <= params['until']:
+            for member in self.get_members():
+                time_tracked = self.get_time_tracked(member['uid'], week_start.strftime('%Y-%m-%d'))
+                time_entries.append({'uid': member['uid'], 'start': week_start.strftime('%Y-%m-%dT10:00:00+00:00'), 'dur': time_tracked - 1000})
+                time_entries.append({'uid': member['uid'], 'start': (week_start + datetime.timedelta(days=4)).strftime('%Y-%m-%dT10:00:00+00:00'), 'dur': 1000})
+            week_start = week_start + datetime.timedelta(weeks=1)
+
+        per_page = 20
+        page = time_entries[(params['page'] - 1) * per_page:params['page'] * per_page]
+        return FakeResponse({'total_count': len(time_entries), 'per_page': per_page, 'data': page})
+
+    def get_members(self):
+        return [{
+            'uid': self.workspace_id * 100 + n,
+            'wid': self.workspace_id,
+            'name': 'User ' + str(n),
+            'email': 'user' + str(n) + '@invokelabs.com',
+            'inactive': False,
+            'at': '2013-06-01T09:00:00+00:00'
+        } for n in range(1, 6)]
+
+    # Every week after the week of 2014-01-06, the users track another hour
+    def get_time_tracked(self, uid, start_date):
+        weeks = (datetime.date(*[int(part) for part in start_date.split('-')]) - datetime.date(2014, 1, 6)).days / 7
+        return (uid % 100) * 8 * 60 * 60 * 1000 + weeks * 60 * 60 * 1000
+
+
+class FailingTogglApi(FakeTogglApi):
+
+    def get_user_hours_range(self, user_agent, workspace_id, user_id, start_date, end_date):
+        raise IOError("Toggl is down")
+
+
+class WorkspaceRunnerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.sink = SMTPSink().start()
+        self.configs = {
+            'work_days': [1, 2, 3, 4, 5],
+            'admin': [],
+            'sendmail': {'to_send': True},
+            'smtp': self.sink.get_smtp_configs(),
+            'togglAPI': {'token': 'token', 'user_agent': 'agent', 'bulk_fetch': False},
+            'staff': {
+                'email_role_staff_resource': 'staff@invokelabs.com',
+                'email_role_group_leads': 'leads@invokelabs.com',
+                'from_email': 'alma@invokelabs.com'
+            },
+            'workspaces': [
+                {'name': 'Design', 'togglAPI': {'workspace_id': 1}},
+                {'name': 'Research', 'togglAPI': {'workspace_id': 2}, 'work_days': [1, 2, 3, 4],
+                    'staff': {'email_role_staff_resource': 'research@invokelabs.com'}},
+                {'name': 'Ops', 'togglAPI': {'workspace_id': 3}}
+            ]
+        }
+
+    def tearDown(self):
+        self.sink.stop()
+
+    def build_runner(self, flags=None, start_date=datetime.datetime(2014, 1, 6), backfill_weeks=None):
+        return WorkspaceRunner(self.configs, {2014: []}, FakeTogglApi, start_date, start_date + datetime.timedelta(days=6),
+            flags=flags, now=datetime.datetime(2014, 3, 3), backfill_weeks=backfill_weeks)
+
+    '''
+    Scenario 19.0
+    (get_workspace_configs) Each workspace should be merged over the top level configurations, key by key for dicts such as togglAPI and staff
+    '''
+    def test_workspace_configs(self):
+        workspaces = WorkspaceRunner.get_workspace_configs(self.configs)
+
+        self.assertEqual(3, len(workspaces))
+        self.assertEqual({'token': 'token', 'user_agent': 'agent', 'bulk_fetch': False, 'workspace_id': 2}, workspaces[1]['togglAPI'])
+        self.assertEqual('research@invokelabs.com', workspaces[1]['staff']['email_role_staff_resource'])
+        self.assertEqual('alma@invokelabs.com', workspaces[1]['staff']['from_email'])
+        self.assertEqual([1, 2, 3, 4], workspaces[1]['work_days'])
+        self.assertEqual([1, 2, 3, 4, 5], workspaces[2]['work_days'])
+        self.assertTrue('workspaces' not in workspaces[0])
+
+        del self.configs['workspaces']
+        self.assertEqual([self.configs], WorkspaceRunner.get_workspace_configs(self.configs))
+
+    '''
+    Scenario 19.1
+    (run_all) Workspaces run in a process pool should give the same results as workspaces run one by one, in the order of the configurations,
+    and their counts should be merged into the combined run report
+    '''
+    def test_pooled_run_matches_sequential_run(self):
+        runner = self.build_runner()
+        self.assertEqual(2, len(runner.work_day_calendars))
+
+        sequential_timer = RunTimer()
+        sequential = runner.run_all(sequential_timer, 1)
+        sequential_messages = len(self.sink.messages)
+
+        pooled_timer = RunTimer()
+        pooled = runner.run_all(pooled_timer, 3)
+
+        self.assertEqual(['Design', 'Research', 'Ops'], [result['name'] for result in pooled])
+        self.assertEqual([None, None, None], [result['error'] for result in pooled])
+        self.assertEqual([result['run_report']['counts'] for result in sequential], [result['run_report']['counts'] for result in pooled])
+        self.assertTrue('Time Tracked for 2014-01-06 until 2014-01-12' in pooled[1]['output'])
+        self.assertEqual(sequential_messages * 2, len(self.sink.messages))
+
+        combined_report = WorkspaceRunner.get_combined_report(pooled_timer, pooled)
+        self.assertEqual(15, combined_report['counts']['members'])
+        self.assertEqual(sequential_timer.get_report()['counts'], combined_report['counts'])
+        self.assertEqual(3, len(combined_report['workspaces']))
+
+    '''
+    Scenario 19.2
+    (run_workspace) A week whose e-mails were delivered should be read from the state store without calling Toggl or sending e-mails, unless it is recomputed
+    '''
+    def test_stored_week_is_not_computed_again(self):
+        state_path = os.path.join(tempfile.mkdtemp(), 'state.sqlite')
+        self.configs['state'] = {'path': state_path}
+        self.configs['workspaces'] = self.configs['workspaces'][:1]
+
+        requests = FakeTogglApi.requests
+        first = self.build_runner().run_all(RunTimer())
+        requests = FakeTogglApi.requests - requests
+        messages = len(self.sink.messages)
+
+        before = FakeTogglApi.requests
+        stored = self.build_runner().run_all(RunTimer())
+        self.assertEqual(before, FakeTogglApi.requests)
+        self.assertEqual(messages, len(self.sink.messages))
+        self.assertEqual(first[0]['run_report']['counts']['users_reported'], stored[0]['run_report']['counts']['users_reported'])
+        self.assertEqual(1, stored[0]['run_report']['counts']['stored_weeks'])
+
+        self.build_runner({'recompute': True}).run_all(RunTimer())
+        self.assertEqual(before + requests, FakeTogglApi.requests)
+
+        week_store = WeekStore(state_path)
+        self.assertEqual(['2014-01-06'], week_store.get_weeks(1))
+        self.assertEqual(5, len(week_store.get_week(1, '2014-01-06')))
+        week_store.close()
+
+    '''
+    Scenario 19.3
+    (backfill_workspace) Backfilled weeks should be fetched with a few report requests, and must be the same as the weeks computed one run at a time
+    '''
+    def test_backfill_matches_weekly_runs(self):
+        weeks = get_weeks_in_range(datetime.datetime(2014, 1, 8), datetime.datetime(2014, 2, 20))
+        self.assertEqual((datetime.datetime(2014, 1, 6), datetime.datetime(2014, 2, 23)), (weeks[0][0], weeks[-1][1]))
+        self.configs['workspaces'] = self.configs['workspaces'][:1]
+        self.configs['sendmail']['to_send'] = False
+
+        self.configs['state'] = {'path': os.path.join(tempfile.mkdtemp(), 'weekly.sqlite')}
+        for start_date, end_date in weeks:
+            self.build_runner(start_date=start_date).run_all(RunTimer())
+        weekly_store = WeekStore(self.configs['state']['path'])
+
+        self.configs['state'] = {'path': os.path.join(tempfile.mkdtemp(), 'backfill.sqlite')}
+        requests = FakeTogglApi.requests
+        results = self.build_runner(backfill_weeks=weeks).run_all(RunTimer())
+        self.assertEqual(1 + 4, FakeTogglApi.requests - requests)
+        self.assertEqual(7, results[0]['run_report']['counts']['weeks_computed'])
+        backfill_store = WeekStore(self.configs['state']['path'])
+
+        self.assertEqual(weekly_store.get_weeks(1), backfill_store.get_weeks(1))
+        for week_start in weekly_store.get_weeks(1):
+            self.assertEqual(weekly_store.get_week(1, week_start), backfill_store.get_week(1, week_start))
+            self.assertEqual(weekly_store.get_minimum_hours(1, week_start), backfill_store.get_minimum_hours(1, week_start))
+
+        requests = FakeTogglApi.requests
+        self.build_runner(backfill_weeks=weeks).run_all(RunTimer())
+        self.assertEqual(requests, FakeTogglApi.requests)
+
+    '''
+    Scenario 19.4
+    (run_workspace) A workspace that fails should still close its Toggl transport, mail queue and state store, and report its error
+    '''
+    def test_failed_workspace_closes_resources(self):
+        self.configs['state'] = {'path': os.path.join(tempfile.mkdtemp(), 'state.sqlite')}
+        self.configs['workspaces'] = self.configs['workspaces'][:1]
+        runner = WorkspaceRunner(self.configs, {2014: []}, FailingTogglApi, datetime.datetime(2014, 1, 6), datetime.datetime(2014, 1, 12),
+                                 now=datetime.datetime(2014, 3, 3))
+
+        closed = []
+        close_all = WorkspaceRunner.__dict__['close_all']
+        def record_close_all(resources):
+            closed.extend(resource.__class__.__name__ for resource in resources)
+            close_all.__func__(resources)
+        WorkspaceRunner.close_all = staticmethod(record_close_all)
+        try:
+            result = runner.run_workspace_safely(0)
+        finally:
+            WorkspaceRunner.close_all = close_all
+
+        self.assertIn("Toggl is down", result['error'])
+        self.assertEqual(['MailQueue', 'TogglTransport', 'WeekStore'], sorted(closed))
+
+    '''
+    Scenario 19.5
+    (run_workspace) A week should only be skipped once its alerts were delivered - a dry run, or a run whose e-mails failed, stores the week
+    as computed but not e-mailed, and the next run computes and e-mails it again
+    '''
+    def test_week_is_skipped_only_once_emailed(self):
+        state_path = os.path.join(tempfile.mkdtemp(), 'state.sqlite')
+        self.configs['state'] = {'path': state_path}
+        self.configs['workspaces'] = self.configs['workspaces'][:1]
+        week_store = WeekStore(state_path)
+
+        self.configs['sendmail']['to_send'] = False
+        self.build_runner().run_all(RunTimer())
+        self.assertEqual(0, len(self.sink.messages))
+        self.assertTrue(week_store.has_week(1, '2014-01-06'))
+        self.assertFalse(week_store.has_week(1, '2014-01-06', alerts_sent=True))
+
+        closed_socket = socket.socket()
+        closed_socket.bind(('127.0.0.1', 0))
+        self.configs['sendmail']['to_send'] = True
+        self.configs['smtp'] = dict(self.sink.get_smtp_configs(), port=closed_socket.getsockname()[1])
+        closed_socket.close()
+        failed = self.build_runner().run_all(RunTimer())
+        self.assertTrue(failed[0]['mail_failures'] or failed[0]['error'])
+        self.assertFalse(week_store.has_week(1, '2014-01-06', alerts_sent=True))
+
+        self.configs['smtp'] = self.sink.get_smtp_configs()
+        self.build_runner().run_all(RunTimer())
+        messages = len(self.sink.messages)
+        self.assertTrue(messages > 0)
+        self.assertTrue(week_store.has_week(1, '2014-01-06', alerts_sent=True))
+
+        stored = self.build_runner().run_all(RunTimer())
+        self.assertEqual(messages, len(self.sink.messages))
+        self.assertEqual(1, stored[0]['run_report']['counts']['stored_weeks'])
+        week_store.close()
+
+    '''
+    Scenario 19.6
+    (backfill_workspace) Backfilled weeks should be stored as not e-mailed, so the weekly run of the same week still e-mails its alerts.
+    An empty backfill should neither fetch nor e-mail anything, instead of falling through to the weekly run
+    '''
+    def test_backfill_does_not_suppress_alerts(self):
+        state_path = os.path.join(tempfile.mkdtemp(), 'state.sqlite')
+        self.configs['state'] = {'path': state_path}
+        self.configs['workspaces'] = self.configs['workspaces'][:1]
+
+        requests = FakeTogglApi.requests
+        empty = self.build_runner(backfill_weeks=[]).run_all(RunTimer())
+        self.assertEqual((None, requests, 0), (empty[0]['error'], FakeTogglApi.requests, len(self.sink.messages)))
+
+        weeks = get_weeks_in_range(datetime.datetime(2013, 12, 30), datetime.datetime(2014, 1, 12))
+        self.build_runner(backfill_weeks=weeks).run_all(RunTimer())
+        self.assertEqual(0, len(self.sink.messages))
+        week_store = WeekStore(state_path)
+        self.assertEqual(['2013-12-30', '2014-01-06'], week_store.get_weeks(1))
+
+        weekly = self.build_runner().run_all(RunTimer())
+        self.assertTrue(len(self.sink.messages) > 0)
+        self.assertTrue('stored_weeks' not in weekly[0]['run_report']['counts'])
+        self.assertTrue(week_store.has_week(1, '2014-01-06', alerts_sent=True))
+        week_store.close()
@@ -0,0 +1,40 @@
+import sys
+import datetime
+
+from libs.invoke_loadup.invoke_loadup import Loadup
+from libs.invoke_report.week_store import WeekStore
+from libs.invoke_report.workspace_runner import WorkspaceRunner
+
+# Prints the percent of their required hours every user worked over the last weeks, read from the state store without calling Toggl.
+# Usage: python trend.py [config path] [--weeks=N] (N defaults to 8)
+loadup = Loadup(sys.argv)
+loadup.initialize_configs()
+configs = loadup.get_config()
+
+if not configs.get('state'):
+    print "No state store is configured. Set state - path in the configurations to store the computed weeks"
+    quit()
+
+weeks = loadup.get_flag('weeks')
+weeks = int(weeks) if weeks and weeks is not True else 8
+since = (datetime.date.today() - datetime.timedelta(weeks=weeks)).strftime('%Y-%m-%d')
+until = datetime.date.today().strftime('%Y-%m-%d')
+
+for workspace_configs in WorkspaceRunner.get_workspace_configs(configs):
+    workspace_id = workspace_configs['togglAPI']['workspace_id']
+    week_store = WeekStore(workspace_configs['state']['path'])
+    week_starts = [week_start for week_start in week_store.get_weeks(workspace_id) if since <= week_start <= until]
+    rows = week_store.get_user_weeks(workspace_id, since, until)
+    week_store.close()
+
+    percent_worked = {}
+    names = {}
+    for row in rows:
+        names[row['uid']] = row['name']
+        percent_worked[(row['uid'], row['week_start'])] = row['percent_worked']
+
+    print "\n\nPercent Worked for workspace " + str(workspace_configs.get('name', workspace_id)) + "\n"
+    print "{:20}".format("") + "".join("{:>12}".format(week_start[5:]) for week_start in week_starts)
+    for uid in sorted(names, key=lambda uid: names[uid]):
+        cells = [percent_worked.get((uid, week_start)) for week_start in week_starts]
+        print "{:20}".format(names[uid]) + "".join("{:>12}".format("-" if cell is None else "{:0.2f}%".format(cell)) for cell in cells)